@@ -1,9 +1,12 @@
 # backend/app/api/llm.py
 
 from fastapi import APIRouter, HTTPException, Body, Path
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, List
+import html
 import logging
 from ..storage.sqlite_store import store
+from ..templates.email_templates import template_manager
 
 # ========================== START: MODIFICATION ==========================
 # DESIGNER'S NOTE:
@@ -93,4 +96,61 @@ def set_active_llm_configuration(config_id: int = Path(...)):
         logger.error(f"设置激活LLM配置 (ID: {config_id}) 时出错: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"设置激活LLM配置时发生错误: {str(e)}")
 
-# ========================== END: MODIFICATION ============================
\ No newline at end of file
+# ========================== END: MODIFICATION ============================
+
+
+# ========================== START: MODIFICATION (Streaming Preview) ==========================
+# DESIGNER'S NOTE:
+# 流式预览：与 “DeepSeek 大模型工作流” 模板生成的邮件内容一致 (使用所选模板的布局和相同的标题)，但不等待模型生成完毕。
+# 页面头部 (样式 + 标题 + 原始输入) 立即返回，模型输出的每一段文本 (已去除代码块标记，与缓存/发送的内容一致)
+# 到达后即转义并推送给前端，预览的首字节时间从“完整生成耗时”降为“首个 token 的耗时”。
+# llm_service 在首次预览时才导入，不在应用启动时随路由一起加载 (参见 templates/plugin_registry.py)。
+# 正文固定按 “DeepSeek 大模型工作流” 的方式生成 (text_ori 直接作为提示词)，因此只接受该模板；
+# 其他模板的提示词由各自的实现构造，无法在这里流式预览。
+
+STREAM_PREVIEW_TEMPLATE = "deepseek_workflow"
+
+@router.post("/preview/stream")
+async def stream_llm_preview(payload: Dict[str, Any] = Body(...)):
+    """
+    以流式 HTML 的形式预览大模型处理结果。
+    请求体: {"text_ori": "...", "use_cache": true, "template_type": "deepseek_workflow"}
+    template_type 只能是 "deepseek_workflow" (默认值)，其他模板返回 400。
+    """
+    text_to_process = str(payload.get("text_ori", "")).strip()
+    if not text_to_process:
+        raise HTTPException(status_code=422, detail="缺少需要处理的文本 (text_ori)。")
+    use_cache = bool(payload.get("use_cache", True))
+    template_type = str(payload.get("template_type") or STREAM_PREVIEW_TEMPLATE)
+    if template_type != STREAM_PREVIEW_TEMPLATE:
+        raise HTTPException(status_code=400, detail=f"流式预览仅支持 '{STREAM_PREVIEW_TEMPLATE}' 模板，不支持 '{template_type}'。")
+    from ..services.llm_service import llm_service, LLMStreamError
+
+    layout = await template_manager.get_template_layout(template_type)
+    if layout is None:
+        raise HTTPException(status_code=404, detail=f"未找到模板 '{template_type}'。")
+    # 标题与模板生成的邮件主题一致
+    prefix, suffix = layout.parts(html.escape(f"AI 处理结果 - {text_to_process[:20]}..."))
+
+    async def render():
+        yield prefix + (
+            f'<h4>原始输入文本 (Input):</h4>'
+            f'<pre style="background-color: #f5f5f5; padding: 15px; border-radius: 8px;">{html.escape(text_to_process)}</pre>'
+            f'<h4>大模型处理结果 (Output):</h4>'
+            f'<pre style="background-color: #e8f5e9; padding: 15px; border-radius: 8px;">'
+        )
+        try:
+            async for chunk in llm_service.generate_text_stream(text_to_process, use_cache=use_cache):
+                yield html.escape(chunk)
+            yield "</pre>"
+        except LLMStreamError as e:
+            yield (
+                "</pre><h4>错误：大模型处理失败</h4>"
+                f'<pre style="background-color: #fbe9e7; color: #b71c1c; padding: 15px; border-radius: 8px;">{html.escape(str(e))}</pre>'
+            )
+        yield suffix
+
+    # 禁用反向代理缓冲，保证每一段内容都能及时到达浏览器
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(render(), media_type="text/html; charset=utf-8", headers=headers)
+# ========================== END: MODIFICATION (Streaming Preview) ============================
@@ -0,0 +1,39 @@
+# backend/app/api/outbox.py (新文件)
+
+from fastapi import APIRouter, HTTPException, Path, Query
+from typing import Optional
+import logging
+from ..storage.sqlite_store import store, async_store
+from ..services.outbox_service import outbox_dispatcher
+
+# DESIGNER'S NOTE:
+# 发件箱的查看与死信处理接口。
+# 发送失败多次的邮件会进入 'dead' 状态，可以在这里查看并手动重新放回发送队列。
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+OUTBOX_STATUSES = ("pending", "sending", "sent", "dead")
+
+
+@router.get("/outbox")
+def get_outbox_messages(status: Optional[str] = Query(None), limit: int = Query(100, ge=1, le=1000)):
+    """查询发件箱中的邮件，可按状态 (pending / sending / sent / dead) 过滤。"""
+    if status and status not in OUTBOX_STATUSES:
+        raise HTTPException(status_code=422, detail=f"无效的状态 '{status}'，可选值: {', '.join(OUTBOX_STATUSES)}。")
+    try:
+        return {"status": "success", "messages": store.get_outbox_messages(status, limit)}
+    except Exception as e:
+        logger.error(f"查询发件箱时出错: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="查询发件箱时发生内部错误。")
+
+
+@router.post("/outbox/{message_id}/retry")
+async def retry_outbox_message(message_id: int = Path(...)):
+    """将一封死信邮件重新放回发送队列。"""
+    # 在事件循环中执行，notify() 唤醒的 asyncio.Event 不是线程安全的
+    if not await async_store.requeue_outbox_message(message_id):
+        raise HTTPException(status_code=404, detail=f"未找到ID为 {message_id} 的死信邮件。")
+    outbox_dispatcher.notify()
+    logger.info(f"API: Outbox message [ID: {message_id}] was requeued by user request.")
+    return {"status": "success", "message": f"邮件 {message_id} 已重新加入发送队列。"}
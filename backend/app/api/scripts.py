@@ -0,0 +1,16 @@
+# backend/app/api/scripts.py (新文件)
+
+from fastapi import APIRouter
+
+# DESIGNER'S NOTE:
+# 脚本执行的排队与运行统计，用于观察是否需要调整 SCRIPT_MAX_CONCURRENCY 或脚本超时设置。
+# script_runner_service 在接口被调用时才导入，不在应用启动时随路由一起加载 (参见 templates/plugin_registry.py)。
+
+router = APIRouter()
+
+
+@router.get("/scripts/metrics")
+def get_script_metrics():
+    """返回脚本执行的并发上限、当前排队/运行数量、超时次数与平均等待时间。"""
+    from ..services.script_runner_service import script_runner_service
+    return {"status": "success", "metrics": script_runner_service.get_metrics()}
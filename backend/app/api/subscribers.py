@@ -8,14 +8,15 @@ import json
 import os
 import shutil
 import logging
-from ..storage.sqlite_store import store
+from ..storage.sqlite_store import store, async_store
 # ========================== START: MODIFICATION (Async Job Execution Fix) ==========================
 # DESIGNER'S NOTE:
 # 这里的导入也得到了简化。我们不再需要 _run_async_job，
 # 只需要 scheduler_service 实例和 SchedulerService 类（用于引用静态方法）。
-from ..services.scheduler_service import scheduler_service, SchedulerService
+from ..services.scheduler_service import scheduler_service, SchedulerService, personalize_for_recipients
 # ========================== END: MODIFICATION (Final Async Fix) ============================
-from ..services.email_service import email_service
+from ..services.outbox_service import outbox_dispatcher
+from ..services.attachment_bundler import attachment_bundler
 from ..templates.email_templates import template_manager
 import datetime
 import pytz
@@ -72,7 +73,7 @@ async def add_subscriber(payload: Dict = Body(...)):
         # 如果备注名为空，默认使用邮箱前缀
         remark_name = email.split('@')[0]
 
-    success = store.add_subscriber(email, remark_name)
+    success = await async_store.add_subscriber(email, remark_name)
     
     if success:
         return {"status": "success", "message": f"已成功添加/更新订阅者: {remark_name} <{email}>"}
@@ -88,7 +89,7 @@ async def update_subscriber(email: str, payload: Dict = Body(...)):
     if not new_remark_name:
         raise HTTPException(status_code=422, detail="备注名不能为空。")
 
-    success = store.update_subscriber(email, new_remark_name)
+    success = await async_store.update_subscriber(email, new_remark_name)
     if success:
         return {"status": "success", "message": f"已成功将 {email} 的备注更新为 {new_remark_name}。"}
     else:
@@ -98,7 +99,7 @@ async def update_subscriber(email: str, payload: Dict = Body(...)):
 async def delete_subscriber(email: str):
     """【新增】删除一个订阅者"""
     email = unquote(email) # URL解码邮箱地址
-    success = store.delete_subscriber(email)
+    success = await async_store.delete_subscriber(email)
     if success:
         return {"status": "success", "message": f"已成功删除订阅者 {email}。"}
     else:
@@ -155,6 +156,11 @@ async def send_email_now(
     # ========================== END: MODIFICATION (Fix Skip Email) ============================
     
     final_subject = custom_subject if custom_subject else email_content["subject"]
+    final_html = email_content["html"]
+    # 与定时任务相同：启用了个性化的模板按收件人替换 {{remark_name}} 等占位符
+    personalized = await personalize_for_recipients([receiver_email], final_subject, email_content)
+    if personalized:
+        final_subject, final_html = personalized[0]
     
     # 将模板自身生成的附件路径与用户上传的临时文件路径合并
     final_attachments = email_content.get("attachments", []) + temp_file_paths
@@ -167,18 +173,25 @@ async def send_email_now(
         logger.info(f"Silent run triggered for 'send-now'. Template '{template_type}' logic executed, but email to {receiver_email} was suppressed.")
         message = "静默运行成功！模板逻辑已执行，邮件未发送。"
     else:
-        background_tasks.add_task(
-            email_service.send_email,
+        # DESIGNER'S NOTE:
+        # 邮件不再通过 BackgroundTasks 直接发送，而是持久化到发件箱，由后台投递器发送并在失败时重试。
+        # 上传的临时文件交由发件箱管理，在邮件成功发送后才删除。
+        # 附件总大小超过阈值时按模板 / 全局配置压缩打包
+        final_attachments = await attachment_bundler.bundle_async(final_attachments, email_content.get("attachment_bundle"))
+        await outbox_dispatcher.enqueue(
             receiver_email,
             final_subject,
-            email_content["html"],
+            final_html,
             attachments=final_attachments, # 传递合并后的附件列表
-            embedded_images=email_content.get("embedded_images", [])
+            embedded_images=email_content.get("embedded_images", []),
+            cleanup_paths=temp_file_paths,
+            source=f"send-now:{template_type}"
         )
-        message = f"邮件正在发送至 {receiver_email}。"
+        message = f"邮件已加入发送队列，正在发送至 {receiver_email}。"
+        temp_file_paths = []
 # ========================== END: MODIFICATION (需求 ①) ============================
     
-    # 为所有临时文件添加清理任务
+    # 为所有临时文件添加清理任务 (静默运行时邮件不会发送，直接清理)
     if temp_file_paths:
         for path in temp_file_paths:
             background_tasks.add_task(os.remove, path)
@@ -7,6 +7,24 @@ from dotenv import load_dotenv
 env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '..', '.env')
 load_dotenv(dotenv_path=env_path)
 
+
+def _parse_sender_accounts(raw: str, default_per_minute: int, default_per_day: int) -> list[dict]:
+    """
+    解析 SENDER_ACCOUNTS。
+    格式: "邮箱|授权码[|每分钟上限[|每日上限]],..."，未填写的上限使用全局默认值 (0 表示不限制)。
+    """
+    accounts = []
+    for acc in raw.split(','):
+        parts = acc.strip().split('|')
+        accounts.append({
+            "email": parts[0],
+            "password": parts[1],
+            "rate_per_minute": int(parts[2]) if len(parts) > 2 and parts[2] else default_per_minute,
+            "rate_per_day": int(parts[3]) if len(parts) > 3 and parts[3] else default_per_day,
+        })
+    return accounts
+
+
 class Settings:
     """
     应用配置类，从环境变量中读取配置。
@@ -18,20 +36,122 @@ class Settings:
     # 新增对 DATABASE_URL 的读取，并提供一个安全的默认值
     # 这将确保程序即使在 .env 文件中未配置此项时也能正常启动
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./eminder.db")
+    # 异步存储层使用的专用数据库线程数 (异步代码中的数据库 I/O 在这些线程中执行，不阻塞事件循环)
+    SQLITE_EXECUTOR_WORKERS: int = int(os.getenv("SQLITE_EXECUTOR_WORKERS", 4))
     
     # SMTP 配置
     SMTP_SERVER: str = os.getenv("SMTP_SERVER", "smtp.qq.com")
     SMTP_PORT: int = int(os.getenv("SMTP_PORT", 465))
-    
+
+    # SMTP 连接池配置 (每个发信账户独立一个连接池)
+    # - SMTP_POOL_MAX_CONNECTIONS: 单个账户同时保持的最大连接数
+    # - SMTP_POOL_IDLE_TIMEOUT: 连接空闲超过该秒数后不再复用，直接关闭
+    # - SMTP_MAX_MESSAGES_PER_CONNECTION: 单个连接发送该数量邮件后主动回收，避免被服务商限流/断开
+    SMTP_POOL_MAX_CONNECTIONS: int = int(os.getenv("SMTP_POOL_MAX_CONNECTIONS", 3))
+    SMTP_POOL_IDLE_TIMEOUT: float = float(os.getenv("SMTP_POOL_IDLE_TIMEOUT", 60))
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", 50))
+
     # 发件人账户解析
     _sender_accounts_str = os.getenv("SENDER_ACCOUNTS")
     if not _sender_accounts_str:
         raise ValueError("环境变量 SENDER_ACCOUNTS 未设置，请在 .env 文件中配置发信源！")
     
-    SENDER_ACCOUNTS: list[dict] = [
-        {"email": acc.split('|')[0], "password": acc.split('|')[1]}
-        for acc in _sender_accounts_str.split(',')
-    ]
+    # 发信限速配置 (令牌桶，0 表示不限制)
+    # - SENDER_RATE_PER_MINUTE / SENDER_RATE_PER_DAY: 每个发信账户的默认限额，可在 SENDER_ACCOUNTS 中逐个覆盖
+    # - SMTP_MAX_CONCURRENT_SENDS: 全局同时进行中的发送数量上限
+    # - SMTP_RATE_LIMIT_MAX_WAIT: 所有账户都已达上限时最多等待的秒数，超过则本封邮件直接判定失败
+    SENDER_RATE_PER_MINUTE: int = int(os.getenv("SENDER_RATE_PER_MINUTE", 0))
+    SENDER_RATE_PER_DAY: int = int(os.getenv("SENDER_RATE_PER_DAY", 0))
+    SMTP_MAX_CONCURRENT_SENDS: int = int(os.getenv("SMTP_MAX_CONCURRENT_SENDS", 10))
+    SMTP_RATE_LIMIT_MAX_WAIT: float = float(os.getenv("SMTP_RATE_LIMIT_MAX_WAIT", 300))
+
+    SENDER_ACCOUNTS: list[dict] = _parse_sender_accounts(_sender_accounts_str, SENDER_RATE_PER_MINUTE, SENDER_RATE_PER_DAY)
+
+    # 发件箱 (outbox) 投递配置
+    # - OUTBOX_BATCH_SIZE: 后台投递器每批次取出的邮件数量
+    # - OUTBOX_POLL_INTERVAL: 队列为空时的轮询间隔 (秒)
+    # - OUTBOX_MAX_ATTEMPTS: 最大尝试次数，超过后邮件进入死信状态
+    # - OUTBOX_RETRY_BASE_DELAY / OUTBOX_RETRY_MAX_DELAY: 指数退避的初始与最大间隔 (秒)
+    # - OUTBOX_SENT_RETENTION_SECONDS: 已发送邮件 (含完整正文) 在发件箱中保留的时间 (秒)，过期后删除；0 表示永久保留。
+    #   死信邮件不受影响，始终保留以便手动重新入队
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", 20))
+    OUTBOX_POLL_INTERVAL: float = float(os.getenv("OUTBOX_POLL_INTERVAL", 30))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 6))
+    OUTBOX_RETRY_BASE_DELAY: float = float(os.getenv("OUTBOX_RETRY_BASE_DELAY", 30))
+    OUTBOX_RETRY_MAX_DELAY: float = float(os.getenv("OUTBOX_RETRY_MAX_DELAY", 3600))
+    OUTBOX_SENT_RETENTION_SECONDS: float = float(os.getenv("OUTBOX_SENT_RETENTION_SECONDS", 7 * 86400))
+
+    # LLM HTTP 客户端配置 (每个 API 地址共享一个连接池)
+    # - LLM_HTTP2: 是否启用 HTTP/2 (需要安装 h2: pip install "httpx[http2]"，未安装时自动回退到 HTTP/1.1)
+    # - LLM_MAX_CONNECTIONS / LLM_MAX_KEEPALIVE_CONNECTIONS: 连接总数与保持活动的空闲连接数上限
+    # - LLM_KEEPALIVE_EXPIRY: 空闲连接保持的秒数
+    LLM_HTTP2: bool = os.getenv("LLM_HTTP2", "false").lower() in ("1", "true", "yes")
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 10))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))
+
+    # LLM 响应缓存 (持久化在 SQLite 中，相同的服务商/模型/系统提示词/提示词直接复用上次结果)
+    # - LLM_CACHE_TTL_SECONDS: 缓存有效期 (秒)，0 表示关闭缓存
+    # - LLM_CACHE_MAX_ENTRIES: 最多保留的条目数，超出后按最近最少使用 (LRU) 淘汰
+    LLM_CACHE_TTL_SECONDS: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", 86400))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 500))
+
+    # 确定性模板 (元数据中声明 "deterministic": True) 渲染结果的 LRU 缓存条目数，0 表示关闭缓存
+    TEMPLATE_RENDER_CACHE_SIZE: int = int(os.getenv("TEMPLATE_RENDER_CACHE_SIZE", 128))
+    # Markdown 转换结果的 LRU 缓存条目数 (按内容哈希)，0 表示关闭缓存
+    MARKDOWN_CACHE_SIZE: int = int(os.getenv("MARKDOWN_CACHE_SIZE", 256))
+    # 报告文件渲染结果缓存的总容量 (字节)，文件的 mtime 或大小变化后自动失效，0 表示关闭缓存
+    REPORT_CACHE_MAX_BYTES: int = int(os.getenv("REPORT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    # 额外的模板插件文件夹 (其中每个 *.py 文件提供一个 custom_templates 字典，首次使用时才导入)，未配置时为 None
+    TEMPLATE_PLUGIN_DIR: str = os.getenv("TEMPLATE_PLUGIN_DIR")
+
+    # 脚本执行输出捕获 (stdout / stderr 分别计算)
+    # - SCRIPT_OUTPUT_MAX_BYTES: 内存中保留的输出上限，超出后只保留开头和结尾各一半，中间部分省略
+    # - SCRIPT_LOG_DIR: 输出被截断时，完整日志写入该文件夹 (相对路径以 backend 目录为基准)
+    # - SCRIPT_LOG_KEEP: 该文件夹最多保留的完整日志文件数，旧文件自动删除
+    # - SCRIPT_ATTACH_FULL_LOGS: 是否默认把被截断的完整日志作为附件发送 (可被 eminder_meta.json 的 attach_full_logs 覆盖)
+    SCRIPT_OUTPUT_MAX_BYTES: int = int(os.getenv("SCRIPT_OUTPUT_MAX_BYTES", 256 * 1024))
+    SCRIPT_LOG_DIR: str = os.getenv("SCRIPT_LOG_DIR", "logs/script_runs")
+    SCRIPT_LOG_KEEP: int = int(os.getenv("SCRIPT_LOG_KEEP", 50))
+    SCRIPT_ATTACH_FULL_LOGS: bool = os.getenv("SCRIPT_ATTACH_FULL_LOGS", "false").lower() in ("1", "true", "yes")
+
+    # 脚本执行的超时与并发限制
+    # - SCRIPT_DEFAULT_TIMEOUT: 未在模板中单独设置时的超时秒数，0 表示不限制
+    # - SCRIPT_KILL_GRACE_SECONDS: 超时后发送 SIGTERM，等待该秒数仍未退出则 SIGKILL
+    # - SCRIPT_MAX_CONCURRENCY: 同时运行的脚本数量上限，超出的脚本排队等待
+    SCRIPT_DEFAULT_TIMEOUT: float = float(os.getenv("SCRIPT_DEFAULT_TIMEOUT", 3600))
+    SCRIPT_KILL_GRACE_SECONDS: float = float(os.getenv("SCRIPT_KILL_GRACE_SECONDS", 5))
+    SCRIPT_MAX_CONCURRENCY: int = int(os.getenv("SCRIPT_MAX_CONCURRENCY", 4))
+
+    # 脚本模板每封邮件的附件上限 (按附件规则顺序依次加入，超出的文件会在报告中列出)，0 表示不限制
+    ATTACHMENT_MAX_FILES: int = int(os.getenv("ATTACHMENT_MAX_FILES", 50))
+    ATTACHMENT_MAX_TOTAL_MB: float = float(os.getenv("ATTACHMENT_MAX_TOTAL_MB", 20))
+
+    # 附件压缩 / 打包 (模板可在返回值的 "attachment_bundle" 中逐个覆盖)
+    # - ATTACHMENT_BUNDLE_MODE: none (原样发送) / zip (打包为一个 zip) / gzip (逐个文件 gzip)
+    # - ATTACHMENT_BUNDLE_THRESHOLD_MB: 附件总大小达到该值时才压缩
+    # - ATTACHMENT_BUNDLE_DIR / ATTACHMENT_BUNDLE_CACHE_MAX_MB: 压缩结果缓存的位置与总容量
+    ATTACHMENT_BUNDLE_MODE: str = os.getenv("ATTACHMENT_BUNDLE_MODE", "none")
+    ATTACHMENT_BUNDLE_THRESHOLD_MB: float = float(os.getenv("ATTACHMENT_BUNDLE_THRESHOLD_MB", 5))
+    ATTACHMENT_BUNDLE_DIR: str = os.getenv("ATTACHMENT_BUNDLE_DIR", "cache/attachment_bundles")
+    ATTACHMENT_BUNDLE_CACHE_MAX_MB: float = float(os.getenv("ATTACHMENT_BUNDLE_CACHE_MAX_MB", 200))
+
+    # 附件流式编码 (附件和内嵌图片在发送时从磁盘分块读取、在工作线程中 base64 编码后直接写入 SMTP 连接)
+    # - SMTP_STREAM_CHUNK_KB: 每次读取的原始字节数 (KB)，决定单封邮件发送时附件部分的内存占用
+    # - ATTACHMENT_INLINE_MAX_KB: 不超过该大小的文件只编码一次并保存在内存中，群发时不再重复读取
+    SMTP_STREAM_CHUNK_KB: int = int(os.getenv("SMTP_STREAM_CHUNK_KB", 64))
+    ATTACHMENT_INLINE_MAX_KB: int = int(os.getenv("ATTACHMENT_INLINE_MAX_KB", 256))
+
+    # 脚本资源限制与用量统计 (仅 Linux / macOS，通过 rlimit 实现；模板中可逐个覆盖，0 表示不限制)
+    # - SCRIPT_RESOURCE_ACCOUNTING: 未设置任何限制时，是否也通过启动器运行脚本以记录 CPU 时间和峰值内存
+    #   (默认关闭，避免每次运行都多启动一个 Python 解释器；设置了任一限制时总会经由启动器运行)
+    # - SCRIPT_CPU_LIMIT_SECONDS: CPU 时间上限 (秒)，按进程计算：脚本派生的每个进程各自受此限制，而不是整个任务的总和
+    # - SCRIPT_MEMORY_LIMIT_MB: 虚拟内存 (地址空间) 上限 (MB)
+    # - SCRIPT_MAX_OPEN_FILES: 可同时打开的文件数上限
+    SCRIPT_RESOURCE_ACCOUNTING: bool = os.getenv("SCRIPT_RESOURCE_ACCOUNTING", "false").lower() in ("1", "true", "yes")
+    SCRIPT_CPU_LIMIT_SECONDS: int = int(os.getenv("SCRIPT_CPU_LIMIT_SECONDS", 0))
+    SCRIPT_MEMORY_LIMIT_MB: int = int(os.getenv("SCRIPT_MEMORY_LIMIT_MB", 0))
+    SCRIPT_MAX_OPEN_FILES: int = int(os.getenv("SCRIPT_MAX_OPEN_FILES", 0))
 
     # 定时任务配置
     DAILY_SUMMARY_CRON: str = os.getenv("DAILY_SUMMARY_CRON", "0 8 * * *")
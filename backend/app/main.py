@@ -2,9 +2,10 @@
 
 from fastapi import FastAPI
 # ========================== START: MODIFICATION ==========================
-from .api import subscribers, templates, jobs, llm # 导入新的 llm 模块
+from .api import subscribers, templates, jobs, llm, outbox, scripts # 导入新的 llm 模块
 # ========================== END: MODIFICATION ============================
 import os
+import sys
 import logging
 from .core.logging_config import setup_logging
 # ========================== END: MODIFICATION (Logging Setup) ============================
@@ -22,6 +23,8 @@ app.include_router(jobs.router, prefix="/api", tags=["Scheduled Jobs"])
 # ========================== START: MODIFICATION ==========================
 # DESIGNER'S NOTE: 挂载新的 LLM 配置管理路由。
 app.include_router(llm.router, prefix="/api/llm", tags=["LLM Settings"])
+app.include_router(outbox.router, prefix="/api", tags=["Outbox"])
+app.include_router(scripts.router, prefix="/api", tags=["Scripts"])
 # ========================== END: MODIFICATION ============================
 
 
@@ -46,19 +49,34 @@ def startup_event():
     
     from .services.scheduler_service import scheduler_service
     scheduler_service.start()
+
+    # 启动发件箱后台投递器 (会先恢复上次中断的投递)
+    from .services.outbox_service import outbox_dispatcher
+    outbox_dispatcher.start()
     # ========================== START: MODIFICATION (Logging) ==========================
     logger.info("Application startup sequence completed.")
     # ========================== END: MODIFICATION (Logging) ============================
 
 @app.on_event("shutdown")
-def shutdown_event():
-    """应用关闭时，关闭后台调度器"""
+async def shutdown_event():
+    """应用关闭时，关闭后台调度器、发件箱投递器，并释放 SMTP 连接池、LLM HTTP 客户端和数据库连接"""
     # ========================== START: MODIFICATION (Logging) ==========================
     logger = logging.getLogger(__name__)
     logger.info("Application shutdown sequence initiated.")
     # ========================== END: MODIFICATION (Logging) ============================
     from .services.scheduler_service import scheduler_service
     scheduler_service.shutdown()
+    from .services.outbox_service import outbox_dispatcher
+    await outbox_dispatcher.stop()
+    from .services.email_service import email_service
+    await email_service.close()
+    # LLM 服务按需加载，从未使用过时无需 (也不应为了关闭而) 导入
+    llm_module = sys.modules.get(f"{__package__}.services.llm_service")
+    if llm_module is not None:
+        await llm_module.llm_service.close()
+    from .storage.sqlite_store import store, async_store
+    async_store.shutdown()
+    store.close()
     # ========================== START: MODIFICATION (Logging) ==========================
     logger.info("Application shutdown sequence completed.")
     # ========================== END: MODIFICATION (Logging) ============================
@@ -0,0 +1,213 @@
+# backend/app/services/attachment_bundler.py (新文件)
+import asyncio
+import contextlib
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import zipfile
+from ..core.config import settings
+from ..storage.sqlite_store import store
+
+logger = logging.getLogger(__name__)
+
+# DESIGNER'S NOTE:
+# 脚本运行、本地文件报告等邮件经常携带大量日志 / CSV 附件，原样发送既占带宽又容易超出服务商的邮件大小上限。
+# 模板可以在返回值中提供 "attachment_bundle" 配置 (或使用全局默认配置)，附件总大小超过阈值时：
+# - mode = "zip":  把所有附件打包为一个 zip (已压缩的格式如 .png / .zip 仅存储不再压缩)；
+# - mode = "gzip": 逐个文件 gzip 压缩 (已压缩的格式保持原样)。
+# 压缩在工作线程中以流式方式进行，不会把整个文件读入内存；
+# 生成的文件按 (路径, mtime_ns, 大小) 集合缓存，附件未变化时重复发送直接复用已生成的压缩包。
+BUNDLE_MODES = ("none", "zip", "gzip")
+# 已经是压缩格式的文件，再压缩几乎没有收益
+PRECOMPRESSED_EXTENSIONS = {
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".zst",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".mp3", ".mp4", ".mkv", ".mov", ".pdf", ".docx", ".xlsx", ".pptx",
+}
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+# 最近使用过的条目可能正被其他任务发送 (尚未写入发件箱)，清理缓存时不会删除
+PRUNE_GRACE_SECONDS = 600
+
+
+def _is_precompressed(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in PRECOMPRESSED_EXTENSIONS
+
+
+class AttachmentBundler:
+    """附件压缩 / 打包，结果缓存在磁盘上。"""
+
+    def __init__(self, cache_dir: str, cache_max_bytes: int, default_config: dict):
+        self._cache_dir = cache_dir if os.path.isabs(cache_dir) else os.path.join(BACKEND_DIR, cache_dir)
+        self._cache_max_bytes = cache_max_bytes
+        self._default_config = default_config
+        # 同一个缓存条目只由一个线程生成；不同条目可以并行生成
+        self._key_locks = {}  # key -> [锁, 使用者数量]
+        self._key_locks_guard = threading.Lock()
+
+    def _resolve_config(self, config: dict = None) -> dict:
+        resolved = dict(self._default_config)
+        resolved.update({key: value for key, value in (config or {}).items() if value not in (None, "")})
+        resolved["mode"] = str(resolved.get("mode") or "none").lower()
+        if resolved["mode"] not in BUNDLE_MODES:
+            logger.warning(f"未知的附件打包方式 '{resolved['mode']}'，将原样发送附件。")
+            resolved["mode"] = "none"
+        return resolved
+
+    @staticmethod
+    def _cache_key(*parts) -> str:
+        return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:32]
+
+    @contextlib.contextmanager
+    def _key_lock(self, key: str):
+        """按缓存 key 加锁，不再使用的锁随即释放。"""
+        with self._key_locks_guard:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._key_locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def _cached_output(self, key: str, filename: str, build) -> str:
+        """返回缓存目录中 key 对应的输出文件，不存在时调用 build(临时路径) 生成。"""
+        entry_dir = os.path.join(self._cache_dir, key)
+        output_path = os.path.join(entry_dir, filename)
+        with self._key_lock(key):
+            if os.path.isfile(output_path):
+                # 更新修改时间，使缓存清理按“最近使用”淘汰
+                os.utime(output_path)
+                return output_path
+            os.makedirs(entry_dir, exist_ok=True)
+            tmp_path = output_path + ".tmp"
+            try:
+                build(tmp_path)
+                os.replace(tmp_path, output_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return output_path
+
+    def _build_zip(self, files: list, archive_name: str) -> str:
+        """files: [(路径, mtime_ns, 大小), ...]"""
+        def build(tmp_path):
+            used_names = set()
+            with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+                for index, (path, _, _) in enumerate(files):
+                    arcname = os.path.basename(path)
+                    if arcname in used_names:
+                        arcname = f"{index}_{arcname}"
+                    used_names.add(arcname)
+                    # ZipFile.write 分块读取源文件，内存占用与文件大小无关
+                    archive.write(path, arcname, compress_type=zipfile.ZIP_STORED if _is_precompressed(path) else zipfile.ZIP_DEFLATED)
+
+        return self._cached_output(self._cache_key("zip", archive_name, files), archive_name, build)
+
+    def _build_gzip(self, path: str, mtime_ns: int, size: int) -> str:
+        def build(tmp_path):
+            with open(path, "rb") as source, gzip.open(tmp_path, "wb", compresslevel=6) as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+
+        return self._cached_output(self._cache_key("gzip", path, mtime_ns, size), os.path.basename(path) + ".gz", build)
+
+    def _pinned_entries(self) -> set:
+        """发件箱中尚未发送成功的邮件仍引用的缓存条目 (重试时需要这些文件)。"""
+        try:
+            paths = store.get_outbox_referenced_paths()
+        except Exception as e:
+            logger.warning(f"读取发件箱引用的附件失败，本次跳过缓存清理: {e}")
+            return None
+        cache_dir = os.path.abspath(self._cache_dir)
+        return {os.path.dirname(os.path.abspath(path)) for path in paths if os.path.abspath(path).startswith(cache_dir + os.sep)}
+
+    def _prune_cache(self, keep: set):
+        """
+        缓存目录总大小超过上限时，删除最久未使用的条目。以下条目不会被删除：
+        本次刚生成 / 使用的条目 (keep)、最近 PRUNE_GRACE_SECONDS 秒内使用过的条目、发件箱中待重试邮件引用的条目。
+        """
+        if self._cache_max_bytes <= 0 or not os.path.isdir(self._cache_dir):
+            return
+        pinned = self._pinned_entries()
+        if pinned is None:
+            return
+        keep = keep | pinned
+        recent = time.time_ns() - PRUNE_GRACE_SECONDS * 1_000_000_000
+        entries = []
+        with os.scandir(self._cache_dir) as entry_dirs:
+            for entry_dir in entry_dirs:
+                if not entry_dir.is_dir():
+                    continue
+                size, mtime = 0, 0
+                with os.scandir(entry_dir.path) as files:
+                    for f in files:
+                        stat_result = f.stat()
+                        size += stat_result.st_size
+                        mtime = max(mtime, stat_result.st_mtime_ns)
+                entries.append((mtime, size, entry_dir.path))
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self._cache_max_bytes:
+                break
+            if path in keep or mtime >= recent:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def bundle(self, paths: list, config: dict = None) -> list:
+        """
+        同步版本 (会读写文件，请在工作线程中调用)。
+        :return: 替换后的附件路径列表；未达到阈值或未启用时原样返回。
+        """
+        config = self._resolve_config(config)
+        if config["mode"] == "none" or not paths:
+            return list(paths)
+
+        files, missing = [], []
+        for path in dict.fromkeys(paths):
+            try:
+                stat_result = os.stat(path)
+                files.append((os.path.abspath(path), stat_result.st_mtime_ns, stat_result.st_size))
+            except OSError:
+                # 不存在的文件保持原样，由邮件构建时报告错误
+                missing.append(path)
+        total_bytes = sum(size for _, _, size in files)
+        if total_bytes < float(config.get("threshold_mb", 0)) * 1024 * 1024:
+            return list(paths)
+
+        try:
+            if config["mode"] == "zip":
+                bundled = [self._build_zip(files, config.get("archive_name") or "attachments.zip")]
+            else:
+                bundled = [path if _is_precompressed(path) else self._build_gzip(path, mtime_ns, size) for path, mtime_ns, size in files]
+            self._prune_cache({os.path.dirname(path) for path in bundled})
+        except OSError as e:
+            logger.error(f"附件打包失败，将原样发送附件: {e}", exc_info=True)
+            return list(paths)
+
+        bundled_bytes = sum(os.path.getsize(path) for path in bundled)
+        logger.info(f"附件已按 '{config['mode']}' 打包: {len(files)} 个文件 {total_bytes} 字节 -> {len(bundled)} 个文件 {bundled_bytes} 字节。")
+        return bundled + missing
+
+    async def bundle_async(self, paths: list, config: dict = None) -> list:
+        """在工作线程中打包附件，不阻塞事件循环。"""
+        if self._resolve_config(config)["mode"] == "none" or not paths:
+            return list(paths or [])
+        return await asyncio.to_thread(self.bundle, paths, config)
+
+
+# 创建一个全局附件打包器实例
+attachment_bundler = AttachmentBundler(
+    cache_dir=settings.ATTACHMENT_BUNDLE_DIR,
+    cache_max_bytes=int(settings.ATTACHMENT_BUNDLE_CACHE_MAX_MB * 1024 * 1024),
+    default_config={
+        "mode": settings.ATTACHMENT_BUNDLE_MODE,
+        "threshold_mb": settings.ATTACHMENT_BUNDLE_THRESHOLD_MB,
+        "archive_name": "attachments.zip",
+    },
+)
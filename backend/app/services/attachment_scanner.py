@@ -0,0 +1,148 @@
+# backend/app/services/attachment_scanner.py (新文件)
+import asyncio
+import fnmatch
+import glob
+import logging
+import os
+import stat
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# DESIGNER'S NOTE:
+# 脚本模板原先逐条串行解析附件规则：glob.glob / os.listdir 之后再对每个结果调用 os.path.isfile，
+# 一条指向大目录的规则会产生成千上万次 stat，并且把匹配到的文件全部作为附件发出。
+# 这里的扫描器：
+# - 使用 os.scandir，每个目录项最多一次 stat (is_file 通常直接使用目录项自带的类型信息)；
+# - 所有规则通过 asyncio.to_thread 并发扫描，不阻塞事件循环；
+# - 按“每封邮件最多文件数 / 总字节数”截断，并报告被跳过的文件及原因。
+
+
+@dataclass
+class RuleScanResult:
+    """单条规则的扫描结果。kind: "dir" | "glob" | "file" | "error"。"""
+    rule: str
+    kind: str
+    files: list = field(default_factory=list)  # [(路径, 字节数), ...]
+    error: str = None
+
+
+@dataclass
+class AttachmentScanReport:
+    attachments: list            # 最终发送的附件路径 (已去重、排序)
+    total_bytes: int
+    rule_results: list           # 与规则一一对应的 RuleScanResult
+    missing_paths: list          # 显式指定但不存在的路径
+    skipped: list                # [(路径, 字节数, 原因), ...]
+
+
+def _scan_directory(path: str) -> list:
+    """目录下一级深度的所有文件 (不递归，为了安全)。"""
+    files = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    files.append((entry.path, entry.stat().st_size))
+            except OSError:
+                continue
+    return files
+
+
+def _scan_glob(pattern: str) -> list:
+    """通配符匹配。最后一级以外不含通配符时，直接 scandir 父目录并用 fnmatch 过滤。"""
+    directory, name_pattern = os.path.split(pattern)
+    if glob.has_magic(directory):
+        files = []
+        for match in glob.iglob(pattern):
+            try:
+                stat_result = os.stat(match)
+            except OSError:
+                continue
+            if not stat.S_ISDIR(stat_result.st_mode):
+                files.append((match, stat_result.st_size))
+        return files
+
+    files = []
+    # 与 glob 一致：除非模式本身以 "." 开头，否则不匹配隐藏文件
+    include_hidden = name_pattern.startswith('.')
+    try:
+        with os.scandir(directory or os.curdir) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') and not include_hidden:
+                    continue
+                if not fnmatch.fnmatch(entry.name, name_pattern):
+                    continue
+                try:
+                    if entry.is_file():
+                        files.append((os.path.join(directory, entry.name) if directory else entry.name, entry.stat().st_size))
+                except OSError:
+                    continue
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    return files
+
+
+def scan_rule(rule: str) -> RuleScanResult:
+    """解析一条附件规则：目录 / 通配符 / 普通文件路径。"""
+    try:
+        if glob.has_magic(rule):
+            return RuleScanResult(rule, "glob", _scan_glob(rule))
+        try:
+            stat_result = os.stat(rule)
+        except FileNotFoundError:
+            return RuleScanResult(rule, "glob", [])
+        if stat.S_ISDIR(stat_result.st_mode):
+            return RuleScanResult(rule, "dir", _scan_directory(rule))
+        return RuleScanResult(rule, "file", [(rule, stat_result.st_size)])
+    except Exception as e:
+        return RuleScanResult(rule, "error", error=str(e))
+
+
+def _stat_explicit_paths(paths: list) -> tuple[list, list]:
+    """显式路径 (脚本配置中的附件、完整日志)：返回 (存在的 [(路径, 字节数)], 不存在的路径)。"""
+    found, missing = [], []
+    for path in paths:
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            missing.append(path)
+            continue
+        if stat.S_ISDIR(stat_result.st_mode):
+            missing.append(path)
+        else:
+            found.append((path, stat_result.st_size))
+    return found, missing
+
+
+async def scan_attachments(rules: list, explicit_paths: list = None, max_files: int = 0, max_bytes: int = 0) -> AttachmentScanReport:
+    """
+    并发解析所有附件规则并应用上限。
+    :param rules: 附件规则 (目录、通配符或文件路径)。
+    :param explicit_paths: 必须是文件的显式路径 (绝对路径)。它们排在规则匹配结果之前，优先占用上限。
+    :param max_files / max_bytes: 每封邮件的附件数量与总字节数上限，0 表示不限制。
+    """
+    rule_results, (explicit_files, missing) = await asyncio.gather(
+        asyncio.gather(*(asyncio.to_thread(scan_rule, rule) for rule in rules)),
+        asyncio.to_thread(_stat_explicit_paths, explicit_paths or []),
+    )
+
+    # 先接受显式指定的文件，再按规则顺序 (规则内按路径) 依次接受，直到达到上限
+    candidates = explicit_files + [item for result in rule_results for item in sorted(result.files)]
+    accepted, skipped, seen = [], [], set()
+    total_bytes = 0
+    for path, size in candidates:
+        if path in seen:
+            continue
+        seen.add(path)
+        if max_files and len(accepted) >= max_files:
+            skipped.append((path, size, f"超过附件数量上限 ({max_files} 个)"))
+        elif max_bytes and total_bytes + size > max_bytes:
+            skipped.append((path, size, f"超过附件总大小上限 ({max_bytes / 1024 / 1024:.1f} MB)"))
+        else:
+            accepted.append(path)
+            total_bytes += size
+
+    if skipped:
+        logger.warning(f"附件扫描：{len(skipped)} 个文件因超出上限被跳过。")
+    return AttachmentScanReport(sorted(accepted), total_bytes, list(rule_results), missing, skipped)
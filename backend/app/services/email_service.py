@@ -1,8 +1,17 @@
 # backend/app/services/email_service.py (已修改)
 import aiosmtplib # 导入异步 SMTP 库
+import asyncio
+import base64
+import contextlib
+import email.generator
+import email.message
+import email.policy
+import io
+import mimetypes
 import ssl
 import os
-import random
+import re
+import time
 # ========================== START: MODIFICATION (Requirement: Logging) ==========================
 # DESIGNER'S NOTE: 
 # 引入 logging 模块，将邮件发送的关键操作记录到日志文件中，而不是仅仅打印到控制台。
@@ -23,6 +32,478 @@ from ..core.config import settings
 logger = logging.getLogger(__name__)
 # ========================== END: MODIFICATION (Requirement: Logging) ============================
 
+
+# ========================== START: MODIFICATION (SMTP Connection Pool) ==========================
+# DESIGNER'S NOTE:
+# 之前每封邮件都调用 aiosmtplib.send()，即每个收件人都要经历一次完整的
+# TCP 连接 + TLS 握手 + AUTH 认证。群发时这部分开销占据了绝大部分耗时。
+# 现在为每个发信账户维护一个已认证连接的池，群发时复用“热”连接。
+class SMTPDisconnectedBeforeData(aiosmtplib.SMTPServerDisconnected):
+    """连接在 DATA 命令之前 (MAIL / RCPT 阶段) 断开：服务器肯定没有接收这封邮件，可以安全重试。"""
+
+
+class _PooledSMTPConnection:
+    """连接池中的一个已认证连接，附带复用统计信息。"""
+
+    def __init__(self, client: aiosmtplib.SMTP):
+        self.client = client
+        self.last_used = time.monotonic()
+        self.messages_sent = 0
+        # 会话是否停在一次未完成的邮件事务中 (MAIL 之后、成功结束或 RSET 之前)；这样的连接不能复用
+        self.session_dirty = False
+
+
+class SMTPConnectionPool:
+    """
+    单个发信账户的 SMTP 连接池。
+    - 连接在首次需要时建立 (connect 时自动完成 TLS 与登录)，用完后归还以便复用。
+    - 空闲超过 idle_timeout 秒、或已发送 max_messages 封邮件的连接会被回收。
+    - 同时借出的连接数不超过 max_connections。
+    """
+
+    def __init__(self, hostname: str, port: int, username: str, password: str,
+                 max_connections: int, idle_timeout: float, max_messages: int):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self._idle: list[_PooledSMTPConnection] = []
+        self._semaphore = asyncio.Semaphore(max(1, max_connections))
+
+    def _is_reusable(self, conn: _PooledSMTPConnection) -> bool:
+        return (
+            conn.client.is_connected
+            and time.monotonic() - conn.last_used < self.idle_timeout
+            and conn.messages_sent < self.max_messages
+        )
+
+    async def _open(self) -> _PooledSMTPConnection:
+        # use_tls=True 对应 SMTP_SSL；提供了用户名和密码时 connect() 会自动完成登录
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=True,
+        )
+        await client.connect()
+        logger.debug(f"SMTP 连接池：已为 [{self.username}] 建立新的连接。")
+        return _PooledSMTPConnection(client)
+
+    @staticmethod
+    async def _discard(conn: _PooledSMTPConnection, graceful: bool = True):
+        """关闭一个连接。正常回收时发送 QUIT，出错的连接则直接断开。"""
+        if graceful and conn.client.is_connected:
+            try:
+                await conn.client.quit()
+                return
+            except Exception:
+                pass
+        conn.client.close()
+
+    async def _prune_idle(self):
+        """回收所有已失效的空闲连接。"""
+        alive = []
+        for conn in self._idle:
+            if self._is_reusable(conn):
+                alive.append(conn)
+            else:
+                await self._discard(conn)
+        self._idle = alive
+
+    @contextlib.asynccontextmanager
+    async def connection(self, fresh: bool = False):
+        """
+        借出一个可用连接。
+        如果在使用期间抛出异常，该连接会被直接丢弃；
+        除非会话已恢复干净 (例如收件人被拒后已发送 RSET) 且连接仍然存活，此时照常归还。
+        :param fresh: 为 True 时总是建立新连接，不复用空闲连接 (用于断线后的重试)。
+        """
+        async with self._semaphore:
+            await self._prune_idle()
+            conn = self._idle.pop() if self._idle and not fresh else await self._open()
+            try:
+                yield conn
+            except BaseException:
+                if conn.session_dirty or not conn.client.is_connected:
+                    await self._discard(conn, graceful=False)
+                else:
+                    await self._release(conn)
+                raise
+            await self._release(conn)
+
+    async def _release(self, conn: _PooledSMTPConnection):
+        conn.last_used = time.monotonic()
+        if self._is_reusable(conn):
+            self._idle.append(conn)
+        else:
+            await self._discard(conn)
+
+    async def close(self):
+        """关闭所有空闲连接 (应用关闭时调用)。"""
+        while self._idle:
+            await self._discard(self._idle.pop())
+# ========================== END: MODIFICATION (SMTP Connection Pool) ============================
+
+
+# ========================== START: MODIFICATION (Prepared Message) ==========================
+# DESIGNER'S NOTE:
+# 群发时主题、正文、附件对每个收件人都完全相同，但之前每个收件人都会重新构建 MIME 树、
+# 重新读取附件并重新做 base64 编码。PreparedMessage 把这些工作只做一次：
+# 邮件结构在构建时就被序列化为字节，HTML 正文单独编码一次，
+# 发送时只需为每个收件人拼接 From / To / Subject 头部即可。
+# ========================== START: MODIFICATION (Streamed Attachments) ==========================
+# DESIGNER'S NOTE:
+# 之前附件和内嵌图片在构建邮件时被 f.read() 整个读入内存，再由 email 包一次性编码成一个大字符串，
+# 并且这些工作都发生在事件循环线程上：多 MB 的附件 + 并发发送会造成内存峰值，事件循环也会卡住。
+# 现在 MIME 树中的每个文件只是一个占位符，序列化后的邮件是一串“片段”(字节 / HTML 正文 / 文件)；
+# 发送时文件按 57 字节整数倍的块读取 (正好对应完整的 base64 行)，在工作线程中编码后直接写入 SMTP 连接。
+# 单次发送的内存占用只与块大小有关；不超过 ATTACHMENT_INLINE_MAX_KB 的小文件编码一次后缓存，群发时复用。
+_PLACEHOLDER_PATTERN = re.compile(rb"@@EMINDER-(HTML-BODY|FILE-\d+)@@")
+# base64 每 57 字节原始数据对应一行 76 个字符
+_BASE64_LINE_BYTES = 57
+_STREAM_CHUNK_BYTES = max(1, settings.SMTP_STREAM_CHUNK_KB * 1024 // _BASE64_LINE_BYTES) * _BASE64_LINE_BYTES
+_INLINE_MAX_BYTES = settings.ATTACHMENT_INLINE_MAX_KB * 1024
+
+
+def _encode_base64(data: bytes) -> bytes:
+    """编码为以 CRLF 分隔的 76 字符行 (末尾不带换行，由 MIME 结构中的占位符之后的换行补上)。"""
+    return base64.encodebytes(data).replace(b"\n", b"\r\n").rstrip(b"\r\n")
+
+
+def _read_encoded(f, chunk_size: int) -> bytes:
+    data = f.read(chunk_size)
+    return _encode_base64(data) if data else b""
+
+
+class _FileSegment:
+    """邮件中的一个文件 (附件或内嵌图片)，发送时才从磁盘分块读取并编码。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._encoded = None  # 小文件的编码结果
+
+    async def iter_encoded(self):
+        """逐块产出该文件的 base64 编码 (读取与编码在工作线程中进行)。"""
+        if self._encoded is not None:
+            yield self._encoded
+            return
+        f = await asyncio.to_thread(open, self.path, "rb")
+        try:
+            cache = os.fstat(f.fileno()).st_size <= _INLINE_MAX_BYTES
+            pieces, separator = [], b""
+            while True:
+                encoded = await asyncio.to_thread(_read_encoded, f, _STREAM_CHUNK_BYTES)
+                if not encoded:
+                    break
+                # 块之间补上被 _encode_base64 去掉的行尾
+                piece, separator = separator + encoded, b"\r\n"
+                if cache:
+                    pieces.append(piece)
+                else:
+                    yield piece
+            if cache:
+                self._encoded = b"".join(pieces)
+                yield self._encoded
+        finally:
+            f.close()
+
+
+def _guess_subtype(path: str, maintype: str) -> str:
+    """按扩展名推断 MIME 子类型 (不再读取文件内容来猜测)。"""
+    guessed, _ = mimetypes.guess_type(path)
+    if guessed and guessed.startswith(maintype + "/"):
+        return guessed.split("/", 1)[1]
+    return "octet-stream"
+# ========================== END: MODIFICATION (Streamed Attachments) ============================
+
+
+class PreparedMessage:
+    """
+    一封已序列化、可重复发送给多个收件人的邮件。
+    由 EmailService.prepare_message() 创建。
+    """
+
+    # HTML 正文在 MIME 树中的占位符。包含 base64 字母表之外的字符，不会与附件编码内容冲突。
+    HTML_PLACEHOLDER = "@@EMINDER-HTML-BODY@@"
+    # 文件 (附件 / 内嵌图片) 的占位符，序号对应 files 中的位置
+    FILE_PLACEHOLDER = "@@EMINDER-FILE-{index}@@"
+    _POLICY = email.policy.compat32.clone(linesep="\r\n")
+
+    def __init__(self, subject: str, html_content: str, mime_message: MIMEMultipart, files: list[str] = None):
+        self.subject = subject
+        self.html_content = html_content
+        file_segments = [_FileSegment(path) for path in files or []]
+        # 片段：字节原样发送；None 代表 HTML 正文；_FileSegment 在发送时流式编码
+        parts = _PLACEHOLDER_PATTERN.split(self._flatten(mime_message))
+        segments = []
+        for index, part in enumerate(parts):
+            if index % 2 == 0:
+                if part:
+                    segments.append(part)
+            elif part == b"HTML-BODY":
+                segments.append(None)
+            else:
+                segments.append(file_segments[int(part[len(b"FILE-"):])])
+        self._segments = tuple(segments)
+        self._encoded_html = self._encode_html(html_content)
+
+    def with_body(self, subject: str, html_content: str) -> "PreparedMessage":
+        """
+        返回主题和 HTML 正文被替换、其余部分 (附件、内嵌图片) 共享的新邮件。
+        用于按收件人个性化：附件只编码一次，每个收件人只重新编码自己的正文。
+        """
+        clone = object.__new__(PreparedMessage)
+        clone.subject = subject
+        clone.html_content = html_content
+        clone._segments = self._segments
+        clone._encoded_html = self._encoded_html if html_content == self.html_content else self._encode_html(html_content)
+        return clone
+
+    @classmethod
+    def _flatten(cls, message) -> bytes:
+        buffer = io.BytesIO()
+        email.generator.BytesGenerator(buffer, mangle_from_=False, policy=cls._POLICY).flatten(message)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _encode_html(html_content: str) -> bytes:
+        return _encode_base64(html_content.encode("utf-8"))
+
+    def _render_headers(self, sender_email: str, receiver_email: str) -> bytes:
+        headers = email.message.Message()
+        headers["Subject"] = self.subject
+        headers["From"] = f"EMinder <{sender_email}>"
+        headers["To"] = receiver_email
+        # 只取头部，去掉生成器在头部之后追加的空行
+        return self._flatten(headers).rstrip(b"\r\n") + b"\r\n"
+
+    async def stream(self, sender_email: str, receiver_email: str):
+        """逐块产出发往指定收件人的完整邮件字节流，文件内容在此时才读取和编码。"""
+        yield self._render_headers(sender_email, receiver_email)
+        for segment in self._segments:
+            if segment is None:
+                yield self._encoded_html
+            elif isinstance(segment, bytes):
+                yield segment
+            else:
+                async with contextlib.aclosing(segment.iter_encoded()) as chunks:
+                    async for chunk in chunks:
+                        yield chunk
+
+    async def render(self, sender_email: str, receiver_email: str) -> bytes:
+        """生成完整邮件字节流 (会把附件全部读入内存，仅用于调试或需要完整邮件的场合)。"""
+        async with contextlib.aclosing(self.stream(sender_email, receiver_email)) as chunks:
+            return b"".join([chunk async for chunk in chunks])
+# ========================== END: MODIFICATION (Prepared Message) ============================
+
+
+# ========================== START: MODIFICATION (Send Queue & Rate Limiting) ==========================
+# DESIGNER'S NOTE:
+# 之前群发时所有邮件同时发出，并且随机挑选发信账户，完全不考虑服务商的限流策略，
+# 一旦触发限流，整批邮件都会被拒。现在：
+# 1. 全局信号量限制同时进行中的发送数量 (SMTP_MAX_CONCURRENT_SENDS)，超出的发送请求排队等待；
+# 2. 每个发信账户拥有“每分钟”和“每日”两个令牌桶；
+# 3. 每封邮件路由到当前负载最低 (进行中最少、累计发送最少) 且仍有配额的账户。
+class SenderRateLimitExceeded(Exception):
+    """所有发信账户的配额均已耗尽，且无法在允许的时间内恢复。"""
+
+
+class TokenBucket:
+    """简单的令牌桶：容量为 capacity，每 period 秒匀速补满。"""
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = float(capacity)
+        self.fill_rate = capacity / period
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.fill_rate)
+        self._updated = now
+
+    def time_until_available(self) -> float:
+        """距离至少有一个可用令牌还需等待的秒数 (0 表示立即可用)。"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.fill_rate
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class _SenderAccountState:
+    """单个发信账户的限速与负载状态。"""
+
+    def __init__(self, account: dict):
+        self.account = account
+        self.in_flight = 0
+        self.sent_total = 0
+        self.buckets = []
+        if account.get("rate_per_minute"):
+            self.buckets.append(TokenBucket(account["rate_per_minute"], 60))
+        if account.get("rate_per_day"):
+            self.buckets.append(TokenBucket(account["rate_per_day"], 86400))
+
+    def time_until_available(self) -> float:
+        return max((bucket.time_until_available() for bucket in self.buckets), default=0.0)
+
+    def consume(self):
+        for bucket in self.buckets:
+            bucket.consume()
+
+
+class SenderAccountScheduler:
+    """
+    发信调度器：为每封邮件分配发信账户，并限制全局并发。
+    所有状态只在事件循环线程中读写，因此无需额外加锁。
+    """
+
+    def __init__(self, accounts: list[dict], max_concurrency: int, max_wait: float):
+        self._states = [_SenderAccountState(account) for account in accounts]
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self.max_wait = max_wait
+
+    async def _acquire_account(self) -> _SenderAccountState:
+        waited = 0.0
+        while True:
+            ready = [state for state in self._states if state.time_until_available() == 0]
+            if ready:
+                state = min(ready, key=lambda st: (st.in_flight, st.sent_total))
+                state.consume()
+                state.in_flight += 1
+                return state
+
+            delay = min(state.time_until_available() for state in self._states)
+            if waited + delay > self.max_wait:
+                raise SenderRateLimitExceeded(
+                    f"所有发信账户均已达到发送上限，预计还需等待 {delay:.0f} 秒，超过允许的最长等待时间 {self.max_wait:.0f} 秒。"
+                )
+            logger.info(f"发信限速：所有账户暂无可用配额，等待 {delay:.1f} 秒后重试。")
+            await asyncio.sleep(delay)
+            waited += delay
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """占用一个全局发送名额，并分配一个发信账户。退出时释放。"""
+        async with self._semaphore:
+            state = await self._acquire_account()
+            try:
+                yield state.account
+            finally:
+                state.in_flight -= 1
+                state.sent_total += 1
+
+# ========================== END: MODIFICATION (Send Queue & Rate Limiting) ============================
+
+
+# ========================== START: MODIFICATION (SMTP Data Streaming) ==========================
+# DESIGNER'S NOTE:
+# aiosmtplib 的 sendmail() / data() 只接受完整的邮件字节串。为了把附件逐块写入连接，
+# 这里自行完成 MAIL / RCPT / DATA，并直接使用 SMTP.protocol 的 write / read_response / _drain_helper
+# 以及 _command_lock。这些内部接口只在这一个类里使用，并在启动时检查版本与接口是否存在；
+# 不满足时退回到公开的 sendmail() (附件会被整体读入内存，但功能不受影响)。
+class _SMTPDataStreamer:
+    """以流的方式发送 PreparedMessage；对 aiosmtplib 内部接口的依赖全部集中于此。"""
+
+    # 已验证过的 aiosmtplib 主版本
+    SUPPORTED_MAJOR_VERSIONS = (4,)
+    _PROTOCOL_METHODS = ("write", "read_response", "_drain_helper")
+
+    def __init__(self):
+        self.streaming_enabled = self._check_support()
+
+    def _check_support(self) -> bool:
+        version = getattr(aiosmtplib, "__version__", "")
+        try:
+            major = int(version.split(".")[0])
+        except ValueError:
+            major = None
+        if major not in self.SUPPORTED_MAJOR_VERSIONS:
+            logger.warning(f"aiosmtplib {version} 未经验证，附件将不使用流式发送。")
+            return False
+        from aiosmtplib.protocol import SMTPProtocol
+        missing = [name for name in self._PROTOCOL_METHODS if not callable(getattr(SMTPProtocol, name, None))]
+        if missing:
+            logger.warning(f"aiosmtplib {version} 缺少接口 {missing}，附件将不使用流式发送。")
+            return False
+        return True
+
+    async def send(self, conn: _PooledSMTPConnection, sender_email: str, receiver_email: str, prepared: PreparedMessage) -> None:
+        """
+        在一个借出的连接上发送邮件。服务器拒绝 (MAIL / RCPT / DATA 返回错误码) 时先发送 RSET
+        恢复会话再抛出异常，连接因此可以被连接池继续复用；其他错误则让会话保持“脏”状态，连接会被丢弃。
+        """
+        client = conn.client
+        conn.session_dirty = True
+        try:
+            try:
+                await client.mail(sender_email)
+                await client.rcpt(receiver_email)
+            except aiosmtplib.SMTPServerDisconnected as e:
+                raise SMTPDisconnectedBeforeData(str(e)) from e
+            if self.streaming_enabled:
+                await self._stream_data(client, prepared.stream(sender_email, receiver_email))
+            else:
+                await client.data(await prepared.render(sender_email, receiver_email))
+        except aiosmtplib.SMTPResponseException:
+            await self._reset(conn)
+            raise
+        conn.session_dirty = False
+
+    @staticmethod
+    async def _reset(conn: _PooledSMTPConnection):
+        """与 sendmail() 出错时的处理一致：发送 RSET 清除本次邮件事务。"""
+        try:
+            await conn.client.rset()
+            conn.session_dirty = False
+        except (ConnectionError, aiosmtplib.SMTPException):
+            pass
+
+    @staticmethod
+    async def _stream_data(client: aiosmtplib.SMTP, chunks) -> None:
+        """
+        与 client.data() 相同的 DATA 阶段，但邮件内容逐块写入连接，
+        每块写入后等待发送缓冲区排空，因此任意时刻只有少量数据驻留在内存中。
+        """
+        protocol = client.protocol
+        command_lock = getattr(protocol, "_command_lock", None)
+        if command_lock is None:
+            raise aiosmtplib.SMTPServerDisconnected("Connection lost")
+        # 与 aiosmtplib 的 execute_data_command 一样，整个 DATA 阶段持有命令锁
+        async with command_lock:
+            protocol.write(b"DATA\r\n")
+            response = await protocol.read_response(timeout=client.timeout)
+            if response.code != aiosmtplib.SMTPStatus.start_input:
+                raise aiosmtplib.SMTPDataError(response.code, response.message)
+
+            at_line_start = True
+            async with contextlib.aclosing(chunks):
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    # 行首的 "." 需要转义为 ".." (RFC 5321 4.5.2)，块边界处单独判断
+                    stuffed = chunk.replace(b"\n.", b"\n..")
+                    if at_line_start and chunk.startswith(b"."):
+                        stuffed = b"." + stuffed
+                    protocol.write(stuffed)
+                    at_line_start = chunk.endswith(b"\n")
+                    await protocol._drain_helper()
+            protocol.write(b".\r\n" if at_line_start else b"\r\n.\r\n")
+            response = await protocol.read_response(timeout=client.timeout)
+            if response.code != aiosmtplib.SMTPStatus.completed:
+                raise aiosmtplib.SMTPDataError(response.code, response.message)
+
+
+_smtp_data_streamer = _SMTPDataStreamer()
+# ========================== END: MODIFICATION (SMTP Data Streaming) ============================
+
+
 class EmailService:
     """处理所有邮件发送的业务逻辑"""
 
@@ -35,10 +516,59 @@ class EmailService:
             error_msg = "没有可用的发信邮箱账户，请检查 .env 文件！"
             logger.critical(error_msg)
             raise ValueError(error_msg)
+        # 以发信邮箱为 key 的连接池，在首次使用该账户时惰性创建
+        self._pools: dict[str, SMTPConnectionPool] = {}
+        # 发信调度器：全局并发限制 + 按账户限速，替代原先的随机选择账户
+        self._account_scheduler = SenderAccountScheduler(
+            self.accounts,
+            max_concurrency=settings.SMTP_MAX_CONCURRENT_SENDS,
+            max_wait=settings.SMTP_RATE_LIMIT_MAX_WAIT,
+        )
 
-    def _get_random_account(self) -> dict:
-        """从账户池中随机选择一个账户用于发送，实现发信源轮换"""
-        return random.choice(self.accounts)
+    def _get_pool(self, account: dict) -> SMTPConnectionPool:
+        """获取 (或创建) 指定发信账户的连接池"""
+        pool = self._pools.get(account["email"])
+        if pool is None:
+            pool = SMTPConnectionPool(
+                hostname=self.smtp_server,
+                port=self.smtp_port,
+                username=account["email"],
+                password=account["password"],
+                max_connections=settings.SMTP_POOL_MAX_CONNECTIONS,
+                idle_timeout=settings.SMTP_POOL_IDLE_TIMEOUT,
+                max_messages=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+            )
+            self._pools[account["email"]] = pool
+        return pool
+
+    async def _deliver(self, account: dict, receiver_email: str, prepared: PreparedMessage) -> None:
+        """
+        通过连接池发送一封预备邮件 (内容以流的方式写入连接)。
+        复用的连接可能已被服务器静默断开：若断开发生在 DATA 之前，会在新建立的连接上重试一次；
+        全新连接上的断开、以及 DATA 之后的断开 (服务器可能已接收) 则原样抛出，由调用方按失败处理。
+        发送中途出错的连接会被连接池直接丢弃，不会带着半封邮件被复用。
+        """
+        pool = self._get_pool(account)
+        reused = False
+        try:
+            async with pool.connection() as conn:
+                reused = conn.messages_sent > 0
+                await _smtp_data_streamer.send(conn, account["email"], receiver_email, prepared)
+                conn.messages_sent += 1
+        except SMTPDisconnectedBeforeData:
+            # 只在 DATA 之前断开时重试：此后断开的话，服务器可能已经接收了邮件，重试会造成重复投递
+            if not reused:
+                raise
+            logger.info(f"SMTP 连接池：[{account['email']}] 的复用连接已被服务器断开，正在使用新连接重试。")
+            async with pool.connection(fresh=True) as conn:
+                await _smtp_data_streamer.send(conn, account["email"], receiver_email, prepared)
+                conn.messages_sent += 1
+
+    async def close(self):
+        """关闭所有发信账户的连接池"""
+        for pool in self._pools.values():
+            await pool.close()
+        self._pools.clear()
 
     # ========================== START: 修改区域 (需求 ①) ==========================
     # DESIGNER'S NOTE:
@@ -46,42 +576,36 @@ class EmailService:
     # - 邮件主体现在被构造成一个 MIMEMultipart('mixed') 容器，这是支持内容和附件混合的最佳实践。
     # - HTML 内容和其内嵌图片被包裹在一个 MIMEMultipart('related') 子容器中。
     # - 这种标准的嵌套结构能被绝大多数邮件客户端（包括QQ邮箱）正确识别。
-    async def send_email(
-        self, 
-        receiver_email: str, 
-        subject: str, 
-        html_content: str, 
-        attachments: list[str] = None, 
+    def prepare_message(
+        self,
+        subject: str,
+        html_content: str,
+        attachments: list[str] = None,
         embedded_images: list[dict] = None
-    ) -> bool:
+    ) -> PreparedMessage:
         """
-        【异步改造 & 功能增强】发送邮件的核心方法。
-        使用 aiosmtplib 实现非阻塞的邮件发送。
-        新增对文件附件和正文内嵌图片的支持。
+        构建一封可以发送给任意多个收件人的“预备邮件”。
+        这里只确认附件与内嵌图片存在，不读取文件内容；内容在发送时分块读取并编码。
 
-        :param receiver_email: 收件人邮箱。
         :param subject: 邮件主题。
         :param html_content: 邮件的 HTML 内容。
         :param attachments: 一个包含服务器上文件绝对路径的列表 (可选，作为附件)。
         :param embedded_images: 一个包含图片信息的字典列表 (可选，用于在正文显示)。
                                 每个字典格式: {"path": "/path/to/img.jpg", "cid": "my_image_cid"}
         """
-        sender_account = self._get_random_account()
-        sender_email = sender_account["email"]
-        sender_password = sender_account["password"]
-        
         # 步骤 1: 创建最外层的容器，使用 'mixed' 以支持附件
+        # 注意：Subject / From / To 不写入这里，它们在 PreparedMessage.render() 时按收件人生成
         message = MIMEMultipart('mixed')
-        message["Subject"] = subject
-        message["From"] = f"EMinder <{sender_email}>"
-        message["To"] = receiver_email
         
         # 步骤 2: 创建 'related' 容器，用于存放 HTML 和其内嵌的图片
         msg_related = MIMEMultipart('related')
         
-        # 将 HTML 内容附加到 'related' 容器中
-        msg_html = MIMEText(html_content, "html", "utf-8")
+        # 将 HTML 部分附加到 'related' 容器中。正文先用占位符代替，由 PreparedMessage 单独编码。
+        msg_html = MIMEText("", "html", "utf-8")
+        msg_html.set_payload(PreparedMessage.HTML_PLACEHOLDER)
         msg_related.attach(msg_html)
+        # 附件与内嵌图片的路径，按占位符序号排列
+        files = []
 
         # 处理并附加所有内嵌图片到 'related' 容器中
         if embedded_images:
@@ -97,8 +621,10 @@ class EmailService:
                     continue
                     
                 try:
-                    with open(img_path, 'rb') as fp:
-                        img_part = MIMEImage(fp.read())
+                    # 图片内容不在此处读取，发送时由 PreparedMessage 流式编码
+                    img_part = MIMEImage(b"", _subtype=_guess_subtype(img_path, "image"))
+                    img_part.set_payload(PreparedMessage.FILE_PLACEHOLDER.format(index=len(files)))
+                    files.append(img_path)
                     
                     # ========================== START: MODIFICATION (Fix Image Embedding) ==========================
                     # DESIGNER'S NOTE: 这是解决图片显示问题的关键一步。
@@ -126,8 +652,9 @@ class EmailService:
                     continue
                 
                 try:
-                    with open(file_path, "rb") as f:
-                        part = MIMEApplication(f.read(), Name=os.path.basename(file_path))
+                    part = MIMEApplication(b"", Name=os.path.basename(file_path))
+                    part.set_payload(PreparedMessage.FILE_PLACEHOLDER.format(index=len(files)))
+                    files.append(file_path)
                     
                     # 添加必要的头信息
                     part['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
@@ -136,16 +663,29 @@ class EmailService:
                 except Exception as e:
                     logger.error(f"邮件构建错误: 附加文件 {file_path} 时失败: {e}")
 
+        return PreparedMessage(subject, html_content, message, files)
+
+    async def send_prepared(self, receiver_email: str, prepared: PreparedMessage) -> bool:
+        """
+        将一封预备邮件发送给单个收件人。
+        群发时对同一个 PreparedMessage 多次调用即可，无需重复构建邮件。
+        发送会先在发信调度器中排队，获得全局名额和一个有配额的发信账户后才真正发出。
+        """
+        subject = prepared.subject
         try:
-            # aiosmtplib 使用与 smtplib 类似的参数，use_tls=True 对应 SMTP_SSL
-            await aiosmtplib.send(
-                message,
-                hostname=self.smtp_server,
-                port=self.smtp_port,
-                username=sender_email,
-                password=sender_password,
-                use_tls=True, # 启用 SSL
-            )
+            async with self._account_scheduler.slot() as sender_account:
+                return await self._send_with_account(sender_account, receiver_email, prepared)
+        except SenderRateLimitExceeded as e:
+            logger.error(f"邮件发送失败：目标 [{receiver_email}] | 主题: {subject}。{e}")
+            return False
+
+    async def _send_with_account(self, sender_account: dict, receiver_email: str, prepared: PreparedMessage) -> bool:
+        sender_email = sender_account["email"]
+        subject = prepared.subject
+
+        try:
+            # 通过连接池复用已认证的连接发送
+            await self._deliver(sender_account, receiver_email, prepared)
             # 如果代码执行到这里，说明邮件已成功发送
             # 使用 logger 记录成功信息
             logger.info(f"邮件发送成功：源 [{sender_email}] -> 目标 [{receiver_email}] | 主题: {subject}")
@@ -154,17 +694,44 @@ class EmailService:
         except aiosmtplib.SMTPAuthenticationError:
             logger.error(f"邮件发送失败：发信源 [{sender_email}] 认证失败！请检查邮箱和授权码。")
             return False
-        except aiosmtplib.SMTPServerDisconnected:
-            # 【核心修正逻辑】
-            # aiosmtplib 中，服务器在发送后立即关闭连接会引发 SMTPServerDisconnected 错误。
-            # 这与原代码中处理 (-1, b'\x00\x00\x00') 元组的逻辑目的一致。
-            # 我们在此将其视为成功发送，并打印警告。
-            logger.warning(f"邮件发送疑似成功 (服务器提前断开)：源 [{sender_email}] -> 目标 [{receiver_email}]。")
-            return True
+        except aiosmtplib.SMTPServerDisconnected as e:
+            # 连接池下，服务器在返回 250 之后才断开不会抛出异常 (断开只影响下一次借出，由连接池处理)；
+            # 能走到这里说明没有收到服务器的确认，不能当作成功，交由调用方写入发件箱重试。
+            logger.error(f"邮件发送失败 (服务器在确认前断开)：源 [{sender_email}] -> 目标 [{receiver_email}]。错误详情: {e}")
+            return False
         except Exception as e:
             # 对于所有其他未知的、真正的错误，仍然报告失败
             logger.error(f"邮件发送异常：源 [{sender_email}] -> 目标 [{receiver_email}]。错误详情: {e}", exc_info=True)
             return False
+
+    async def send_bulk(self, receiver_emails: list[str], prepared: PreparedMessage | list[PreparedMessage]) -> list[bool]:
+        """
+        将同一封预备邮件发送给多个收件人。
+        所有发送会同时进入发信队列，实际并发度与速率由发信调度器控制。
+        :param prepared: 一封预备邮件；或与 receiver_emails 一一对应的列表 (按收件人个性化，见 PreparedMessage.with_body)。
+        :return: 与 receiver_emails 一一对应的发送结果列表。
+        """
+        messages = prepared if isinstance(prepared, list) else [prepared] * len(receiver_emails)
+        return list(await asyncio.gather(*(self.send_prepared(email, message) for email, message in zip(receiver_emails, messages))))
+
+    async def send_email(
+        self, 
+        receiver_email: str, 
+        subject: str, 
+        html_content: str, 
+        attachments: list[str] = None, 
+        embedded_images: list[dict] = None
+    ) -> bool:
+        """
+        【异步改造 & 功能增强】发送邮件的核心方法。
+        使用 aiosmtplib 实现非阻塞的邮件发送。
+        新增对文件附件和正文内嵌图片的支持。
+        参数含义与 prepare_message 相同；群发同一内容时请改用 prepare_message + send_prepared。
+
+        :param receiver_email: 收件人邮箱。
+        """
+        prepared = self.prepare_message(subject, html_content, attachments, embedded_images)
+        return await self.send_prepared(receiver_email, prepared)
     # ========================== END: 修改区域 (需求 ①) ============================
 
 # 创建一个全局邮件服务实例
@@ -0,0 +1,98 @@
+# backend/app/services/history_index_service.py (新文件)
+import datetime
+import logging
+import os
+import re
+from ..storage.sqlite_store import store
+
+logger = logging.getLogger(__name__)
+
+# DESIGNER'S NOTE:
+# 周报 / 月报原本每次运行都要 glob 整个 history 文件夹、逐个解析文件名，
+# 再重新读取并正则解析范围内的每一个文件；而 history 文件夹只会越来越大。
+# 这里把每个 YYYY-MM-DD.md 的解析结果按 (路径, mtime_ns, 大小) 缓存在 SQLite 的 history_index 表中：
+# - 每次同步只扫描一次目录 (os.scandir 一并返回文件状态)，只有新增或修改过的文件才会被重新读取解析；
+# - 已删除的文件会从索引中移除；
+# - 解析器逻辑变化时提升 parser_version，旧条目会自动重新解析。
+# 注意：同步过程是阻塞 I/O，在异步代码中请通过 asyncio.to_thread 调用。
+
+# 只索引以日期命名的归档文件 (与原 strptime("%Y-%m-%d") 的匹配规则一致)，
+# `_summary_HHMMSS` 等备份文件直接跳过，不读取内容。
+_HISTORY_FILENAME_RE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})\.md$')
+
+
+class HistoryIndexService:
+    """每日总结历史文件的增量解析索引"""
+
+    @staticmethod
+    def _scan(history_path: str) -> dict:
+        """扫描 history 文件夹，返回 {路径: (文件日期, mtime_ns, 大小)}。"""
+        files = {}
+        with os.scandir(history_path) as entries:
+            for entry in entries:
+                match = _HISTORY_FILENAME_RE.match(entry.name)
+                if not match:
+                    continue
+                try:
+                    file_date = datetime.date(*map(int, match.groups()))
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except (ValueError, OSError):
+                    continue
+                files[entry.path] = (file_date, stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def sync(self, history_path: str, parse_func, parser_version: int) -> int:
+        """
+        增量更新 history_path 的索引。
+        :param parse_func: 解析单个文件内容的函数 (即 _parse_daily_summary)。
+        :param parser_version: 解析器版本号，与已索引条目不一致时重新解析。
+        :return: 本次重新解析的文件数量。
+        """
+        history_dir = os.path.abspath(history_path)
+        files = self._scan(history_dir)
+        indexed = store.get_history_index_stats(history_dir)
+
+        stale = [path for path in indexed if path not in files]
+        if stale:
+            store.delete_history_index_entries(stale)
+
+        entries = []
+        for path, (file_date, mtime_ns, size) in files.items():
+            if indexed.get(path) == (mtime_ns, size, parser_version):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    parsed = parse_func(f.read())
+            except (OSError, UnicodeDecodeError) as e:
+                logger.warning(f"读取历史总结文件 {path} 失败，已跳过: {e}")
+                continue
+            entries.append({
+                "path": path,
+                "history_dir": history_dir,
+                "file_date": file_date.isoformat(),
+                "mtime_ns": mtime_ns,
+                "size": size,
+                "parser_version": parser_version,
+                "parsed": parsed,
+            })
+        if entries:
+            store.upsert_history_index_entries(entries)
+            logger.info(f"历史索引：已更新 {len(entries)} 个文件 ({history_dir})。")
+        return len(entries)
+
+    @staticmethod
+    def query(history_path: str, start_date: datetime.date, end_date: datetime.date) -> list[tuple]:
+        """返回 [start_date, end_date) 范围内按日期排序的 [(日期, 解析结果), ...]。"""
+        rows = store.query_history_index(os.path.abspath(history_path), start_date.isoformat(), end_date.isoformat())
+        return [(datetime.date.fromisoformat(row["file_date"]), row["parsed"]) for row in rows]
+
+    @staticmethod
+    def aggregates(history_path: str, start_date: datetime.date, end_date: datetime.date) -> dict:
+        """返回 [start_date, end_date) 范围内的 {"days", "total_tasks", "done_tasks"}。"""
+        return store.get_history_aggregates(os.path.abspath(history_path), start_date.isoformat(), end_date.isoformat())
+
+
+# 创建一个全局历史索引服务实例
+history_index_service = HistoryIndexService()
@@ -1,13 +1,75 @@
 # backend/app/services/llm_service.py (重构后)
+import hashlib
 import httpx
+import importlib.util
+import json
 import logging
-from ..storage.sqlite_store import store # 导入 store 实例
+from typing import AsyncIterator
+from ..core.config import settings
+from ..storage.sqlite_store import async_store # 导入异步 store 实例，避免数据库 I/O 阻塞事件循环
 
 # ========================== START: MODIFICATION ==========================
 # DESIGNER'S NOTE:
 # 整个 LLMService 被重构，使其成为一个动态的、数据驱动的服务。
 # 它不再从环境变量读取配置，而是从数据库中查询当前被标记为 "active" 的配置来执行 API 调用。
 
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
+
+
+class LLMStreamError(Exception):
+    """流式调用失败 (配置缺失、HTTP 错误或网络错误)。"""
+
+
+class _CodeFenceStreamFilter:
+    """
+    流式版本的 LLMService._strip_code_fences：逐段输入模型输出，产出的文本拼接后
+    与对完整内容调用 _strip_code_fences 的结果一致 (即与写入缓存的内容一致)。
+    开头在能判断是否为代码块标记之前暂不输出；结尾的空白和反引号暂存，直到后面出现其他字符。
+    """
+
+    OPENING_FENCES = ("```markdown", "```")
+
+    def __init__(self):
+        self._head = ""          # 尚未判断开头标记时暂存的内容
+        self._started = False    # 开头标记 (如果有) 已被处理
+        self._emitted = False    # 已输出过正文 (之后不再去除开头空白)
+        self._tail = ""          # 可能属于结尾标记的空白 / 反引号
+
+    def feed(self, chunk: str) -> str:
+        if not self._started:
+            self._head += chunk
+            text = self._head.lstrip()
+            longest = self.OPENING_FENCES[0]
+            if len(text) < len(longest) and longest.startswith(text):
+                return ""  # 仍可能是 ```markdown，等待更多内容
+            for fence in self.OPENING_FENCES:
+                if text.startswith(fence):
+                    text = text[len(fence):]
+                    break
+            self._started, self._head, chunk = True, "", text
+
+        text = self._tail + chunk
+        if not self._emitted:
+            text = text.lstrip()
+        end = len(text)
+        while end and (text[end - 1].isspace() or text[end - 1] == "`"):
+            end -= 1
+        self._tail = text[end:]
+        if end:
+            self._emitted = True
+        return text[:end]
+
+    def finish(self) -> str:
+        """输入结束：返回暂存内容中应当输出的部分。"""
+        if not self._started:
+            return LLMService._strip_code_fences(self._head)
+        # 暂存内容之前的正文以非空白、非反引号字符结尾，因此只需处理暂存部分的右侧
+        tail = self._tail.rstrip()
+        if tail.endswith("```"):
+            tail = tail[:-len("```")].rstrip()
+        return tail
+
+
 class LLMService:
     """
     处理与大语言模型 (LLM) API 交互的业务逻辑。
@@ -17,66 +79,152 @@ class LLMService:
     def __init__(self):
         self.request_timeout = 60  # 设置 API 请求超时时间为60秒
         self.logger = logging.getLogger(__name__)
+        # 每个 API 地址共享一个 httpx.AsyncClient，复用连接池与 TLS 会话，
+        # 同一任务中连续多次调用 LLM 时无需每次重新握手。
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._http2 = settings.LLM_HTTP2
+        if self._http2 and importlib.util.find_spec("h2") is None:
+            self.logger.warning("LLM_HTTP2 已启用，但未安装 h2 (pip install \"httpx[http2]\")，将使用 HTTP/1.1。")
+            self._http2 = False
 
-    async def generate_text(self, prompt: str) -> dict:
-        """
-        使用当前激活的 LLM 配置处理输入文本。
+    def _get_client(self, api_url: str) -> httpx.AsyncClient:
+        """获取 (或创建) 指定 API 地址对应的共享客户端。"""
+        key = api_url.rstrip('/')
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=self._http2,
+                timeout=self.request_timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._clients[key] = client
+        return client
 
-        :param prompt: 发送给大模型的提示词。
-        :return: 一个包含处理结果或错误信息的字典。
-                 成功: {"success": True, "content": "处理后的文本"}
-                 失败: {"success": False, "content": "错误信息详情"}
+    @staticmethod
+    def _cache_key(provider_name: str, model_name: str, system_prompt: str, prompt: str) -> str:
+        """响应缓存键：(服务商, 模型, 系统提示词, 提示词) 的 SHA-256。"""
+        raw = json.dumps([provider_name, model_name, system_prompt, prompt], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def close(self):
+        """关闭所有共享客户端 (应用关闭时调用)。"""
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+    async def _load_active_config(self):
         """
-        # 1. 从数据库获取当前激活的配置
-        active_config = store.get_active_llm_config()
+        读取并校验当前激活的 LLM 配置。
+        :return: (配置字典, None)；配置缺失或不完整时返回 (None, 错误信息)。
+        """
+        active_config = await async_store.get_active_llm_config()
 
         if not active_config:
             self.logger.warning("LLM调用失败：数据库中没有设置任何激活的大模型服务。")
-            return {
-                "success": False,
-                "content": "无法连接到大模型服务：管理员尚未在“LLM 服务配置”页面中指定一个当前服务。"
-            }
+            return None, "无法连接到大模型服务：管理员尚未在“LLM 服务配置”页面中指定一个当前服务。"
 
-        api_url = active_config.get("api_url")
-        api_key = active_config.get("api_key")
-        model_name = active_config.get("model_name")
-        provider_name = active_config.get("provider_name")
-
-        if not all([api_url, api_key, model_name]):
+        if not all([active_config.get("api_url"), active_config.get("api_key"), active_config.get("model_name")]):
             self.logger.error(f"LLM配置不完整 (ID: {active_config.get('id')})。缺少 URL、Key 或模型名称。")
-            return {
-                "success": False,
-                "content": f"配置错误：名为 '{provider_name}' 的服务配置不完整。"
-            }
+            return None, f"配置错误：名为 '{active_config.get('provider_name')}' 的服务配置不完整。"
 
-        # 2. 准备请求（兼容OpenAI的格式）
-        #    适用于 DeepSeek, SiliconFlow, Kimi 等绝大多数厂商
-        full_endpoint = f"{api_url.rstrip('/')}/chat/completions"
+        return active_config, None
+
+    @staticmethod
+    def _build_request(active_config: dict, system_prompt: str, prompt: str, stream: bool):
+        """构造兼容 OpenAI 格式的请求，适用于 DeepSeek, SiliconFlow, Kimi 等绝大多数厂商。"""
+        full_endpoint = f"{active_config['api_url'].rstrip('/')}/chat/completions"
         headers = {
             "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
+            "Authorization": f"Bearer {active_config['api_key']}"
         }
         payload = {
-            "model": model_name,
+            "model": active_config["model_name"],
             "messages": [
-                {"role": "system", "content": "You are a helpful assistant."},
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt}
             ],
-            "stream": False
+            "stream": stream
         }
+        return full_endpoint, headers, payload
+
+    @staticmethod
+    def _strip_code_fences(content: str) -> str:
+        """
+        需求：去除AI模型返回内容中可能包含的Markdown代码块标记，
+        确保邮件内容干净，不会显示```markdown等无关字符。
+        """
+        cleaned_content = content.strip()
+        if cleaned_content.startswith("```markdown"):
+            # Strip ```markdown at the start
+            cleaned_content = cleaned_content[len("```markdown"):].strip()
+        elif cleaned_content.startswith("```"):
+            # Strip generic ``` at the start, in case the language is not specified
+            cleaned_content = cleaned_content[len("```"):].strip()
+
+        if cleaned_content.endswith("```"):
+            # Strip ``` at the end
+            cleaned_content = cleaned_content[:-len("```")].strip()
+        return cleaned_content
+
+    @staticmethod
+    def _http_error_details(response: httpx.Response) -> str:
+        error_details = f"HTTP 错误: {response.status_code} {response.reason_phrase}"
+        try:
+            # 尝试解析API返回的具体错误信息
+            api_error_body = response.json()
+            api_error = api_error_body.get("error", {}).get("message", str(api_error_body))
+            error_details += f"\nAPI 错误信息: {api_error}"
+        except Exception:
+            error_details += f"\n原始响应: {response.text}"
+        return error_details
+
+    async def generate_text(self, prompt: str, system_prompt: str = DEFAULT_SYSTEM_PROMPT, use_cache: bool = True) -> dict:
+        """
+        使用当前激活的 LLM 配置处理输入文本。
+
+        :param prompt: 发送给大模型的提示词。
+        :param system_prompt: 系统提示词。
+        :param use_cache: 是否使用响应缓存。相同的服务商/模型/提示词在有效期内直接返回上次的结果；
+                          需要强制重新生成时传入 False。
+        :return: 一个包含处理结果或错误信息的字典。
+                 成功: {"success": True, "content": "处理后的文本"}
+                 失败: {"success": False, "content": "错误信息详情"}
+        """
+        # 1. 从数据库获取当前激活的配置
+        active_config, config_error = await self._load_active_config()
+        if config_error:
+            return {"success": False, "content": config_error}
+        api_url = active_config["api_url"]
+        model_name = active_config["model_name"]
+        provider_name = active_config["provider_name"]
+
+        cache_key = None
+        if use_cache and settings.LLM_CACHE_TTL_SECONDS > 0:
+            cache_key = self._cache_key(provider_name, model_name, system_prompt, prompt)
+            cached_content = await async_store.get_llm_cached_response(cache_key, settings.LLM_CACHE_TTL_SECONDS)
+            if cached_content is not None:
+                self.logger.info(f"LLM 响应缓存命中 ('{provider_name}', 模型: {model_name})，跳过 API 调用。")
+                return {"success": True, "content": cached_content}
+
+        # 2. 准备请求（兼容OpenAI的格式）
+        full_endpoint, headers, payload = self._build_request(active_config, system_prompt, prompt, stream=False)
 
         self.logger.info(f"正在通过 '{provider_name}' (模型: {model_name}) 发送请求至 '{full_endpoint}'...")
 
         # 3. 发送异步HTTP请求
         try:
-            # 使用 httpx.AsyncClient 发送异步 POST 请求
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    full_endpoint,
-                    headers=headers,
-                    json=payload,
-                    timeout=self.request_timeout
-                )
+            # 使用该 API 地址共享的 httpx.AsyncClient 发送异步 POST 请求
+            client = self._get_client(api_url)
+            response = await client.post(
+                full_endpoint,
+                headers=headers,
+                json=payload,
+                timeout=self.request_timeout
+            )
             
             # 检查 HTTP 响应状态码，如果不是 2xx 则抛出异常
             response.raise_for_status()
@@ -90,24 +238,13 @@ class LLMService:
                     processed_content = first_choice["message"]["content"]
                     self.logger.info("成功从LLM服务获取到响应。")
                     
-                    # ========================== START: MODIFICATION ==========================
-                    # DESIGNER'S NOTE:
-                    # 需求：去除AI模型返回内容中可能包含的Markdown代码块标记，
-                    # 确保邮件内容干净，不会显示```markdown等无关字符。
-                    cleaned_content = processed_content.strip()
-                    if cleaned_content.startswith("```markdown"):
-                        # Strip ```markdown at the start
-                        cleaned_content = cleaned_content[len("```markdown"):].strip()
-                    elif cleaned_content.startswith("```"):
-                        # Strip generic ``` at the start, in case the language is not specified
-                        cleaned_content = cleaned_content[len("```"):].strip()
-                    
-                    if cleaned_content.endswith("```"):
-                        # Strip ``` at the end
-                        cleaned_content = cleaned_content[:-len("```")].strip()
-                    
+                    cleaned_content = self._strip_code_fences(processed_content)
+
+                    if cache_key:
+                        await async_store.put_llm_cached_response(
+                            cache_key, provider_name, model_name, cleaned_content, settings.LLM_CACHE_MAX_ENTRIES
+                        )
                     return {"success": True, "content": cleaned_content}
-                    # ========================== END: MODIFICATION ============================
 
             error_message = f"API 响应格式不正确，缺少有效内容。服务商: {provider_name}, 响应: {response_data}"
             self.logger.error(error_message)
@@ -115,14 +252,7 @@ class LLMService:
 
         except httpx.HTTPStatusError as http_err:
             # 处理 HTTP 错误，例如 401, 429, 500
-            error_details = f"HTTP 错误: {http_err.response.status_code} {http_err.response.reason_phrase}"
-            try:
-                # 尝试解析API返回的具体错误信息
-                api_error_body = http_err.response.json()
-                api_error = api_error_body.get("error", {}).get("message", str(api_error_body))
-                error_details += f"\nAPI 错误信息: {api_error}"
-            except Exception:
-                error_details += f"\n原始响应: {http_err.response.text}"
+            error_details = self._http_error_details(http_err.response)
             self.logger.error(f"调用 '{provider_name}' 时发生HTTP错误: {error_details}")
             return {"success": False, "content": error_details}
 
@@ -137,5 +267,80 @@ class LLMService:
             return {"success": False, "content": error_message}
 
 
+    async def generate_text_stream(self, prompt: str, system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+                                   use_cache: bool = True) -> AsyncIterator[str]:
+        """
+        流式模式：以 SSE 方式请求兼容 OpenAI 格式的接口，按到达顺序逐段产出模型生成的文本。
+
+        用法: `async for chunk in llm_service.generate_text_stream(prompt): ...`
+        产出的文本已去除代码块标记 (与 generate_text 的处理相同)，拼接后与写入缓存的内容一致；
+        命中响应缓存时一次性产出完整内容。
+        配置缺失、HTTP 错误或网络错误时抛出 LLMStreamError，其消息与 generate_text 的错误信息一致。
+        """
+        active_config, config_error = await self._load_active_config()
+        if config_error:
+            raise LLMStreamError(config_error)
+        api_url = active_config["api_url"]
+        model_name = active_config["model_name"]
+        provider_name = active_config["provider_name"]
+
+        cache_key = None
+        if use_cache and settings.LLM_CACHE_TTL_SECONDS > 0:
+            cache_key = self._cache_key(provider_name, model_name, system_prompt, prompt)
+            cached_content = await async_store.get_llm_cached_response(cache_key, settings.LLM_CACHE_TTL_SECONDS)
+            if cached_content is not None:
+                self.logger.info(f"LLM 响应缓存命中 ('{provider_name}', 模型: {model_name})，跳过 API 调用。")
+                yield cached_content
+                return
+
+        full_endpoint, headers, payload = self._build_request(active_config, system_prompt, prompt, stream=True)
+        self.logger.info(f"正在通过 '{provider_name}' (模型: {model_name}) 以流式模式发送请求至 '{full_endpoint}'...")
+
+        chunks = []
+        fence_filter = _CodeFenceStreamFilter()
+        try:
+            client = self._get_client(api_url)
+            async with client.stream("POST", full_endpoint, headers=headers, json=payload,
+                                     timeout=self.request_timeout) as response:
+                if response.is_error:
+                    await response.aread()
+                    error_details = self._http_error_details(response)
+                    self.logger.error(f"调用 '{provider_name}' 时发生HTTP错误: {error_details}")
+                    raise LLMStreamError(error_details)
+
+                async for line in response.aiter_lines():
+                    # SSE 格式: 每个事件为 "data: {json}"，以 "data: [DONE]" 结束
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        choices = json.loads(data).get("choices") or []
+                    except json.JSONDecodeError:
+                        self.logger.warning(f"忽略无法解析的流式数据: {data[:200]}")
+                        continue
+                    delta = choices[0].get("delta", {}).get("content") if choices else None
+                    if delta:
+                        chunks.append(delta)
+                        text = fence_filter.feed(delta)
+                        if text:
+                            yield text
+        except httpx.RequestError as req_err:
+            error_message = f"网络请求失败: 无法连接到 '{provider_name}' 的API地址 ({api_url})。请检查网络或配置。错误详情: {req_err}"
+            self.logger.error(error_message)
+            raise LLMStreamError(error_message) from req_err
+
+        text = fence_filter.finish()
+        if text:
+            yield text
+        self.logger.info("成功从LLM服务获取到流式响应。")
+        if cache_key and chunks:
+            await async_store.put_llm_cached_response(
+                cache_key, provider_name, model_name, self._strip_code_fences("".join(chunks)),
+                settings.LLM_CACHE_MAX_ENTRIES
+            )
+
+
 # 创建一个全局的大模型服务实例，供其他模块调用
 llm_service = LLMService()
\ No newline at end of file
@@ -0,0 +1,190 @@
+# backend/app/services/outbox_service.py (新文件)
+import asyncio
+import os
+import time
+import logging
+from ..core.config import settings
+from ..storage.sqlite_store import async_store
+from .email_service import email_service
+
+logger = logging.getLogger(__name__)
+
+# DESIGNER'S NOTE:
+# 之前 send_email 失败时只返回 False，邮件就此丢失；“立即发送”依赖 FastAPI 的 BackgroundTasks，
+# 进程重启后也无法恢复。现在已渲染好的邮件会先写入 SQLite 中的 outbox 表，
+# 再由这里的后台投递器分批发送：
+# - 失败时按指数退避重试，超过最大次数后进入死信 (dead) 状态，可通过 API 手动重新入队；
+# - 启动时会把上次退出时仍在投递中的邮件恢复为待发送，保证重启安全；
+# - 重试只重新发送已渲染的内容，不会重复执行模板 / LLM 等昂贵逻辑；
+# - 已发送的邮件保留 OUTBOX_SENT_RETENTION_SECONDS 秒 (便于在“发件箱”页面查看) 后删除，避免数据库无限增长。
+
+# 清理过期已发送邮件的最小间隔 (秒)
+SENT_PURGE_INTERVAL = 3600
+
+
+class OutboxDispatcher:
+    """发件箱后台投递器"""
+
+    def __init__(self):
+        self.batch_size = settings.OUTBOX_BATCH_SIZE
+        self.poll_interval = settings.OUTBOX_POLL_INTERVAL
+        self.max_attempts = settings.OUTBOX_MAX_ATTEMPTS
+        self.retry_base_delay = settings.OUTBOX_RETRY_BASE_DELAY
+        self.retry_max_delay = settings.OUTBOX_RETRY_MAX_DELAY
+        self.sent_retention = settings.OUTBOX_SENT_RETENTION_SECONDS
+        self._last_purge_at = 0.0
+        self._task = None
+        self._wakeup = None
+
+    async def enqueue(self, receiver_email: str, subject: str, html_content: str,
+                attachments: list = None, embedded_images: list = None,
+                cleanup_paths: list = None, source: str = None) -> int:
+        """
+        将一封已渲染好的邮件持久化到发件箱，并唤醒投递器。
+        :param cleanup_paths: 邮件成功发送后需要删除的临时文件 (例如用户上传的附件)。
+        :return: 发件箱中的邮件 ID。
+        """
+        message_id = await async_store.enqueue_outbox_message(
+            receiver_email, subject, html_content,
+            attachments=attachments, embedded_images=embedded_images,
+            cleanup_paths=cleanup_paths, source=source
+        )
+        logger.info(f"Outbox: 邮件 [ID: {message_id}] 已入队 -> [{receiver_email}] | 主题: {subject}")
+        self.notify()
+        return message_id
+
+    def notify(self):
+        """唤醒投递器，立即处理队列，而不必等待下一次轮询。"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _retry_delay(self, attempts: int) -> float:
+        return min(self.retry_base_delay * (2 ** (attempts - 1)), self.retry_max_delay)
+
+    @staticmethod
+    def _cleanup(paths: list):
+        for path in paths:
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Outbox: 清理临时文件 {path} 失败: {e}")
+
+    @staticmethod
+    def _missing_files(message: dict) -> list:
+        paths = list(message["attachments"]) + [image.get("path") for image in message["embedded_images"] if image.get("path")]
+        return [path for path in paths if not os.path.isfile(path)]
+
+    async def _dispatch(self, message: dict):
+        message_id = message["id"]
+        # 附件已被删除 (例如缓存被清理) 时，不能悄悄发出一封缺少附件的邮件；文件不会自行恢复，直接进入死信
+        missing = await asyncio.to_thread(self._missing_files, message)
+        if missing:
+            await async_store.mark_outbox_failed(message_id, f"附件文件不存在: {', '.join(missing)}")
+            logger.error(f"Outbox: 邮件 [ID: {message_id}] 的附件文件不存在，已进入死信状态: {missing}")
+            return
+        success = await email_service.send_email(
+            message["receiver_email"],
+            message["subject"],
+            message["html_content"],
+            attachments=message["attachments"],
+            embedded_images=message["embedded_images"],
+        )
+        if success:
+            await async_store.mark_outbox_sent(message_id)
+            await asyncio.to_thread(self._cleanup, message["cleanup_paths"])
+            return
+        await self._schedule_retry(message, f"第 {message['attempts'] + 1} 次发送失败，详情请查看日志。")
+
+    async def _schedule_retry(self, message: dict, error: str):
+        """记录一次失败：未超过最大次数时按退避时间重新置为待发送，否则进入死信状态。"""
+        message_id = message["id"]
+        attempts = message["attempts"] + 1
+        if attempts >= self.max_attempts:
+            # 死信保留临时文件，以便手动重新入队时附件仍然可用
+            await async_store.mark_outbox_failed(message_id, error)
+            logger.error(f"Outbox: 邮件 [ID: {message_id}] 已失败 {attempts} 次，进入死信状态。")
+        else:
+            delay = self._retry_delay(attempts)
+            await async_store.mark_outbox_failed(message_id, error, next_attempt_at=time.time() + delay)
+            logger.warning(f"Outbox: 邮件 [ID: {message_id}] 发送失败，将在 {delay:.0f} 秒后重试 (第 {attempts} 次)。")
+
+    async def drain_once(self) -> int:
+        """处理一批到期的邮件，返回本批处理的数量。"""
+        batch = await async_store.claim_outbox_batch(self.batch_size)
+        if batch:
+            await asyncio.gather(*(self._dispatch_safely(message) for message in batch))
+        await self._purge_sent_if_due()
+        return len(batch)
+
+    async def _purge_sent_if_due(self):
+        """删除超过保留期的已发送邮件 (首次投递时执行一次，之后最多每 SENT_PURGE_INTERVAL 秒一次)。"""
+        now = time.time()
+        if self.sent_retention <= 0 or now - self._last_purge_at < SENT_PURGE_INTERVAL:
+            return
+        self._last_purge_at = now
+        try:
+            purged = await async_store.purge_sent_outbox(now - self.sent_retention)
+        except Exception as e:
+            logger.error(f"Outbox: 清理已发送邮件时出错: {e}", exc_info=True)
+            return
+        if purged:
+            logger.info(f"Outbox: 已删除 {purged} 封超过保留期的已发送邮件。")
+
+    async def _dispatch_safely(self, message: dict):
+        """
+        单封邮件投递中的意外错误 (例如写回状态时的 SQLite 错误) 不能影响同批的其他邮件，
+        否则它们会一直停留在 'sending' 状态直到重启。出错的邮件按退避重新置为待发送。
+        """
+        try:
+            await self._dispatch(message)
+        except Exception as e:
+            logger.error(f"Outbox: 投递邮件 [ID: {message['id']}] 时发生意外错误: {e}", exc_info=True)
+            try:
+                await self._schedule_retry(message, f"投递时发生意外错误: {e}")
+            except Exception as retry_error:
+                # 状态仍无法写回时，这封邮件保持 'sending'，会在下次启动时被恢复
+                logger.error(f"Outbox: 无法将邮件 [ID: {message['id']}] 重新置为待发送: {retry_error}")
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Outbox: 投递循环发生意外错误: {e}", exc_info=True)
+                processed = 0
+            # 如果本批已满，说明可能还有积压，立即处理下一批
+            if processed >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _recover_and_run(self):
+        recovered = await async_store.recover_outbox_in_flight()
+        if recovered:
+            logger.info(f"Outbox: 已恢复 {recovered} 封上次未完成投递的邮件。")
+        await self._run()
+
+    def start(self):
+        """在 FastAPI 启动事件中调用：恢复中断的投递并启动后台循环。"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._recover_and_run())
+        logger.info("Outbox dispatcher started.")
+
+    async def stop(self):
+        """在 FastAPI 关闭事件中调用：停止后台循环。"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Outbox dispatcher has been stopped.")
+
+
+# 创建一个全局发件箱投递器实例
+outbox_dispatcher = OutboxDispatcher()
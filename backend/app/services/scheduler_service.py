@@ -18,8 +18,11 @@ from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from croniter import croniter
 from ..core.config import settings
 from .email_service import email_service
+from .outbox_service import outbox_dispatcher
+from .attachment_bundler import attachment_bundler
 from ..templates.email_templates import template_manager
-from ..storage.sqlite_store import store
+from ..templates.personalization import PersonalizedMessage, recipient_variables
+from ..storage.sqlite_store import async_store
 
 # ========================== START: MODIFICATION (Logging) ==========================
 # DESIGNER'S NOTE: 获取一个 logger 实例，用于记录此模块中的事件。
@@ -35,7 +38,7 @@ logger = logging.getLogger(__name__)
 async def _send_recurring_emails_task():
     """【异步改造】扫描订阅者并发送相应模板的邮件。这是一个独立的函数，用于周期性任务。"""
     print(f"\n[{datetime.datetime.now()}] --- 开始执行定时邮件发送任务 ---")
-    active_subscribers = store.get_active_subscribers()
+    active_subscribers = await async_store.get_active_subscribers()
 
     if not active_subscribers:
         print("没有活跃的订阅者，本次任务结束。")
@@ -134,20 +137,36 @@ async def _send_custom_cron_email_task(**kwargs):
         if silent_run:
             logger.info(f"Silent run for cron job [ID: {job_id}, Name: {job_name}]. Email sending was suppressed.")
         else:
-            tasks = []
-            for email in receiver_emails:
-                task = email_service.send_email(
-                    receiver_email=email,
-                    subject=final_subject,
-                    html_content=email_content["html"],
-                    attachments=attachments_to_send,
-                    embedded_images=embedded_images_to_send,
-                )
-                tasks.append(task)
-                
-            # 并发执行所有邮件发送任务
-            if tasks:
-                await asyncio.gather(*tasks)
+            # 附件总大小超过阈值时按模板 / 全局配置压缩打包 (在工作线程中进行，结果有缓存)
+            attachments_to_send = await attachment_bundler.bundle_async(attachments_to_send, email_content.get("attachment_bundle"))
+            # 所有收件人的主题、正文、附件完全相同：只构建一次邮件，再逐个收件人发送
+            prepared = email_service.prepare_message(
+                subject=final_subject,
+                html_content=email_content["html"],
+                attachments=attachments_to_send,
+                embedded_images=embedded_images_to_send,
+            )
+            # 内容中包含按收件人占位符时，每个收件人只替换占位符、共享已编码的附件
+            bodies = await personalize_for_recipients(receiver_emails, final_subject, email_content)
+            if bodies is None:
+                bodies = [(final_subject, email_content["html"])] * len(receiver_emails)
+            else:
+                prepared = [prepared.with_body(subject, html) for subject, html in bodies]
+            # 发送由 email_service 的发信队列统一调度 (全局并发上限 + 按账户限速)
+            results = await email_service.send_bulk(receiver_emails, prepared)
+            failed = [(email, body) for email, body, ok in zip(receiver_emails, bodies, results) if not ok]
+            if failed:
+                # 发送失败的收件人转入发件箱重试，无需重新执行模板逻辑
+                logger.warning(f"Cron job [ID: {job_id}]: {len(failed)}/{len(receiver_emails)} emails failed to send, moved to outbox for retry.")
+                for email, (subject, html) in failed:
+                    await outbox_dispatcher.enqueue(
+                        email,
+                        subject,
+                        html,
+                        attachments=attachments_to_send,
+                        embedded_images=embedded_images_to_send,
+                        source=f"cron:{job_id}"
+                    )
 # ========================== END: MODIFICATION (需求 ①) ============================
         
         # ========================== START: MODIFICATION (Logging) ==========================
@@ -155,6 +174,23 @@ async def _send_custom_cron_email_task(**kwargs):
     except Exception as e:
         logger.error(f"An unexpected error occurred in cron job [ID: {job_id}, Name: {job_name}]: {e}", exc_info=True)
 
+# ========================== START: MODIFICATION (Per-recipient Personalization) ==========================
+# DESIGNER'S NOTE:
+# 模板只渲染一次，{{remark_name}} / {{email}} 等占位符在发送前按收件人替换 (变量来自 subscribers 表)，
+# 这样一个任务就能给每个收件人发送带称呼的邮件，而不必为每个人单独建任务、重复执行模板。
+# 只有在元数据中声明 "personalize": True 的模板才会替换占位符 (见 TemplateManager._apply_base_template)，
+# LLM 回答、脚本输出等内容中恰好出现的 {{email}} 不会被改写。定时任务、一次性任务与“立即发送”共用此函数。
+async def personalize_for_recipients(receiver_emails: list[str], subject: str, email_content: dict) -> list[tuple[str, str]] | None:
+    """返回与 receiver_emails 一一对应的 [(主题, HTML), ...]；模板未启用个性化或内容中没有占位符时返回 None。"""
+    if not email_content.get("personalize"):
+        return None
+    personalized = PersonalizedMessage(subject, email_content["html"])
+    if not personalized.fields:
+        return None
+    subscribers = await async_store.get_subscribers_by_emails(receiver_emails)
+    return [personalized.render(recipient_variables(email, subscribers.get(email))) for email in receiver_emails]
+# ========================== END: MODIFICATION (Per-recipient Personalization) ============================
+
 # ========================== START: MODIFICATION (Async Job Execution Fix) ==========================
 # DESIGNER'S NOTE:
 # 上一版方案中的 _run_async_job 同步包装器现在已完全没有必要，
@@ -213,6 +249,10 @@ class SchedulerService:
                 # ========================== END: MODIFICATION (Fix Skip Email) ============================
 
                 final_subject = custom_subject if custom_subject else email_content["subject"]
+                final_html = email_content["html"]
+                personalized = await personalize_for_recipients([receiver_email], final_subject, email_content)
+                if personalized:
+                    final_subject, final_html = personalized[0]
                 
                 # 将模板自身生成的附件与用户上传的临时文件附件合并
                 final_attachments = email_content.get("attachments", [])
@@ -225,13 +265,27 @@ class SchedulerService:
                 if silent_run:
                     logger.info(f"Silent run for one-time job [ID: {job_id}]. Email sending was suppressed.")
                 else:
-                    await email_service.send_email(
+                    final_attachments = await attachment_bundler.bundle_async(final_attachments, email_content.get("attachment_bundle"))
+                    sent = await email_service.send_email(
                         receiver_email,
                         final_subject,
-                        email_content["html"],
+                        final_html,
                         attachments=final_attachments,
                         embedded_images=email_content.get("embedded_images", [])
                     )
+                    if not sent:
+                        # 发送失败时转入发件箱重试，临时文件的清理也一并交给发件箱
+                        await outbox_dispatcher.enqueue(
+                            receiver_email,
+                            final_subject,
+                            final_html,
+                            attachments=final_attachments,
+                            embedded_images=email_content.get("embedded_images", []),
+                            cleanup_paths=temp_file_paths,
+                            source=f"once:{job_id}"
+                        )
+                        logger.warning(f"One-time job [ID: {job_id}]: Sending failed, message moved to outbox for retry.")
+                        temp_file_paths = []
 # ========================== END: MODIFICATION (需求 ①) ============================
                 logger.info(f"One-time job [ID: {job_id}] executed successfully.")
             else:
@@ -0,0 +1,95 @@
+# backend/app/services/script_launcher.py (新文件)
+"""
+脚本启动器 (仅 POSIX)。
+
+由 ScriptRunnerService 以独立进程的方式调用 (不导入 app 包，启动开销很小):
+    python script_launcher.py --usage-fd N [--cpu 秒] [--memory-mb MB] [--nofile 数量] -- "shell 命令"
+1. 通过 /bin/sh 启动命令，rlimit 在 fork 之后、exec 之前只设置给子进程 (preexec_fn)，
+   启动器自身不受限制，过低的内存 / 文件数上限不会让启动器崩溃；限制会被命令派生的子进程继承。
+   注意 rlimit 按进程计算：CPU 时间上限作用于每一个进程，而不是整个脚本任务的总和；
+2. 用 os.wait4 等待命令结束，取得它 (以及它已回收的子进程) 的资源使用情况，以 JSON 写入 --usage-fd；
+3. 以与命令相同的方式退出 (相同的返回码，或被相同的信号结束)，调用方看到的结果与直接运行命令一致。
+"""
+import argparse
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+
+
+def _set_limit(kind: int, value: int):
+    """设置软/硬限制；不能高于当前硬限制。"""
+    _, hard = resource.getrlimit(kind)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    resource.setrlimit(kind, (value, value if kind != resource.RLIMIT_CPU else hard))
+
+
+def _report(usage_fd: int, usage: dict):
+    try:
+        os.write(usage_fd, json.dumps(usage).encode("utf-8"))
+        os.close(usage_fd)
+    except OSError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--usage-fd", type=int, required=True)
+    parser.add_argument("--cpu", type=int, default=0, help="CPU 时间上限 (秒)，超出后收到 SIGXCPU")
+    parser.add_argument("--memory-mb", type=int, default=0, help="虚拟内存 (地址空间) 上限 (MB)")
+    parser.add_argument("--nofile", type=int, default=0, help="可同时打开的文件数上限")
+    parser.add_argument("command")
+    args = parser.parse_args()
+
+    def apply_limits():
+        # 在子进程中 (fork 之后、exec 之前) 执行；启动器是单线程的，可以安全使用 preexec_fn
+        if args.cpu > 0:
+            _set_limit(resource.RLIMIT_CPU, args.cpu)
+        if args.memory_mb > 0:
+            _set_limit(resource.RLIMIT_AS, args.memory_mb * 1024 * 1024)
+        if args.nofile > 0:
+            _set_limit(resource.RLIMIT_NOFILE, args.nofile)
+
+    limits = {"cpu_seconds": args.cpu, "memory_mb": args.memory_mb, "open_files": args.nofile}
+    # 发给进程组的终止信号同样会送达命令本身，启动器只需继续等待命令退出再报告资源使用情况。
+    # 注意不能设为 SIG_IGN：被忽略的信号会经 exec 继承给命令。
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(sig, lambda signum, frame: None)
+
+    # close_fds 默认为 True，usage-fd 不会泄漏给命令
+    try:
+        child = subprocess.Popen(args.command, shell=True, preexec_fn=apply_limits)
+    except (OSError, subprocess.SubprocessError) as e:
+        # 例如上限低到连 shell 都无法启动：报告原因，而不是留下一段 Python 回溯
+        _report(args.usage_fd, {"limits": limits, "error": f"无法在资源限制下启动命令: {e}"})
+        sys.stderr.write(f"[EMinder] 无法在资源限制下启动命令: {e}\n")
+        sys.exit(126)
+    _, status, rusage = os.wait4(child.pid, 0)
+
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    max_rss_kb = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    usage = {
+        "user_seconds": round(rusage.ru_utime, 3),
+        "system_seconds": round(rusage.ru_stime, 3),
+        "max_rss_mb": round(max_rss_kb / 1024, 1),
+        "limits": limits,
+        # 命令被 SIGXCPU 结束；经 shell 包装时表现为 shell 以 128 + SIGXCPU 退出
+        "cpu_limit_exceeded": args.cpu > 0 and (
+            (os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGXCPU)
+            or (os.WIFEXITED(status) and os.WEXITSTATUS(status) == 128 + signal.SIGXCPU)
+        ),
+    }
+    _report(args.usage_fd, usage)
+
+    if os.WIFSIGNALED(status):
+        sig = os.WTERMSIG(status)
+        signal.signal(sig, signal.SIG_DFL)
+        os.kill(os.getpid(), sig)
+    sys.exit(os.WEXITSTATUS(status) if os.WIFEXITED(status) else 1)
+
+
+if __name__ == "__main__":
+    main()
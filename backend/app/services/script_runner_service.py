@@ -1,16 +1,240 @@
 # backend/app/services/script_runner_service.py (新文件)
 import asyncio
 import datetime
+import json
 import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from ..core.config import settings
+from ..storage.sqlite_store import store
 # ========================== START: MODIFICATION (Fix Encoding Issue) ==========================
 # DESIGNER'S NOTE: 导入 locale 模块，用于安全地获取当前操作系统的默认编码。
 import locale
 # ========================== END: MODIFICATION (Fix Encoding Issue) ============================
 
+# ========================== START: MODIFICATION (Bounded Output Capture) ==========================
+# DESIGNER'S NOTE:
+# 原先使用 process.communicate()，完整的 stdout / stderr 会先全部缓存在内存中再解码，
+# 随后又被整体转义嵌入邮件 HTML；一个输出很多的脚本会撑爆内存和邮件大小。
+# 现在边运行边读取输出：内存中只保留开头 (head) 和结尾 (tail, 环形缓冲) 各一半，
+# 一旦超出上限，就把已有内容连同之后的全部输出写入 SCRIPT_LOG_DIR 下的日志文件，
+# 报告中可以选择把这个完整日志作为附件发送。无论脚本输出多少，内存占用都是固定的。
+# 写日志文件不在事件循环中进行：待写内容先累积在缓冲区，达到 _SPILL_FLUSH_BYTES 后交给工作线程写入。
+_READ_CHUNK_SIZE = 64 * 1024
+_SPILL_FLUSH_BYTES = 1024 * 1024
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+class _BoundedOutputCapture:
+    """单个输出流的有界捕获：保留开头与结尾，超出上限时把完整内容写入日志文件。"""
+
+    def __init__(self, max_bytes: int, spill_path: str):
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.head_limit = max_bytes // 2
+        self.tail_limit = max_bytes - self.head_limit
+        self.total_bytes = 0
+        self.spill_path = spill_path
+        self._spill_file = None
+        self._spilling = False
+        self._pending = bytearray()  # 尚未写入日志文件的内容
+        self._file_lock = threading.Lock()
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > len(self.head) + len(self.tail)
+
+    @property
+    def needs_flush(self) -> bool:
+        return len(self._pending) >= _SPILL_FLUSH_BYTES
+
+    def feed(self, chunk: bytes):
+        """在事件循环中调用，只操作内存缓冲区。"""
+        self.total_bytes += len(chunk)
+        if not self._spilling and self.total_bytes > self.head_limit + self.tail_limit and self.spill_path:
+            # 第一次超出上限：此时 head + tail 仍是完整内容，先放入待写缓冲区
+            self._spilling = True
+            self._pending += self.head
+            self._pending += self.tail
+        if self._spilling and self.spill_path:
+            self._pending += chunk
+
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self.tail += chunk
+            overflow = len(self.tail) - self.tail_limit
+            if overflow > 0:
+                del self.tail[:overflow]
+
+    def flush(self):
+        """把待写内容写入日志文件 (阻塞 I/O，在工作线程中调用)。"""
+        with self._file_lock:
+            data, self._pending = self._pending, bytearray()
+            if not data or not self.spill_path:
+                return
+            try:
+                if self._spill_file is None:
+                    os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+                    self._spill_file = open(self.spill_path, 'wb')
+                self._spill_file.write(data)
+            except OSError as e:
+                print(f"Warning: 无法写入完整脚本日志 {self.spill_path}: {e}")
+                self.spill_path = None
+                if self._spill_file is not None:
+                    self._spill_file.close()
+                    self._spill_file = None
+
+    def close(self):
+        """写入剩余内容并关闭日志文件 (在工作线程中调用)。"""
+        self.flush()
+        with self._file_lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    def head_bytes(self) -> bytes:
+        """截断时去掉开头缓冲末尾不完整的 UTF-8 多字节字符，避免整段被误判为其他编码。"""
+        head = bytes(self.head)
+        if self.truncated:
+            for back in range(1, min(4, len(head)) + 1):
+                byte = head[-back]
+                if byte < 0x80:
+                    break
+                if byte >= 0xC0:
+                    expected = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+                    if expected > back:
+                        head = head[:-back]
+                    break
+        return head
+
+    def tail_bytes(self) -> bytes:
+        """截断时去掉结尾缓冲开头被切断的 UTF-8 多字节字符残片。"""
+        tail = bytes(self.tail)
+        if self.truncated:
+            skip = 0
+            while skip < min(3, len(tail)) and 0x80 <= tail[skip] <= 0xBF:
+                skip += 1
+            tail = tail[skip:]
+        return tail
+
+
+def _prune_script_logs(log_dir: str, keep: int):
+    """
+    只保留最新的 keep 个完整日志文件 (阻塞 I/O，在工作线程中调用)。
+    发件箱中尚未发送成功的邮件仍作为附件引用的日志不会被删除，否则重试时附件会丢失。
+    """
+    try:
+        referenced = {os.path.abspath(path) for path in store.get_outbox_referenced_paths()}
+    except Exception as e:
+        print(f"Warning: 读取发件箱引用的附件失败，本次跳过脚本日志清理: {e}")
+        return
+    try:
+        with os.scandir(log_dir) as entries:
+            files = sorted((entry for entry in entries if entry.is_file()), key=lambda entry: entry.stat().st_mtime_ns)
+        for entry in files[:max(len(files) - keep, 0)]:
+            if os.path.abspath(entry.path) not in referenced:
+                os.remove(entry.path)
+    except OSError as e:
+        print(f"Warning: 清理脚本日志文件夹 {log_dir} 失败: {e}")
+# ========================== END: MODIFICATION (Bounded Output Capture) ============================
+
+
+# ========================== START: MODIFICATION (Timeouts & Concurrency) ==========================
+# DESIGNER'S NOTE:
+# 之前 run_script 没有超时：挂起的脚本会让对应的定时任务永远卡住；
+# 多个 cron 同时触发时也会不加限制地创建子进程。现在：
+# 1. 子进程在独立的进程组 (POSIX: start_new_session / Windows: CREATE_NEW_PROCESS_GROUP) 中运行，
+#    超时后先向整个进程组发送 SIGTERM，等待 SCRIPT_KILL_GRACE_SECONDS 后仍未退出则 SIGKILL
+#    (Windows 上使用 taskkill /T 结束整个进程树)，脚本派生的子进程也不会残留；
+# 2. 全局信号量限制同时运行的脚本数量 (SCRIPT_MAX_CONCURRENCY)，超出的请求排队等待；
+# 3. 记录排队与运行的统计信息，可通过 GET /api/scripts/metrics 查看。
+_IS_WINDOWS = sys.platform == "win32"
+
+# ========================== START: MODIFICATION (Resource Limits) ==========================
+# DESIGNER'S NOTE:
+# 在 POSIX 系统上，设置了资源限制 (或开启 SCRIPT_RESOURCE_ACCOUNTING) 的脚本通过 script_launcher.py 启动：
+# 启动器只在 fork 出的子进程中设置 rlimit (CPU 时间、内存、文件数) 后再运行命令，启动器自身不受限制；
+# 限制会被命令及其所有子进程继承，并且按进程计算 (CPU 上限作用于每个进程，而不是整个任务的总和)；命令结束后，启动器用 os.wait4 取得该命令的资源使用情况 (用户/系统 CPU 时间、峰值 RSS)，
+# 通过管道回传，并以与命令相同的返回码退出。
+# 每个脚本的用量独立统计，不受同时运行的其他脚本影响 (resource.getrusage(RUSAGE_CHILDREN) 做不到这一点)。
+# cgroups v2 需要额外的权限和系统配置，这里不使用；墙钟时间上限由超时机制 (SCRIPT_DEFAULT_TIMEOUT) 负责。
+_LAUNCHER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "script_launcher.py")
+RESOURCE_LIMIT_KEYS = ("cpu_seconds", "memory_mb", "open_files")
+# ========================== END: MODIFICATION (Resource Limits) ============================
+
+
+def _terminate_process_group(process: asyncio.subprocess.Process, force: bool):
+    """向脚本所在的整个进程组发送 SIGTERM (force=True 时为 SIGKILL)。进程已退出时忽略。"""
+    if process.returncode is not None:
+        return
+    try:
+        if _IS_WINDOWS:
+            args = ["taskkill", "/T", "/PID", str(process.pid)] + (["/F"] if force else [])
+            subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        else:
+            os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except OSError as e:
+        print(f"Warning: 结束脚本进程组 {process.pid} 失败: {e}")
+
+
+class _ScriptRunMetrics:
+    """脚本执行的排队与运行统计。"""
+
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.total_runs = 0
+        self.failed_runs = 0
+        self.timed_out_runs = 0
+        self.total_queue_wait_seconds = 0.0
+        self.max_queue_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def snapshot(self, max_concurrency: int) -> dict:
+        return {
+            "max_concurrency": max_concurrency,
+            "queued": self.queued,
+            "running": self.running,
+            "total_runs": self.total_runs,
+            "failed_runs": self.failed_runs,
+            "timed_out_runs": self.timed_out_runs,
+            "avg_queue_wait_seconds": round(self.total_queue_wait_seconds / self.total_runs, 3) if self.total_runs else 0.0,
+            "max_queue_wait_seconds": round(self.max_queue_wait_seconds, 3),
+            "avg_run_seconds": round(self.total_run_seconds / self.total_runs, 3) if self.total_runs else 0.0,
+        }
+# ========================== END: MODIFICATION (Timeouts & Concurrency) ============================
+
+
 class ScriptRunnerService:
     """
     一个用于在后台异步执行 shell 命令的服务。
     """
+
+    def __init__(self, max_concurrency: int, default_timeout: float, kill_grace_seconds: float,
+                 resource_accounting: bool = False, default_limits: dict = None):
+        self._max_concurrency = max(1, max_concurrency)
+        # 资源限制与用量统计依赖 resource 模块和 os.wait4，Windows 上不可用
+        self._launcher_available = not _IS_WINDOWS
+        # 未设置任何限制时是否仍经由启动器运行 (只为记录用量)
+        self._resource_accounting = resource_accounting
+        self._default_limits = default_limits or {}
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self._default_timeout = default_timeout
+        self._kill_grace_seconds = kill_grace_seconds
+        self._metrics = _ScriptRunMetrics()
+
+    def get_metrics(self) -> dict:
+        """返回当前的排队与运行统计。"""
+        return self._metrics.snapshot(self._max_concurrency)
     
     # ========================== START: MODIFICATION (Fix Encoding Issue) ==========================
     # DESIGNER'S NOTE:
@@ -51,14 +275,111 @@ class ScriptRunnerService:
         return output_bytes.decode('utf-8', errors='replace')
     # ========================== END: MODIFICATION (Fix Encoding Issue) ============================
 
-    async def run_script(self, command: str, working_directory: str = None) -> dict:
+    async def _kill_process_group(self, process: asyncio.subprocess.Process):
+        """SIGTERM → 等待宽限时间 → SIGKILL。"""
+        _terminate_process_group(process, force=False)
+        try:
+            await asyncio.wait_for(process.wait(), self._kill_grace_seconds)
+        except asyncio.TimeoutError:
+            _terminate_process_group(process, force=True)
+            await process.wait()
+
+    @staticmethod
+    async def _pump(stream: asyncio.StreamReader, capture: _BoundedOutputCapture):
+        while True:
+            chunk = await stream.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            capture.feed(chunk)
+            if capture.needs_flush:
+                # 等待写入完成后再继续读取：输出过快时管道被填满，脚本会自然地放慢
+                await asyncio.to_thread(capture.flush)
+
+    def _capture_result(self, name: str, capture: _BoundedOutputCapture) -> dict:
+        """
+        生成 stdout / stderr 相关的结果字段:
+        - name: 解码后的文本 (被截断时中间以省略提示代替)
+        - name_truncated / name_total_bytes: 是否被截断、实际输出的总字节数
+        - name_log_path: 被截断时完整日志文件的路径，否则为 None
+        """
+        # ========================== START: MODIFICATION (Fix Encoding Issue) ==========================
+        # 使用新的健壮解码函数来处理 stdout 和 stderr
+        text = self._decode_subprocess_output(capture.head_bytes())
+        if capture.truncated:
+            omitted = capture.total_bytes - len(capture.head) - len(capture.tail)
+            text += f"\n\n...... [已省略中间 {omitted} 字节，共 {capture.total_bytes} 字节] ......\n\n"
+        text += self._decode_subprocess_output(capture.tail_bytes())
+        # ========================== END: MODIFICATION (Fix Encoding Issue) ============================
+        return {
+            name: text,
+            f"{name}_truncated": capture.truncated,
+            f"{name}_total_bytes": capture.total_bytes,
+            f"{name}_log_path": capture.spill_path if capture.truncated else None,
+        }
+
+    async def run_script(self, command: str, working_directory: str = None, timeout: float = None, limits: dict = None) -> dict:
         """
         异步执行一个脚本命令，并捕获其标准输出和标准错误。
+        同时运行的脚本数超过 SCRIPT_MAX_CONCURRENCY 时会先排队。
 
         :param command: 要执行的完整 shell 命令 (例如 "python my_script.py --arg 1")。
         :param working_directory: 命令执行时的工作目录。
-        :return: 一个包含执行结果的字典。
+        :param timeout: 超时秒数，超时后结束整个进程组；为 None 或 0 时使用 SCRIPT_DEFAULT_TIMEOUT (其值为 0 表示不限制)。
+        :param limits: 资源限制 {"cpu_seconds", "memory_mb", "open_files"}，未提供或为 0 的项使用全局默认值。
+        :return: 一个包含执行结果的字典 (含 timed_out、queue_wait_seconds 与 resource_usage)。
         """
+        timeout = timeout or self._default_timeout or None
+        limits = {key: int((limits or {}).get(key) or self._default_limits.get(key) or 0) for key in RESOURCE_LIMIT_KEYS}
+        metrics = self._metrics
+        metrics.queued += 1
+        queued_at = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            metrics.queued -= 1
+        queue_wait = time.monotonic() - queued_at
+        metrics.running += 1
+        try:
+            result = await self._run_script(command, working_directory, timeout, limits)
+        finally:
+            metrics.running -= 1
+            self._semaphore.release()
+
+        result["queue_wait_seconds"] = round(queue_wait, 2)
+        metrics.total_runs += 1
+        metrics.failed_runs += 0 if result["success"] else 1
+        metrics.timed_out_runs += 1 if result.get("timed_out") else 0
+        metrics.total_queue_wait_seconds += queue_wait
+        metrics.max_queue_wait_seconds = max(metrics.max_queue_wait_seconds, queue_wait)
+        metrics.total_run_seconds += result.get("duration_seconds", 0)
+        return result
+
+    async def _spawn(self, command: str, cwd: str, limits: dict, usage_fd: int, **kwargs) -> asyncio.subprocess.Process:
+        """启动脚本；启用资源统计时经由启动器运行。"""
+        if usage_fd is None:
+            return await asyncio.create_subprocess_shell(command, cwd=cwd, **kwargs)
+        return await asyncio.create_subprocess_exec(
+            sys.executable, _LAUNCHER_PATH,
+            "--usage-fd", str(usage_fd),
+            "--cpu", str(limits["cpu_seconds"]),
+            "--memory-mb", str(limits["memory_mb"]),
+            "--nofile", str(limits["open_files"]),
+            "--", command,
+            cwd=cwd,
+            pass_fds=(usage_fd,),
+            **kwargs
+        )
+
+    @staticmethod
+    def _read_usage(read_fd: int):
+        """读取启动器回传的资源使用情况；启动器被强制结束时没有数据，返回 None。"""
+        try:
+            data = os.read(read_fd, 65536)
+            return json.loads(data) if data else None
+        except (OSError, ValueError):
+            return None
+
+    async def _run_script(self, command: str, working_directory: str, timeout: float, limits: dict) -> dict:
         start_time = datetime.datetime.now()
         
         # ========================== START: MODIFICATION (Fix Dev Mode Issue) ==========================
@@ -80,33 +401,87 @@ class ScriptRunnerService:
         print(f"[{start_time.strftime('%Y-%m-%d %H:%M:%S')}] 开始执行命令: '{command}' {log_friendly_dir}")
         # ========================== END: MODIFICATION (Fix Dev Mode Issue) ============================
 
+        log_dir = settings.SCRIPT_LOG_DIR if os.path.isabs(settings.SCRIPT_LOG_DIR) else os.path.join(BACKEND_DIR, settings.SCRIPT_LOG_DIR)
+        run_id = f"{start_time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        captures = {
+            name: _BoundedOutputCapture(settings.SCRIPT_OUTPUT_MAX_BYTES, os.path.join(log_dir, f"{run_id}_{name}.log"))
+            for name in ("stdout", "stderr")
+        }
+
+        # 脚本放在独立的进程组中运行，超时时可以连同其派生的子进程一起结束
+        group_kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP} if _IS_WINDOWS else {"start_new_session": True}
+        usage_read_fd = usage_write_fd = None
+        # 只有需要限制资源 (或显式开启用量统计) 时才经由启动器运行，否则直接启动 shell，省去一个额外的解释器进程
+        if self._launcher_available and (self._resource_accounting or any(limits.values())):
+            usage_read_fd, usage_write_fd = os.pipe()
         try:
-            process = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                # 使用解析后的绝对路径
-                cwd=abs_working_dir 
-            )
+            try:
+                process = await self._spawn(
+                    command,
+                    # 使用解析后的绝对路径
+                    abs_working_dir,
+                    limits,
+                    usage_write_fd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    **group_kwargs
+                )
+            finally:
+                if usage_write_fd is not None:
+                    os.close(usage_write_fd)
 
-            # 等待命令执行完成并异步读取输出
-            stdout, stderr = await process.communicate()
+            # 边运行边读取输出，内存中只保留有界的开头和结尾
+            pumps = asyncio.gather(
+                self._pump(process.stdout, captures["stdout"]),
+                self._pump(process.stderr, captures["stderr"]),
+                return_exceptions=True,
+            )
+            # 读取任务可能在下方被取消，提前标记其结果已被处理，避免 "exception was never retrieved" 警告
+            pumps.add_done_callback(lambda future: future.cancelled() or future.exception())
+            timed_out = False
+            try:
+                try:
+                    await asyncio.wait_for(process.wait(), timeout)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    print(f"命令执行超时 ({timeout}s)，正在结束进程组 {process.pid} ...")
+                    await self._kill_process_group(process)
+                # 进程已退出；若有脱离进程组的后代进程仍持有管道，最多再等待宽限时间
+                try:
+                    await asyncio.wait_for(asyncio.shield(pumps), self._kill_grace_seconds if timed_out else None)
+                except asyncio.TimeoutError:
+                    pumps.cancel()
+            finally:
+                # 任务被取消 (例如服务关闭) 时也不留下孤儿进程
+                if process.returncode is None:
+                    _terminate_process_group(process, force=True)
+                if not pumps.done():
+                    pumps.cancel()
+                await asyncio.gather(*(asyncio.to_thread(capture.close) for capture in captures.values()))
 
             end_time = datetime.datetime.now()
             duration = (end_time - start_time).total_seconds()
 
             result = {
-                "success": process.returncode == 0,
+                "success": process.returncode == 0 and not timed_out,
                 "return_code": process.returncode,
-                # ========================== START: MODIFICATION (Fix Encoding Issue) ==========================
-                # 使用新的健壮解码函数来处理 stdout 和 stderr
-                "stdout": self._decode_subprocess_output(stdout),
-                "stderr": self._decode_subprocess_output(stderr),
-                # ========================== END: MODIFICATION (Fix Encoding Issue) ============================
+                "timed_out": timed_out,
                 "start_time": start_time.strftime('%Y-%m-%d %H:%M:%S'),
                 "end_time": end_time.strftime('%Y-%m-%d %H:%M:%S'),
                 "duration_seconds": round(duration, 2)
             }
+            for name, capture in captures.items():
+                result.update(self._capture_result(name, capture))
+            result["resource_usage"] = self._read_usage(usage_read_fd) if usage_read_fd is not None else None
+            if result["resource_usage"] is not None:
+                if result["resource_usage"].get("error"):
+                    result["stderr"] += f"\n[EMinder] {result['resource_usage']['error']}"
+                elif result["resource_usage"].get("cpu_limit_exceeded"):
+                    result["stderr"] += f"\n[EMinder] 脚本超出 CPU 时间上限 ({limits['cpu_seconds']} 秒)，已被系统结束。"
+            if timed_out:
+                result["stderr"] += f"\n[EMinder] 脚本运行超过 {timeout} 秒，已被强制结束。"
+            if any(capture.spill_path and capture.truncated for capture in captures.values()):
+                await asyncio.to_thread(_prune_script_logs, log_dir, settings.SCRIPT_LOG_KEEP)
             print(f"命令执行完毕。耗时: {result['duration_seconds']}s, 返回码: {result['return_code']}")
             return result
 
@@ -119,6 +494,19 @@ class ScriptRunnerService:
             error_msg = f"执行命令时发生未知错误: {str(e)}"
             print(error_msg)
             return {"success": False, "stderr": error_msg, "return_code": -1, "stdout": ""}
+        finally:
+            if usage_read_fd is not None:
+                os.close(usage_read_fd)
 
 # 创建一个全局的脚本运行服务实例，供其他模块调用
-script_runner_service = ScriptRunnerService()
\ No newline at end of file
+script_runner_service = ScriptRunnerService(
+    max_concurrency=settings.SCRIPT_MAX_CONCURRENCY,
+    default_timeout=settings.SCRIPT_DEFAULT_TIMEOUT,
+    kill_grace_seconds=settings.SCRIPT_KILL_GRACE_SECONDS,
+    resource_accounting=settings.SCRIPT_RESOURCE_ACCOUNTING,
+    default_limits={
+        "cpu_seconds": settings.SCRIPT_CPU_LIMIT_SECONDS,
+        "memory_mb": settings.SCRIPT_MEMORY_LIMIT_MB,
+        "open_files": settings.SCRIPT_MAX_OPEN_FILES,
+    },
+)
\ No newline at end of file
@@ -1,8 +1,14 @@
 # backend/app/storage/sqlite_store.py (由 memory_store.py 修改并重命名)
+import asyncio
+import functools
 import sqlite3
 import os
+import json
+import time
 import threading
 import logging # 新增日志
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from ..core.config import settings
 
 # --- 数据库文件路径处理 ---
@@ -18,7 +24,11 @@ else:
 logger = logging.getLogger(__name__)
 logger.info(f"数据持久化已启用，数据库文件位于: {DB_FILE}")
 
+# 激活 LLM 配置缓存的“未缓存”标记 (None 本身是合法的缓存值：表示没有激活的配置)
+_UNCACHED = object()
+
 # 使用线程锁来确保在多线程环境下的数据安全
+# (仅用于串行化写操作；WAL 模式下读操作无需加锁，可与写操作并发进行)
 lock = threading.Lock()
 
 class SQLiteStore:
@@ -35,234 +45,564 @@ class SQLiteStore:
     """
     def __init__(self, db_path=DB_FILE):
         self._db_path = db_path
+        # ========================== START: MODIFICATION (Connection Reuse) ==========================
+        # DESIGNER'S NOTE:
+        # 原实现每次调用都新建并关闭一个 sqlite3 连接，API 与定时任务并发时连接建立开销和
+        # 全局锁竞争会直接体现在请求延迟上。现在每个线程复用自己的一条长连接 (threading.local)，
+        # 并开启 WAL 日志模式：读操作不再获取全局锁，只有写操作通过 lock 串行化。
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        # ========================== END: MODIFICATION (Connection Reuse) ============================
+        # 激活 LLM 配置的进程内缓存。每次修改 llm_configs 都会使版本号 +1 并清空缓存；
+        # 查询前后版本号不一致时不写入缓存，避免并发修改时缓存旧值。
+        self._active_llm_config = _UNCACHED
+        self._llm_config_version = 0
+        self._llm_config_lock = threading.Lock()
         self._init_db()
 
     def _get_connection(self):
-        """获取数据库连接, 并允许多线程访问"""
-        return sqlite3.connect(self._db_path, check_same_thread=False)
+        """获取当前线程复用的数据库连接 (首次调用时创建)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False 仅为了让 close() 能在关闭阶段统一回收所有线程的连接
+            conn = sqlite3.connect(self._db_path, check_same_thread=False, timeout=30)
+            conn.row_factory = sqlite3.Row # 让查询结果以字典形式返回
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
 
-    def _init_db(self):
-        """初始化数据库，如果 subscribers 表不存在则创建它"""
+    @contextmanager
+    def _read(self):
+        """只读操作：直接使用当前线程的连接，不获取写锁"""
+        yield self._get_connection().cursor()
+
+    @contextmanager
+    def _write(self):
+        """写操作：持有写锁，正常结束时提交，出现异常时回滚并继续抛出"""
         with lock:
             conn = self._get_connection()
-            cursor = conn.cursor()
             try:
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS subscribers (
-                        email TEXT PRIMARY KEY,
-                        remark_name TEXT,
-                        subscribed BOOLEAN NOT NULL DEFAULT 1,
-                        template_type TEXT,
-                        data_source TEXT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                # 【修改点】检查并添加 remark_name 列，以兼容旧数据库
-                cursor.execute("PRAGMA table_info(subscribers)")
-                columns = [column[1] for column in cursor.fetchall()]
-                if 'remark_name' not in columns:
-                    cursor.execute("ALTER TABLE subscribers ADD COLUMN remark_name TEXT")
-                    logger.info("数据库表 'subscribers' 已成功添加 'remark_name' 字段。")
-                
-                # ========================== START: MODIFICATION ==========================
-                # DESIGNER'S NOTE:
-                # 新增 LLM 配置表的初始化逻辑。
-                # 包含 ID、服务商名、API URL、API Key、模型名 和 是否激活的标志。
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS llm_configs (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        provider_name TEXT NOT NULL,
-                        api_url TEXT NOT NULL,
-                        api_key TEXT NOT NULL,
-                        model_name TEXT NOT NULL,
-                        is_active BOOLEAN NOT NULL DEFAULT 0,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                logger.info("数据库表 'llm_configs' 初始化或验证成功。")
-
+                yield conn.cursor()
                 conn.commit()
-            finally:
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def close(self):
+        """关闭所有线程创建的连接 (应用关闭时调用)"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
                 conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"关闭数据库连接时出错: {e}")
+        self._local = threading.local()
+
+    def _init_db(self):
+        """初始化数据库，如果 subscribers 表不存在则创建它"""
+        with self._write() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS subscribers (
+                    email TEXT PRIMARY KEY,
+                    remark_name TEXT,
+                    subscribed BOOLEAN NOT NULL DEFAULT 1,
+                    template_type TEXT,
+                    data_source TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # 【修改点】检查并添加 remark_name 列，以兼容旧数据库
+            cursor.execute("PRAGMA table_info(subscribers)")
+            columns = [column[1] for column in cursor.fetchall()]
+            if 'remark_name' not in columns:
+                cursor.execute("ALTER TABLE subscribers ADD COLUMN remark_name TEXT")
+                logger.info("数据库表 'subscribers' 已成功添加 'remark_name' 字段。")
+            
+            # ========================== START: MODIFICATION ==========================
+            # DESIGNER'S NOTE:
+            # 新增 LLM 配置表的初始化逻辑。
+            # 包含 ID、服务商名、API URL、API Key、模型名 和 是否激活的标志。
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS llm_configs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    provider_name TEXT NOT NULL,
+                    api_url TEXT NOT NULL,
+                    api_key TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    is_active BOOLEAN NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            logger.info("数据库表 'llm_configs' 初始化或验证成功。")
+
+            # LLM 响应缓存表：cache_key 为 (服务商, 模型, 系统提示词, 提示词) 的 SHA-256。
+            # last_used_at 用于 LRU 淘汰，created_at 用于 TTL 过期判断。
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS llm_response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    provider_name TEXT,
+                    model_name TEXT,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_response_cache (last_used_at)")
+
+            # ========================== START: MODIFICATION (Outbox) ==========================
+            # DESIGNER'S NOTE:
+            # 发件箱 (outbox) 表：已渲染好的邮件先持久化到这里，再由后台投递器发送。
+            # status 取值: pending (待发送) / sending (投递中) / sent (已发送) / dead (多次失败，进入死信)
+            # attachments / embedded_images / cleanup_paths 以 JSON 列表形式存储。
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    receiver_email TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    html_content TEXT NOT NULL,
+                    attachments TEXT NOT NULL DEFAULT '[]',
+                    embedded_images TEXT NOT NULL DEFAULT '[]',
+                    cleanup_paths TEXT NOT NULL DEFAULT '[]',
+                    source TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_status_next ON outbox (status, next_attempt_at)")
+            logger.info("数据库表 'outbox' 初始化或验证成功。")
+            # ========================== END: MODIFICATION (Outbox) ============================
+
+            # 每日总结历史索引：缓存 history 文件夹中每个 YYYY-MM-DD.md 的解析结果。
+            # (mtime_ns, size, parser_version) 不变的文件无需重新读取和解析。
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS history_index (
+                    path TEXT PRIMARY KEY,
+                    history_dir TEXT NOT NULL,
+                    file_date TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    parser_version INTEGER NOT NULL,
+                    parsed TEXT NOT NULL,
+                    done_count INTEGER NOT NULL,
+                    total INTEGER NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_dir_date ON history_index (history_dir, file_date)")
 
     def add_subscriber(self, email: str, remark_name: str, template_type: str = "daily_summary") -> bool:
         """【修改】直接添加一个活跃的订阅者，无需确认"""
-        with lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            try:
+        try:
+            with self._write() as cursor:
                 # 使用 INSERT OR REPLACE (UPSERT) 插入或更新记录
                 cursor.execute("""
                     INSERT OR REPLACE INTO subscribers (email, remark_name, subscribed, template_type, data_source)
                     VALUES (?, ?, 1, ?, ?)
                 """, (email, remark_name, template_type, email))
-                conn.commit()
-                logger.info(f"持久化存储区：已添加或更新订阅者 {email} (备注: {remark_name})")
-                return True
-            except sqlite3.IntegrityError:
-                # 理论上 INSERT OR REPLACE 不会触发此错误，但作为保险
-                return False
-            finally:
-                conn.close()
+            logger.info(f"持久化存储区：已添加或更新订阅者 {email} (备注: {remark_name})")
+            return True
+        except sqlite3.IntegrityError:
+            # 理论上 INSERT OR REPLACE 不会触发此错误，但作为保险
+            return False
 
     def update_subscriber(self, email: str, new_remark_name: str) -> bool:
         """【新增】更新指定邮箱的备注名"""
-        with lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            try:
-                cursor.execute("UPDATE subscribers SET remark_name = ? WHERE email = ?", (new_remark_name, email))
-                conn.commit()
-                # rowcount 会返回受影响的行数，如果大于0则说明更新成功
-                if cursor.rowcount > 0:
-                    logger.info(f"持久化存储区：已更新 {email} 的备注为 {new_remark_name}")
-                    return True
-                return False # 没有找到对应的 email
-            finally:
-                conn.close()
+        with self._write() as cursor:
+            cursor.execute("UPDATE subscribers SET remark_name = ? WHERE email = ?", (new_remark_name, email))
+            # rowcount 会返回受影响的行数，如果大于0则说明更新成功
+            if cursor.rowcount > 0:
+                logger.info(f"持久化存储区：已更新 {email} 的备注为 {new_remark_name}")
+                return True
+            return False # 没有找到对应的 email
 
     def delete_subscriber(self, email: str) -> bool:
         """【新增】根据邮箱删除一个订阅者"""
-        with lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            try:
-                cursor.execute("DELETE FROM subscribers WHERE email = ?", (email,))
-                conn.commit()
-                if cursor.rowcount > 0:
-                    logger.info(f"持久化存储区：已删除订阅者 {email}")
-                    return True
-                return False # 没有找到要删除的 email
-            finally:
-                conn.close()
+        with self._write() as cursor:
+            cursor.execute("DELETE FROM subscribers WHERE email = ?", (email,))
+            if cursor.rowcount > 0:
+                logger.info(f"持久化存储区：已删除订阅者 {email}")
+                return True
+            return False # 没有找到要删除的 email
 
     def get_active_subscribers(self) -> list[dict]:
         """【修改】获取所有已激活的订阅者信息，包含备注名"""
-        conn = self._get_connection()
-        conn.row_factory = sqlite3.Row # 让查询结果以字典形式返回
-        cursor = conn.cursor()
-        try:
+        with self._read() as cursor:
             cursor.execute("SELECT email, remark_name, template_type, data_source FROM subscribers WHERE subscribed = 1 ORDER BY created_at DESC")
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
-        finally:
-            conn.close()
+
+    def get_subscribers_by_emails(self, emails: list[str]) -> dict:
+        """批量查询订阅者 (无论是否激活)，返回 {email: 订阅者信息}，不存在的邮箱不会出现在结果中。"""
+        result = {}
+        emails = list(dict.fromkeys(emails))
+        with self._read() as cursor:
+            # 分批查询，避免超出 SQLite 单条语句的参数数量上限
+            for i in range(0, len(emails), 500):
+                batch = emails[i:i + 500]
+                cursor.execute(
+                    f"SELECT email, remark_name, template_type, data_source FROM subscribers WHERE email IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                for row in cursor.fetchall():
+                    result[row["email"]] = dict(row)
+        return result
 
     def email_exists(self, email: str) -> bool:
         """检查邮箱是否已存在（无论是否已确认）"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        try:
+        with self._read() as cursor:
             cursor.execute("SELECT 1 FROM subscribers WHERE email = ?", (email,))
             return cursor.fetchone() is not None
-        finally:
-            conn.close()
             
     # ========================== START: MODIFICATION ==========================
     # DESIGNER'S NOTE:
     # 以下是为 LLM 配置管理新增的一整套数据库操作方法。
+
+    def _invalidate_llm_config_cache(self):
+        with self._llm_config_lock:
+            self._llm_config_version += 1
+            self._active_llm_config = _UNCACHED
+
+    def get_cached_active_llm_config(self):
+        """返回缓存中的激活配置 (副本)，尚未缓存时返回 _UNCACHED，不访问数据库。"""
+        config = self._active_llm_config
+        if config is _UNCACHED or config is None:
+            return config
+        return dict(config)
     
     def get_all_llm_configs(self) -> list[dict]:
         """获取所有已保存的LLM配置。"""
-        conn = self._get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        try:
+        with self._read() as cursor:
             cursor.execute("SELECT id, provider_name, api_url, api_key, model_name, is_active FROM llm_configs ORDER BY created_at DESC")
             rows = cursor.fetchall()
-            # 为了安全，不在返回给API的列表中包含完整的API Key
-            configs = []
-            for row in rows:
-                config = dict(row)
-                config['api_key'] = f"***{config['api_key'][-4:]}" if config['api_key'] and len(config['api_key']) > 4 else "***"
-                configs.append(config)
-            return configs
-        finally:
-            conn.close()
+        # 为了安全，不在返回给API的列表中包含完整的API Key
+        configs = []
+        for row in rows:
+            config = dict(row)
+            config['api_key'] = f"***{config['api_key'][-4:]}" if config['api_key'] and len(config['api_key']) > 4 else "***"
+            configs.append(config)
+        return configs
 
     def add_llm_config(self, provider_name: str, api_url: str, api_key: str, model_name: str) -> bool:
         """添加一个新的LLM配置。"""
-        with lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            try:
-                cursor.execute("""
-                    INSERT INTO llm_configs (provider_name, api_url, api_key, model_name)
-                    VALUES (?, ?, ?, ?)
-                """, (provider_name, api_url, api_key, model_name))
-                conn.commit()
-                return True
-            finally:
-                conn.close()
+        with self._write() as cursor:
+            cursor.execute("""
+                INSERT INTO llm_configs (provider_name, api_url, api_key, model_name)
+                VALUES (?, ?, ?, ?)
+            """, (provider_name, api_url, api_key, model_name))
+        self._invalidate_llm_config_cache()
+        return True
 
     def update_llm_config(self, config_id: int, provider_name: str, api_url: str, api_key: str, model_name: str) -> bool:
         """更新一个已存在的LLM配置。如果api_key为空字符串或None，则不更新它。"""
-        with lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            try:
-                if api_key: # 只有在提供了新的key时才更新
-                    cursor.execute("""
-                        UPDATE llm_configs SET provider_name=?, api_url=?, api_key=?, model_name=?
-                        WHERE id=?
-                    """, (provider_name, api_url, api_key, model_name, config_id))
-                else: # 不更新key
-                     cursor.execute("""
-                        UPDATE llm_configs SET provider_name=?, api_url=?, model_name=?
-                        WHERE id=?
-                    """, (provider_name, api_url, model_name, config_id))
-                conn.commit()
-                return cursor.rowcount > 0
-            finally:
-                conn.close()
+        with self._write() as cursor:
+            if api_key: # 只有在提供了新的key时才更新
+                cursor.execute("""
+                    UPDATE llm_configs SET provider_name=?, api_url=?, api_key=?, model_name=?
+                    WHERE id=?
+                """, (provider_name, api_url, api_key, model_name, config_id))
+            else: # 不更新key
+                cursor.execute("""
+                    UPDATE llm_configs SET provider_name=?, api_url=?, model_name=?
+                    WHERE id=?
+                """, (provider_name, api_url, model_name, config_id))
+            updated = cursor.rowcount > 0
+        self._invalidate_llm_config_cache()
+        return updated
 
     def delete_llm_config(self, config_id: int) -> bool:
         """删除一个LLM配置。"""
-        with lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            try:
-                cursor.execute("DELETE FROM llm_configs WHERE id=?", (config_id,))
-                conn.commit()
-                return cursor.rowcount > 0
-            finally:
-                conn.close()
+        with self._write() as cursor:
+            cursor.execute("DELETE FROM llm_configs WHERE id=?", (config_id,))
+            deleted = cursor.rowcount > 0
+        self._invalidate_llm_config_cache()
+        return deleted
 
     def set_active_llm_config(self, config_id: int) -> bool:
         """设置一个LLM配置为激活状态，并取消其他所有配置的激活状态（事务性操作）。"""
-        with lock:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            try:
-                # 开启一个事务
-                conn.execute("BEGIN")
+        try:
+            with self._write() as cursor:
+                # 开启一个事务 (IMMEDIATE: 立即获取写锁，避免读到一半被其他进程抢先写入)
+                cursor.execute("BEGIN IMMEDIATE")
                 # 1. 将所有配置设为不激活
                 cursor.execute("UPDATE llm_configs SET is_active = 0")
                 # 2. 将指定ID的配置设为激活
                 cursor.execute("UPDATE llm_configs SET is_active = 1 WHERE id=?", (config_id,))
-                # 提交事务
-                conn.commit()
-                return cursor.rowcount > 0
-            except sqlite3.Error as e:
-                logger.error(f"设置激活LLM配置时发生数据库事务错误: {e}")
-                conn.rollback()
-                return False
-            finally:
-                conn.close()
+                activated = cursor.rowcount > 0
+        except sqlite3.Error as e:
+            logger.error(f"设置激活LLM配置时发生数据库事务错误: {e}")
+            return False
+        finally:
+            self._invalidate_llm_config_cache()
+        return activated
 
     def get_active_llm_config(self):
-        """获取当前激活的LLM配置的完整信息。"""
-        conn = self._get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        try:
+        """获取当前激活的LLM配置的完整信息 (优先使用进程内缓存)。"""
+        cached = self.get_cached_active_llm_config()
+        if cached is not _UNCACHED:
+            return cached
+        version = self._llm_config_version
+        with self._read() as cursor:
             cursor.execute("SELECT id, provider_name, api_url, api_key, model_name FROM llm_configs WHERE is_active = 1 LIMIT 1")
             row = cursor.fetchone()
-            return dict(row) if row else None
-        finally:
-            conn.close()
+        config = dict(row) if row else None
+        with self._llm_config_lock:
+            if version == self._llm_config_version:
+                self._active_llm_config = config
+        return dict(config) if config else None
+
+    def get_llm_cached_response(self, cache_key: str, ttl_seconds: float):
+        """读取一条未过期的 LLM 缓存响应，命中时刷新其 LRU 时间；未命中或已过期返回 None。"""
+        with self._read() as cursor:
+            cursor.execute("SELECT content, created_at FROM llm_response_cache WHERE cache_key = ?", (cache_key,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        with self._write() as cursor:
+            if now - row["created_at"] > ttl_seconds:
+                cursor.execute("DELETE FROM llm_response_cache WHERE cache_key = ?", (cache_key,))
+                return None
+            cursor.execute("UPDATE llm_response_cache SET last_used_at = ? WHERE cache_key = ?", (now, cache_key))
+        return row["content"]
+
+    def put_llm_cached_response(self, cache_key: str, provider_name: str, model_name: str,
+                                content: str, max_entries: int) -> None:
+        """写入一条 LLM 缓存响应，并按 LRU 淘汰超出 max_entries 的旧条目。"""
+        now = time.time()
+        with self._write() as cursor:
+            cursor.execute("""
+                INSERT OR REPLACE INTO llm_response_cache (cache_key, provider_name, model_name, content, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (cache_key, provider_name, model_name, content, now, now))
+            cursor.execute("""
+                DELETE FROM llm_response_cache WHERE cache_key IN (
+                    SELECT cache_key FROM llm_response_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (max_entries,))
     # ========================== END: MODIFICATION ============================
 
+    # ========================== START: MODIFICATION (Outbox) ==========================
+    # DESIGNER'S NOTE:
+    # 以下是发件箱 (outbox) 的数据库操作方法，由 outbox_service 中的后台投递器使用。
+
+    @staticmethod
+    def _outbox_row_to_dict(row) -> dict:
+        message = dict(row)
+        for key in ("attachments", "embedded_images", "cleanup_paths"):
+            message[key] = json.loads(message[key]) if message.get(key) else []
+        return message
+
+    def enqueue_outbox_message(self, receiver_email: str, subject: str, html_content: str,
+                               attachments: list = None, embedded_images: list = None,
+                               cleanup_paths: list = None, source: str = None) -> int:
+        """将一封已渲染好的邮件加入发件箱，返回其 ID。"""
+        with self._write() as cursor:
+            cursor.execute("""
+                INSERT INTO outbox (receiver_email, subject, html_content, attachments, embedded_images,
+                                    cleanup_paths, source, next_attempt_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (receiver_email, subject, html_content, json.dumps(attachments or []),
+                  json.dumps(embedded_images or []), json.dumps(cleanup_paths or []), source, time.time()))
+            return cursor.lastrowid
+
+    def claim_outbox_batch(self, limit: int) -> list[dict]:
+        """取出一批已到期的待发送邮件，并将其标记为 'sending' (事务性操作，避免重复投递)。"""
+        try:
+            with self._write() as cursor:
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute("""
+                    SELECT * FROM outbox WHERE status = 'pending' AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at, id LIMIT ?
+                """, (time.time(), limit))
+                rows = cursor.fetchall()
+                if rows:
+                    cursor.executemany(
+                        "UPDATE outbox SET status = 'sending', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                        [(row["id"],) for row in rows]
+                    )
+            return [self._outbox_row_to_dict(row) for row in rows]
+        except sqlite3.Error as e:
+            logger.error(f"从发件箱领取邮件时发生数据库事务错误: {e}")
+            return []
+
+    def mark_outbox_sent(self, message_id: int) -> bool:
+        """将一封邮件标记为已发送。"""
+        with self._write() as cursor:
+            cursor.execute("""
+                UPDATE outbox SET status = 'sent', attempts = attempts + 1, last_error = NULL,
+                                  updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (message_id,))
+            return cursor.rowcount > 0
+
+    def mark_outbox_failed(self, message_id: int, error: str, next_attempt_at: float = None) -> bool:
+        """
+        记录一次发送失败。
+        提供 next_attempt_at 时邮件回到 'pending' 等待重试，否则进入死信状态 'dead'。
+        """
+        status = "pending" if next_attempt_at is not None else "dead"
+        with self._write() as cursor:
+            cursor.execute("""
+                UPDATE outbox SET status = ?, attempts = attempts + 1, last_error = ?,
+                                  next_attempt_at = COALESCE(?, next_attempt_at), updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (status, error, next_attempt_at, message_id))
+            return cursor.rowcount > 0
+
+    def recover_outbox_in_flight(self) -> int:
+        """
+        启动时调用：把上次进程退出时仍处于 'sending' 状态的邮件恢复为 'pending'。
+        :return: 被恢复的邮件数量。
+        """
+        with self._write() as cursor:
+            cursor.execute("UPDATE outbox SET status = 'pending', updated_at = CURRENT_TIMESTAMP WHERE status = 'sending'")
+            return cursor.rowcount
+
+    def purge_sent_outbox(self, older_than: float) -> int:
+        """
+        删除在 older_than (Unix 时间戳) 之前就已发送成功的邮件，其他状态的邮件 (包括死信) 不受影响。
+        :return: 被删除的邮件数量。
+        """
+        with self._write() as cursor:
+            cursor.execute(
+                "DELETE FROM outbox WHERE status = 'sent' AND updated_at < datetime(?, 'unixepoch')",
+                (older_than,)
+            )
+            return cursor.rowcount
+
+    def requeue_outbox_message(self, message_id: int) -> bool:
+        """将一封死信邮件重新放回发送队列 (重置尝试次数)。"""
+        with self._write() as cursor:
+            cursor.execute("""
+                UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'dead'
+            """, (time.time(), message_id))
+            return cursor.rowcount > 0
+
+    def get_outbox_referenced_paths(self) -> set:
+        """返回尚未发送成功 (待发送 / 投递中 / 死信) 的邮件引用的所有附件与内嵌图片路径。"""
+        paths = set()
+        with self._read() as cursor:
+            cursor.execute("SELECT attachments, embedded_images FROM outbox WHERE status IN ('pending', 'sending', 'dead')")
+            for row in cursor.fetchall():
+                paths.update(json.loads(row["attachments"] or "[]"))
+                paths.update(image.get("path") for image in json.loads(row["embedded_images"] or "[]") if image.get("path"))
+        return paths
+
+    def get_outbox_messages(self, status: str = None, limit: int = 100) -> list[dict]:
+        """查询发件箱中的邮件 (不含正文)，可按状态过滤。"""
+        query = """
+            SELECT id, receiver_email, subject, source, status, attempts, next_attempt_at, last_error,
+                   created_at, updated_at
+            FROM outbox
+        """
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._read() as cursor:
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+    # ========================== END: MODIFICATION (Outbox) ============================
+
+    # --- 每日总结历史索引 (由 history_index_service 使用) ---
+
+    def get_history_index_stats(self, history_dir: str) -> dict:
+        """返回指定 history 文件夹下已索引文件的 {path: (mtime_ns, size, parser_version)}。"""
+        with self._read() as cursor:
+            cursor.execute("SELECT path, mtime_ns, size, parser_version FROM history_index WHERE history_dir = ?", (history_dir,))
+            return {row["path"]: (row["mtime_ns"], row["size"], row["parser_version"]) for row in cursor.fetchall()}
+
+    def upsert_history_index_entries(self, entries: list[dict]) -> None:
+        """写入或更新一批索引条目 (parsed 为 _parse_daily_summary 的结果字典)。"""
+        with self._write() as cursor:
+            cursor.executemany("""
+                INSERT OR REPLACE INTO history_index (path, history_dir, file_date, mtime_ns, size, parser_version,
+                                                      parsed, done_count, total)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(e["path"], e["history_dir"], e["file_date"], e["mtime_ns"], e["size"], e["parser_version"],
+                   json.dumps(e["parsed"], ensure_ascii=False), len(e["parsed"]["done"]), e["parsed"]["total"])
+                  for e in entries])
+
+    def delete_history_index_entries(self, paths: list[str]) -> None:
+        """删除已不存在的文件对应的索引条目。"""
+        with self._write() as cursor:
+            cursor.executemany("DELETE FROM history_index WHERE path = ?", [(path,) for path in paths])
+
+    def query_history_index(self, history_dir: str, start_date: str, end_date: str) -> list[dict]:
+        """按日期顺序返回 [start_date, end_date) 范围内每个文件的 {"file_date", "parsed"}。"""
+        with self._read() as cursor:
+            cursor.execute("""
+                SELECT file_date, parsed FROM history_index
+                WHERE history_dir = ? AND file_date >= ? AND file_date < ?
+                ORDER BY file_date, path
+            """, (history_dir, start_date, end_date))
+            return [{"file_date": row["file_date"], "parsed": json.loads(row["parsed"])} for row in cursor.fetchall()]
+
+    def get_history_aggregates(self, history_dir: str, start_date: str, end_date: str) -> dict:
+        """直接在数据库中汇总 [start_date, end_date) 范围内的天数、计划任务数和完成任务数。"""
+        with self._read() as cursor:
+            cursor.execute("""
+                SELECT COUNT(*) AS days, COALESCE(SUM(total), 0) AS total_tasks, COALESCE(SUM(done_count), 0) AS done_tasks
+                FROM history_index
+                WHERE history_dir = ? AND file_date >= ? AND file_date < ?
+            """, (history_dir, start_date, end_date))
+            return dict(cursor.fetchone())
+
+
+# ========================== START: MODIFICATION (Async Store) ==========================
+# DESIGNER'S NOTE:
+# SQLiteStore 是同步的，但它会在 async 端点、LLM 服务、发件箱投递器和定时任务中被调用，
+# 直接调用会阻塞同一个事件循环上正在进行的 SMTP 发送和调度任务。
+# AsyncSQLiteStore 提供与 SQLiteStore 完全相同的方法 (均为协程)，实际的数据库操作
+# 在专用的数据库线程池中执行；每个线程复用自己的连接，因此不会引入额外的连接开销。
+
+class AsyncSQLiteStore:
+    """SQLiteStore 的异步包装：`await async_store.get_active_subscribers()`"""
+
+    def __init__(self, sync_store: SQLiteStore, max_workers: int):
+        self._store = sync_store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sqlite-store")
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._store, name)
+        if name.startswith("_") or not callable(attr):
+            raise AttributeError(f"AsyncSQLiteStore 不提供 '{name}'")
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(attr, *args, **kwargs))
+
+        # 缓存包装后的方法，避免每次访问都重新创建
+        setattr(self, name, wrapper)
+        return wrapper
+
+    async def get_active_llm_config(self):
+        """命中进程内缓存时直接返回，不必切换到数据库线程。"""
+        cached = self._store.get_cached_active_llm_config()
+        if cached is not _UNCACHED:
+            return cached
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._store.get_active_llm_config)
+
+    def shutdown(self):
+        """等待进行中的数据库操作完成并关闭数据库线程 (应用关闭时调用)"""
+        self._executor.shutdown(wait=True)
+# ========================== END: MODIFICATION (Async Store) ============================
+
 
 # 创建一个全局存储实例
-store = SQLiteStore()
\ No newline at end of file
+store = SQLiteStore()
+# 异步代码中应使用 async_store，避免阻塞事件循环
+async_store = AsyncSQLiteStore(store, settings.SQLITE_EXECUTOR_WORKERS)
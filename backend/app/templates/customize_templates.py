@@ -23,7 +23,9 @@
                   "default": "该字段的默认值"
               },
               // ... 可以添加更多字段
-          ]
+          ],
+          "deterministic": True  // 可选：模板输出只取决于 data 和当天日期 (不读文件、不调用 API) 时声明，
+                                 // 相同输入在同一天内重复渲染会直接使用缓存结果
       }
 
  2. 编写模板生成函数 (Template Function):
@@ -39,9 +41,11 @@
     - 将这个模板信息添加到一个名为 `custom_templates` 的字典中，key 为模板的唯一标识符。
 
  4. 启用模板:
-    - **最重要的一步**: 前往 `email_templates.py` 文件。
-    - 取消对 `from .customize_templates import custom_templates` 的注释。
-    - 程序会自动将你在这里定义的所有模板合并到主模板管理器中。
+    - 无需额外操作：程序启动时会自动发现本文件中 `custom_templates` 里的所有模板，并合并到主模板管理器中。
+    - 启动时只静态读取元数据，本文件要到某个模板第一次被使用时才会导入。
+      因此 `custom_templates` 必须是字典字面量，"meta" 写成字典或引用模块顶层的字典变量，"func" 写成函数名。
+    - 也可以把模板写在单独的 .py 文件中 (同样定义 `custom_templates`，使用 `from app.xxx import ...` 形式的绝对导入)，
+      放进环境变量 TEMPLATE_PLUGIN_DIR 指向的文件夹，与本文件同名的模板会被插件覆盖。
 
  --- 示例 ---
 
@@ -52,27 +56,20 @@
 # 新增功能所需模块导入
 # ===================================================================================
 import os
+import asyncio
 import datetime
 import re
-import glob
 import shutil
 import json
 from collections import defaultdict
 from ..core.config import settings
 from ..services.llm_service import llm_service
 from ..services.script_runner_service import script_runner_service
-
-try:
-    import markdown
-    def convert_markdown_to_html(md_text):
-        # 使用 fenced_code 和 tables 扩展来更好地支持代码块和表格
-        return markdown.markdown(md_text, extensions=['fenced_code', 'tables'])
-except ImportError:
-    print("警告: 'Markdown' 库未安装。报告文件将以纯文本格式显示。请运行 'pip install Markdown' 以获得完整功能。")
-    def convert_markdown_to_html(md_text):
-        # 简单的纯文本到HTML的转换，作为降级方案
-        escaped_text = md_text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-        return f"<pre style='white-space: pre-wrap; word-wrap: break-word;'>{escaped_text}</pre>"
+from ..services.history_index_service import history_index_service
+from ..services.attachment_scanner import scan_attachments
+from .timelog_analytics import TimeLog, aggregate_time_logs, describe_aggregate, describe_stats, format_duration
+from .markdown_renderer import convert_markdown_to_html
+from .report_file_cache import report_file_cache
 
 
 # ===================================================================================
@@ -95,7 +92,12 @@ def _read_and_process_report_file(report_folder: str, report_filename: str) -> d
         abs_report_folder = report_folder if os.path.isabs(report_folder) else os.path.abspath(os.path.join(backend_dir, report_folder))
         file_path = os.path.join(abs_report_folder, report_filename)
 
-        if not os.path.exists(file_path):
+        try:
+            stat_result = os.stat(file_path)
+        except FileNotFoundError:
+            stat_result = None
+
+        if stat_result is None:
             error_message = f"""
                 <h4>错误：报告文件未找到</h4>
                 <p>系统尝试读取以下路径的文件，但文件不存在：</p>
@@ -109,6 +111,12 @@ def _read_and_process_report_file(report_folder: str, report_filename: str) -> d
             """
             return {"error": True, "subject": f"错误：报告文件 {report_filename} 未找到", "html": error_message}
 
+        # 文件未改变 (mtime 与大小一致) 时直接使用缓存的渲染结果，不读取文件、不做 Markdown 转换
+        signature = report_file_cache.signature(stat_result)
+        cached = report_file_cache.get(file_path, signature)
+        if cached is not None:
+            return {"error": False, **cached}
+
         with open(file_path, 'r', encoding='utf-8') as f:
             markdown_content = f.read()
         
@@ -120,11 +128,9 @@ def _read_and_process_report_file(report_folder: str, report_filename: str) -> d
         # 移除 Markdown 标题标记，如 '#'
         subject_title = first_line.lstrip('#').strip() if first_line else report_filename
         
-        return {
-            "error": False,
-            "subject": f"定时报告 - {subject_title}",
-            "html": html_content
-        }
+        rendered = {"subject": f"定时报告 - {subject_title}", "html": html_content}
+        report_file_cache.put(file_path, signature, rendered)
+        return {"error": False, **rendered}
 
     except Exception as e:
         error_message = f"""
@@ -158,68 +164,24 @@ TIMELINE_COLORS = {
     '通勤': '#FFD54F', '家务': '#A1887F', '琐事': '#E0E0E0', '沉溺': '#546E7A'
 }
 
-def _time_str_to_seconds(t_str):
-    """辅助函数：将 HH:MM:SS 转换为秒"""
-    try:
-        parts = list(map(int, t_str.split(':')))
-        return parts[0] * 3600 + parts[1] * 60 + parts[2]
-    except (ValueError, IndexError):
-        return 0
-
-def _render_timeline_html(log_text: str) -> str:
+def _render_timeline_html(time_log: TimeLog, now: datetime.datetime) -> str:
     """
-    [核心修改] 将时间日志文本转换为横向时间轴 HTML。
-    该函数包含完整的鲁棒性检查，如果日志为空或解析失败，安全返回空字符串。
+    [核心修改] 将解析好的时间日志 (TimeLog) 转换为横向时间轴 HTML。
+    如果日志为空或没有有效记录，安全返回空字符串。
     """
-    if not log_text or not log_text.strip():
+    if not len(time_log):
         return ""
 
-    lines = log_text.strip().split('\n')
-    tasks = []
-    # 正则匹配: - [00:00:00 - 01:00:00] [Category] [Main/Sub] | Remark
-    # 兼容 ... 结束时间
-    regex = re.compile(r'^\-\s*\[(\d{2}:\d{2}:\d{2})\s*-\s*(.*?)\]\s*\[(.*?)\]\s*\[(.*?)\/(.*?)\](?:\s*\|\s*(.*))?$')
-    
-    now = datetime.datetime.now()
     # 计算当前是一天中的第几秒
     current_seconds_of_day = now.hour * 3600 + now.minute * 60 + now.second
     # 范围至少显示到当前时间，且至少显示1小时，避免除以0或范围过小
     total_scope = max(current_seconds_of_day, 3600)
 
-    for line in lines:
-        match = regex.match(line.strip())
-        if match:
-            start_str, end_str, cat, main_cat, sub_cat, remark = match.groups()
-            remark = remark or ''
-            
-            # 处理 "..." 表示进行中，结束时间设为当前时间
-            if '...' in end_str:
-                end_sec = current_seconds_of_day
-                display_end = now.strftime("%H:%M:%S")
-            else:
-                end_sec = _time_str_to_seconds(end_str)
-                display_end = end_str
-            
-            start_sec = _time_str_to_seconds(start_str)
-            duration = end_sec - start_sec
-            
-            if duration > 0:
-                tasks.append({
-                    'start': start_sec,
-                    'duration': duration,
-                    'sub': sub_cat,
-                    'remark': remark,
-                    'raw_start': start_str,
-                    'raw_end': display_end,
-                    'category': cat,
-                    'main': main_cat
-                })
-
-    if not tasks:
-        return ""
+    # 单次遍历按子类分组，避免对每个子类重复扫描全部记录
+    rows = time_log.group_by_sub()
 
     # 按子类名称排序
-    sorted_subs = sorted(list(set(t['sub'] for t in tasks)))
+    sorted_subs = sorted(rows)
     
     # 开始构建 HTML
     # 使用内联样式以确保邮件兼容性 (Mail clients often strip external CSS)
@@ -259,13 +221,12 @@ def _render_timeline_html(log_text: str) -> str:
         html_parts.append('<div style="flex-grow: 1; height: 20px; background: #f0f0f0; position: relative; border-radius: 4px;">')
         
         # 渲染该轨道上的所有任务块
-        row_tasks = [t for t in tasks if t['sub'] == sub]
-        for t in row_tasks:
-            left_pct = (t['start'] / total_scope) * 100
-            width_pct = (t['duration'] / total_scope) * 100
+        for i in rows[sub]:
+            left_pct = (time_log.starts[i] / total_scope) * 100
+            width_pct = ((time_log.ends[i] - time_log.starts[i]) / total_scope) * 100
             
             # Tooltip content (使用 title 属性，这是最兼容的实现方式)
-            title_text = f"[{t['raw_start']} - {t['raw_end']}] {t['sub']} | {t['remark']}"
+            title_text = f"[{time_log.raw_starts[i]} - {time_log.raw_ends[i]}] {sub} | {time_log.remarks[i]}"
             
             # 块样式
             html_parts.append(f'''
@@ -324,31 +285,71 @@ def _create_default_daily_template(filepath: str, plan_items_from_yesterday: lis
     except Exception as e:
         print(f"错误：创建默认模板文件失败: {e}")
 
+# 修改 _parse_daily_summary 的解析结果时请递增此版本号，历史索引会据此重新解析已缓存的文件
+# 版本 2: 勾选项的识别规则改变 (见下方 _CHECKBOX_ITEM_RE)，重新解析后历史数据的已办 / 待办数量和完成率可能与之前不同
+DAILY_SUMMARY_PARSER_VERSION = 2
+
+# ========================== START: MODIFICATION (Single-pass Parser) ==========================
+# DESIGNER'S NOTE:
+# 原实现对整篇文档做 4 次独立的 re.search (模式未预编译)，再对“今日事项”做两次 findall。
+# 周/月报需要聚合数月历史，这是最热的内层循环。现在所有模式在模块加载时编译一次：
+# 一次 finditer 找出全部板块标题，一次 finditer 同时提取已完成 / 未完成的勾选项。
+# 板块的匹配规则与原正则一致：每个板块取第一次出现的标题，内容截止到下一个以 "##" 开头的行。
+# 勾选项的结果与原实现不同 (有意的行为变更，会改变已办 / 待办的计数)，见 _CHECKBOX_ITEM_RE 的说明。
+_DAILY_SECTION_HEADER_RE = re.compile(
+    r'##\s*(?:(?P<today>📝\s*今日事项)|(?P<time_logs>📊\s*时间日志)|(?P<notes>✍️\s*随手记)|(?P<plan>🚀\s*明日计划))\s*',
+    re.IGNORECASE
+)
+# 勾选项规则 (与原实现的两次独立 findall 不同):
+# 1. 文本必须与复选框在同一行：原实现中空的 "- [ ]" 会跨行吞掉下一行的勾选项，导致重复计数；
+# 2. 每个勾选项的文本一直到行尾，其中出现的复选框不再单独计数：原实现对已完成 / 未完成各扫描一遍，
+#    "- [x] a - [ ] b" 会同时计为已完成 "a - [ ] b" 和未完成 "b"，现在只计为已完成 "a - [ ] b"
+#    ("- [ ] a - [x] b" 同理只计为未完成)。
+_CHECKBOX_ITEM_RE = re.compile(r'-\s*\[(?P<state>[xX ])\][ \t]*(?P<item>\S.*)')
+
+def _tokenize_daily_summary(content: str) -> dict:
+    """
+    单次扫描每日总结文档，返回各板块的原始文本:
+    {"today": ..., "time_logs": ..., "notes": ..., "plan": ...}，缺失的板块为空字符串。
+    """
+    sections = {"today": "", "time_logs": "", "notes": "", "plan": ""}
+    found = set()
+    for match in _DAILY_SECTION_HEADER_RE.finditer(content):
+        key = match.lastgroup
+        if key in found:
+            continue
+        found.add(key)
+        end = content.find('\n##', match.end())
+        sections[key] = content[match.end():end if end != -1 else len(content)].strip()
+        if len(found) == len(sections):
+            break
+    return sections
+
+def _list_items(section_text: str) -> list:
+    """提取板块中以 "- " 开头的列表项。"""
+    items = []
+    for line in section_text.split('\n'):
+        stripped = line.strip()
+        if stripped.startswith('- '):
+            items.append(line.strip('- ').strip())
+    return items
+
 def _parse_daily_summary(content: str) -> dict:
     """
     解析每日总结Markdown文件的内容。
     :param content: Markdown文件的字符串内容。
     :return: 包含已办、待办、完成度、明日计划和随手记的字典。
     """
-    # 使用正则提取各个部分
-    # 注意：正则需要非贪婪匹配，并且兼容最后一部分没有后续标题的情况
-    today_items_match = re.search(r'##\s*📝\s*今日事项\s*([\s\S]*?)(?=\n##|$)', content, re.IGNORECASE)
-    time_logs_match = re.search(r'##\s*📊\s*时间日志\s*([\s\S]*?)(?=\n##|$)', content, re.IGNORECASE)
-    notes_match = re.search(r'##\s*✍️\s*随手记\s*([\s\S]*?)(?=\n##|$)', content, re.IGNORECASE)
-    plan_match = re.search(r'##\s*🚀\s*明日计划\s*([\s\S]*?)(?=\n##|$)', content, re.IGNORECASE)
-
-    today_items_content = today_items_match.group(1).strip() if today_items_match else ""
-    time_logs_content = time_logs_match.group(1).strip() if time_logs_match else ""
-    notes_content = notes_match.group(1).strip() if notes_match else ""
-    plan_content = plan_match.group(1).strip() if plan_match else ""
+    sections = _tokenize_daily_summary(content)
 
     # 提取 "今日事项" 中的已完成和未完成项
-    done_items = [item.strip() for item in re.findall(r'-\s*\[x\]\s*(.+)', today_items_content, re.IGNORECASE)]
-    todo_items = [item.strip() for item in re.findall(r'-\s*\[ \]\s*(.+)', today_items_content)]
+    done_items, todo_items = [], []
+    for match in _CHECKBOX_ITEM_RE.finditer(sections["today"]):
+        (todo_items if match.group('state') == ' ' else done_items).append(match.group('item').strip())
 
     # 提取 "随手记" 和 "明日计划" 的列表项
-    notes_items = [line.strip('- ').strip() for line in notes_content.split('\n') if line.strip() and line.strip().startswith('- ')]
-    plan_items = [line.strip('- ').strip() for line in plan_content.split('\n') if line.strip() and line.strip().startswith('- ')]
+    notes_items = _list_items(sections["notes"])
+    plan_items = _list_items(sections["plan"])
 
     total_tasks = len(done_items) + len(todo_items)
     progress = (len(done_items) / total_tasks * 100) if total_tasks > 0 else 0
@@ -356,12 +357,23 @@ def _parse_daily_summary(content: str) -> dict:
     return {
         "done": done_items,
         "todo": todo_items,
-        "time_logs": time_logs_content, # 直接返回原始文本供 LLM 分析
+        "time_logs": sections["time_logs"], # 直接返回原始文本供 LLM 分析
         "notes": notes_items,
         "plan": plan_items,
         "total": total_tasks,
         "progress": round(progress)
     }
+# ========================== END: MODIFICATION (Single-pass Parser) ============================
+
+def _llm_use_cache(data: dict) -> bool:
+    """模板字段 bypass_llm_cache 为 0 / 空时使用 LLM 响应缓存，其他值 (如 1) 表示本次跳过缓存。"""
+    value = data.get("bypass_llm_cache")
+    if value in (None, ""):
+        return True
+    try:
+        return not float(value)
+    except (TypeError, ValueError):
+        return str(value).strip().lower() in ("false", "no", "否")
 
 async def _generate_period_summary(period_days: int, period_name: str, data: dict) -> dict:
     """
@@ -382,44 +394,40 @@ async def _generate_period_summary(period_days: int, period_name: str, data: dic
             "html": f"<h4>无数据</h4><p>在路径 <code>{history_path}</code> 中未找到历史总结文件夹。请先使用“每日总结”模板生成一些数据。</p>"
         }
 
-    # 2. 筛选时间范围内的历史文件
+    # 2. 增量同步历史索引，只重新解析新增或修改过的文件，然后直接查询时间范围内的结果
     today = datetime.date.today()
     start_date = today - datetime.timedelta(days=period_days)
-    relevant_files = []
-    # 修改glob以匹配新的归档文件名 (YYYY-MM-DD.md)
-    for filepath in glob.glob(os.path.join(history_path, "*.md")):
-        filename = os.path.basename(filepath)
-        try:
-            # 文件名现在就是日期
-            file_date_str = os.path.splitext(filename)[0]
-            file_date = datetime.datetime.strptime(file_date_str, "%Y-%m-%d").date()
-            if start_date <= file_date < today: # Exclude today
-                relevant_files.append((file_date, filepath))
-        except (ValueError, TypeError):
-            continue
-    
-    if not relevant_files:
+    await asyncio.to_thread(history_index_service.sync, history_path, _parse_daily_summary, DAILY_SUMMARY_PARSER_VERSION)
+    relevant_days = await asyncio.to_thread(history_index_service.query, history_path, start_date, today) # Exclude today
+
+    if not relevant_days:
         return {
             "subject": f"{period_name}总结：范围内无历史数据",
             "html": f"<h4>无数据</h4><p>在过去 {period_days} 天内没有找到任何有效的每日总结历史记录。</p>"
         }
 
-    relevant_files.sort()
     all_done_tasks, all_todo_tasks, all_notes = [], [], []
-    total_tasks_count = 0
     progress_per_day = []
+    daily_time_logs = []
     
-    for file_date, filepath in relevant_files:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-            parsed = _parse_daily_summary(content)
-            all_done_tasks.extend(parsed["done"])
-            all_todo_tasks.extend(parsed["todo"])
-            all_notes.extend(parsed["notes"])
-            total_tasks_count += parsed["total"]
-            progress_per_day.append({"date": file_date.strftime("%m-%d"), "progress": parsed["progress"]})
-    
-    overall_progress = (len(all_done_tasks) / total_tasks_count * 100) if total_tasks_count > 0 else 0
+    for file_date, parsed in relevant_days:
+        all_done_tasks.extend(parsed["done"])
+        all_todo_tasks.extend(parsed["todo"])
+        all_notes.extend(parsed["notes"])
+        progress_per_day.append({"date": file_date.strftime("%m-%d"), "progress": parsed["progress"]})
+        daily_time_logs.append((file_date, TimeLog.parse(parsed.get("time_logs", ""))))
+
+    # 多日时间日志汇总 (历史日志中仍标记为进行中的记录无法确定结束时间，不计入)
+    time_aggregate = aggregate_time_logs(daily_time_logs)
+    time_aggregate_text = describe_aggregate(time_aggregate)
+    tracked_time_html = (
+        f"<li><strong>已记录时长:</strong> {format_duration(time_aggregate['tracked_seconds'])} ({time_aggregate['days']} 天)</li>"
+        if time_aggregate["days"] else ""
+    )
+
+    totals = await asyncio.to_thread(history_index_service.aggregates, history_path, start_date, today)
+    total_tasks_count = totals["total_tasks"]
+    overall_progress = (totals["done_tasks"] / total_tasks_count * 100) if total_tasks_count > 0 else 0
 
     # 4. 构建AI Prompt
     progress_str = ", ".join([f"{p['date']}: {p['progress']}%" for p in progress_per_day])
@@ -442,18 +450,20 @@ async def _generate_period_summary(period_days: int, period_name: str, data: dic
 **输入数据:**
 - **时间范围**: 过去 {period_days} 天
 - **总计划任务数**: {total_tasks_count}
-- **总完成任务数**: {len(all_done_tasks)}
+- **总完成任务数**: {totals['done_tasks']}
 - **总体完成率**: {overall_progress:.1f}%
 - **每日进度列表**: {progress_str}
 - **完成的任务摘要**: {done_tasks_str or '无'}
 - **遗留的任务摘要**: {todo_tasks_str or '无'}
 - **随手记摘要**: {notes_str or '无'}
+- **时间日志统计**:
+{time_aggregate_text or '（该时间范围内无时间记录）'}
 
 请直接生成Markdown格式的报告正文，无需客套话。
 """
     
     # 5. 调用AI并构建邮件
-    ai_result = await llm_service.generate_text(prompt)
+    ai_result = await llm_service.generate_text(prompt, use_cache=_llm_use_cache(data))
     ai_analysis_html = convert_markdown_to_html(ai_result['content']) if ai_result['success'] else f"<p>AI分析失败: {ai_result['content']}</p>"
 
     subject = f"您的专属{period_name}总结报告 ({start_date.strftime('%Y-%m-%d')} - {(today - datetime.timedelta(days=1)).strftime('%Y-%m-%d')})"
@@ -461,10 +471,11 @@ async def _generate_period_summary(period_days: int, period_name: str, data: dic
         <h4>数据概览</h4>
         <ul>
             <li><strong>时间范围:</strong> {start_date.strftime('%Y-%m-%d')} 至 {(today - datetime.timedelta(days=1)).strftime('%Y-%m-%d')}</li>
-            <li><strong>有效天数:</strong> {len(relevant_files)} / {period_days} 天</li>
+            <li><strong>有效天数:</strong> {totals['days']} / {period_days} 天</li>
             <li><strong>总计划任务:</strong> {total_tasks_count} 项</li>
-            <li><strong>总完成任务:</strong> {len(all_done_tasks)} 项</li>
+            <li><strong>总完成任务:</strong> {totals['done_tasks']} 项</li>
             <li><strong>总体完成率:</strong> <span style="font-size: 18px; color: #4CAF50; font-weight: bold;">{overall_progress:.1f}%</span></li>
+            {tracked_time_html}
         </ul>
         <h4>AI智能分析与建议</h4>
         {ai_analysis_html}
@@ -483,6 +494,13 @@ daily_summary_plan_meta = {
             "label": "AI角色提示词 (System Prompt)",
             "type": "textarea",
             "default": "你是一位充满活力和鼓励精神的私人助理。你的任务是根据我今天的数据，用亲切自然的语气为我总结，并给予我激励。"
+        },
+        {
+            "name": "bypass_llm_cache",
+            "label": "跳过 LLM 响应缓存 (1 = 跳过)",
+            "type": "number",
+            "default": 0,
+            "info": "填 1 时本次运行总是重新请求大模型，不使用缓存中的回答 (适合“立即运行”调试)。0 表示在有效期 (LLM_CACHE_TTL_SECONDS) 内复用相同提示词的回答。"
         }
     ]
 }
@@ -544,6 +562,12 @@ async def generate_daily_summary_plan_template(data: dict) -> dict:
         except Exception as e:
              print(f"备份文件到history时出错: {e}")
             
+        # 时间日志只解析一次，时间轴渲染与提示词中的统计共用同一份结果
+        now = datetime.datetime.now()
+        time_log = TimeLog.parse(parsed_data.get('time_logs', ''), now=now)
+        time_stats_text = describe_stats(time_log.stats())
+        time_stats_section = f"**时间统计 (由时间日志自动计算):**\n{time_stats_text}" if time_stats_text else ""
+
         # 3c. 构建AI Prompt
         prompt = f"""
 {system_prompt}
@@ -556,6 +580,7 @@ async def generate_daily_summary_plan_template(data: dict) -> dict:
 - **我的随手记**: {', '.join(parsed_data['notes']) if parsed_data['notes'] else '无'}
 - **我的明日计划**: {', '.join(parsed_data['plan']) if parsed_data['plan'] else '未计划'}
 {parsed_data['time_logs'] if parsed_data['time_logs'] else "（今日暂无时间记录）"}
+{time_stats_section}
 
 **你的任务:**
 1.  **总结表现**: 简要总结我今天的表现。
@@ -567,7 +592,7 @@ async def generate_daily_summary_plan_template(data: dict) -> dict:
 """
         
         # 3d. 调用AI并构建邮件
-        ai_result = await llm_service.generate_text(prompt)
+        ai_result = await llm_service.generate_text(prompt, use_cache=_llm_use_cache(data))
         ai_analysis_html = convert_markdown_to_html(ai_result['content']) if ai_result['success'] else f"<p>AI分析失败: {ai_result['content']}</p>"
 
         # ========================== START: MODIFICATION (Time Log Optimization) ==========================
@@ -576,7 +601,7 @@ async def generate_daily_summary_plan_template(data: dict) -> dict:
         # 同时修复了原代码中如果 time_logs 是字符串时，使用 for item in time_logs 会错误遍历字符的 Bug。
         # 现在的逻辑是：优先展示可视化的时间轴。同时保留纯文本列表作为辅助（或在无数据时显示提示）。
         
-        timeline_html = _render_timeline_html(parsed_data.get('time_logs', ''))
+        timeline_html = _render_timeline_html(time_log, now)
         
         # 健壮地处理列表显示：按行分割字符串，而不是遍历字符
         raw_logs = parsed_data.get('time_logs', '')
@@ -628,6 +653,13 @@ weekly_summary_plan_meta = {
             "label": "AI角色提示词 (System Prompt)",
             "type": "textarea",
             "default": "你是一位专业的个人成长教练和数据分析师。你的语气专业、富有洞察力且积极。你的目标是帮助我复盘过去，更好地规划未来。"
+        },
+        {
+            "name": "bypass_llm_cache",
+            "label": "跳过 LLM 响应缓存 (1 = 跳过)",
+            "type": "number",
+            "default": 0,
+            "info": "填 1 时本次运行总是重新请求大模型，不使用缓存中的回答 (适合“立即运行”调试)。0 表示在有效期 (LLM_CACHE_TTL_SECONDS) 内复用相同提示词的回答。"
         }
     ]
 }
@@ -641,6 +673,13 @@ monthly_summary_plan_meta = {
             "label": "AI角色提示词 (System Prompt)",
             "type": "textarea",
             "default": "你是一位富有远见的战略顾问和生活导师。你的分析应更侧重于长期趋势、模式识别和深层动机的挖掘。你的语气应沉稳、睿智且鼓舞人心。"
+        },
+        {
+            "name": "bypass_llm_cache",
+            "label": "跳过 LLM 响应缓存 (1 = 跳过)",
+            "type": "number",
+            "default": 0,
+            "info": "填 1 时本次运行总是重新请求大模型，不使用缓存中的回答 (适合“立即运行”调试)。0 表示在有效期 (LLM_CACHE_TTL_SECONDS) 内复用相同提示词的回答。"
         }
     ]
 }
@@ -668,6 +707,13 @@ local_file_report_meta = {
             "label": "邮件正文说明 (可选)",
             "type": "textarea",
             "default": "您好，\n\n请查收附件中的文件。\n\n此致"
+        },
+        {
+            "name": "attachment_bundle",
+            "label": "附件压缩方式 (可选)",
+            "type": "text",
+            "default": "",
+            "info": "zip: 打包为一个 zip；gzip: 逐个文件压缩；none: 原样发送。留空使用全局设置 (ATTACHMENT_BUNDLE_MODE)。附件总大小达到 ATTACHMENT_BUNDLE_THRESHOLD_MB 时才会压缩。"
         }
     ]
 }
@@ -684,8 +730,10 @@ def get_local_file_report_template(data: dict) -> dict:
 
     return {
         "subject": "来自EMinder的文件分享",
-        "html": html_content
+        "html": html_content,
         # 注意：这里不返回 "attachments" 键，因为附件是从API直接处理的
+        # 上传的附件由发送方按该配置压缩打包
+        "attachment_bundle": {"mode": data.get("attachment_bundle", "").strip()}
     }
 # ========================== END: 修改区域 (需求 ①) ============================
 
@@ -716,6 +764,8 @@ script_runner_meta = {
         "  \"skip_email\": true,              // [可选] 如果为 true，则完全不发送邮件（但脚本已运行）（默认false）\n"
         "  \"show_execution_details\": false, // [可选] 是否显示命令、耗时等信息 (默认 true)\n"
         "  \"show_logs\": false,              // [可选] 是否显示 stdout/stderr (默认 true)\n"
+        "  \"attachment_bundle\": \"zip\",      // [可选] 附件压缩方式 zip / gzip / none (默认使用全局设置 ATTACHMENT_BUNDLE_MODE)\n"
+        "  \"attach_full_logs\": true,        // [可选] 输出过长被截断时，是否附上完整日志文件 (默认由 SCRIPT_ATTACH_FULL_LOGS 决定)\n"
         "  \"show_attachments_list\": false   // [可选] 是否在正文中列出附件清单 (默认 true)\n"
         "}\n"
         "~~~"
@@ -747,6 +797,34 @@ script_runner_meta = {
             "type": "text",
             "default": "D:\\Desktop\\Develop\\Automatics\\GymGenAuto"
         },
+        {
+            "name": "timeout_seconds",
+            "label": "超时时间 (秒)",
+            "type": "number",
+            "default": 0,
+            "info": "脚本运行超过该时间后将连同其子进程一起被结束。0 表示使用全局默认值 (SCRIPT_DEFAULT_TIMEOUT)。"
+        },
+        {
+            "name": "cpu_limit_seconds",
+            "label": "CPU 时间上限 (秒)",
+            "type": "number",
+            "default": 0,
+            "info": "仅 Linux / macOS 有效，按进程计算 (脚本派生的每个进程各自受此限制，而非整个任务的总和)。0 表示使用全局默认值 (SCRIPT_CPU_LIMIT_SECONDS)。"
+        },
+        {
+            "name": "memory_limit_mb",
+            "label": "内存上限 (MB)",
+            "type": "number",
+            "default": 0,
+            "info": "限制虚拟内存 (地址空间)，仅 Linux / macOS 有效。0 表示使用全局默认值 (SCRIPT_MEMORY_LIMIT_MB)。"
+        },
+        {
+            "name": "max_open_files",
+            "label": "最多打开文件数",
+            "type": "number",
+            "default": 0,
+            "info": "仅 Linux / macOS 有效。0 表示使用全局默认值 (SCRIPT_MAX_OPEN_FILES)。"
+        },
         {
             "name": "attachment_rules",
             "label": "附件收集规则 (每行一条)",
@@ -764,10 +842,39 @@ script_runner_meta = {
             "label": "日志总结提示词 (可选, 留空不总结)",
             "type": "textarea",
             "default": ""
+        },
+        {
+            "name": "bypass_llm_cache",
+            "label": "跳过 LLM 响应缓存 (1 = 跳过)",
+            "type": "number",
+            "default": 0,
+            "info": "填 1 时本次运行总是重新请求大模型，不使用缓存中的回答 (适合“立即运行”调试)。0 表示在有效期 (LLM_CACHE_TTL_SECONDS) 内复用相同提示词的回答。"
         }
     ]
 }
 
+def _render_resource_usage_html(usage: dict) -> str:
+    """执行详情中的资源使用情况 (启动器未能回传数据时返回空字符串)。"""
+    if not usage:
+        return ""
+    limits = usage.get("limits", {})
+    limit_texts = [
+        text for value, text in (
+            (limits.get("cpu_seconds"), f"CPU {limits.get('cpu_seconds')} 秒"),
+            (limits.get("memory_mb"), f"内存 {limits.get('memory_mb')} MB"),
+            (limits.get("open_files"), f"文件数 {limits.get('open_files')}"),
+        ) if value
+    ]
+    if usage.get("error"):
+        error = usage["error"].replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+        html = f"<li><strong>资源使用:</strong> {error}</li>"
+    else:
+        html = (f"<li><strong>资源使用:</strong> 用户态 CPU {usage['user_seconds']} 秒, "
+                f"内核态 CPU {usage['system_seconds']} 秒, 峰值内存 {usage['max_rss_mb']} MB</li>")
+    if limit_texts:
+        html += f"<li><strong>资源限制:</strong> {', '.join(limit_texts)}</li>"
+    return html
+
 # --- 步骤 2: 编写模板生成函数 (异步) ---
 async def get_script_runner_template(data: dict) -> dict:
     """
@@ -780,6 +887,16 @@ async def get_script_runner_template(data: dict) -> dict:
     summary_prompt = data.get('log_summary_prompt', '').strip()
     attachment_rules_str = data.get('attachment_rules', '').strip()
     custom_subject_template = data.get('custom_subject', '脚本执行报告').strip()
+    try:
+        timeout_seconds = float(data.get('timeout_seconds') or 0)
+    except (TypeError, ValueError):
+        timeout_seconds = 0
+    resource_limits = {}
+    for key, field in (("cpu_seconds", "cpu_limit_seconds"), ("memory_mb", "memory_limit_mb"), ("open_files", "max_open_files")):
+        try:
+            resource_limits[key] = int(float(data.get(field) or 0))
+        except (TypeError, ValueError):
+            resource_limits[key] = 0
 
     if not command:
         return {
@@ -789,7 +906,7 @@ async def get_script_runner_template(data: dict) -> dict:
         }
     
     # 1. 执行脚本
-    exec_result = await script_runner_service.run_script(command, work_dir)
+    exec_result = await script_runner_service.run_script(command, work_dir, timeout=timeout_seconds, limits=resource_limits)
 
     # ========================== START: MODIFICATION (需求: Script Config) ==========================
     # DESIGNER'S NOTE:
@@ -857,65 +974,72 @@ async def get_script_runner_template(data: dict) -> dict:
     # ========================== END: MODIFICATION (需求: Script Config) ============================
 
     # 3. 处理附件规则 (合并 UI 规则 和 脚本动态规则)
-    found_attachments = []
+    # 所有规则由附件扫描器并发解析 (os.scandir，每个文件一次 stat)，并应用每封邮件的数量 / 大小上限
     attachment_report_lines = [] # 用于在HTML中展示
-
-    # 3.1 处理 UI 定义的规则
-    if attachment_rules_str:
-        rules = [r.strip() for r in attachment_rules_str.split('\n') if r.strip() and not r.strip().startswith('#')]
-        
-        for rule in rules:
-            # 尝试作为 glob 模式处理 (glob 也兼容普通路径)
-            # 如果是目录，glob 默认不展开内容，需要我们手动处理
-            try:
-                # 检查是否是纯目录路径
-                if os.path.isdir(rule):
-                    # 如果是目录，列出目录下所有文件 (一级深度，不递归，为了安全)
-                    dir_files = [os.path.join(rule, f) for f in os.listdir(rule) if os.path.isfile(os.path.join(rule, f))]
-                    if dir_files:
-                        found_attachments.extend(dir_files)
-                        attachment_report_lines.append(f"<li>📂 目录 <code>{rule}</code>: 找到 {len(dir_files)} 个文件</li>")
-                    else:
-                        attachment_report_lines.append(f"<li>📂 目录 <code>{rule}</code>: 空文件夹或无权限</li>")
-                
-                else:
-                    # 尝试作为 glob 通配符处理
-                    matches = glob.glob(rule)
-                    if matches:
-                        files_only = [m for m in matches if os.path.isfile(m)]
-                        found_attachments.extend(files_only)
-                        attachment_report_lines.append(f"<li>🔍 规则 <code>{rule}</code>: 匹配到 {len(files_only)} 个文件</li>")
-                    else:
-                        attachment_report_lines.append(f"<li>⚠️ 规则 <code>{rule}</code>: 未找到任何匹配项</li>")
-            
-            except Exception as e:
-                attachment_report_lines.append(f"<li>❌ 规则 <code>{rule}</code> 处理出错: {str(e)}</li>")
+    rules = [r.strip() for r in attachment_rules_str.split('\n') if r.strip() and not r.strip().startswith('#')]
 
     # ========================== START: MODIFICATION (需求: Script Config Attachments) ==========================
-    # 3.2 处理脚本配置文件中指定的额外附件
+    # 3.2 处理脚本配置文件中指定的额外附件 (如果是相对路径，相对于工作目录解析)
     script_attachments = script_meta.get("attachments", [])
-    if script_attachments:
-        count = 0
-        for path in script_attachments:
-            # 如果是相对路径，相对于工作目录解析
-            full_path = path if os.path.isabs(path) else os.path.abspath(os.path.join(abs_work_dir, path))
-            
-            if os.path.exists(full_path) and os.path.isfile(full_path):
-                found_attachments.append(full_path)
-                count += 1
-            else:
-                attachment_report_lines.append(f"<li>❌ 脚本附件 <code>{path}</code>: 文件未找到</li>")
-        
-        if count > 0:
-            attachment_report_lines.append(f"<li>📄 脚本配置指定: 成功添加 {count} 个附件</li>")
+    script_attachment_paths = {
+        (path if os.path.isabs(path) else os.path.abspath(os.path.join(abs_work_dir, path))): path
+        for path in script_attachments
+    }
     # ========================== END: MODIFICATION (需求: Script Config Attachments) ============================
 
-    # 去重
-    found_attachments = sorted(list(set(found_attachments)))
+    # 输出过长被截断时，完整日志已写入文件，可按需作为附件发送
+    full_log_paths = [exec_result[key] for key in ("stdout_log_path", "stderr_log_path") if exec_result.get(key)]
+    attach_full_logs = bool(full_log_paths) and script_meta.get("attach_full_logs", settings.SCRIPT_ATTACH_FULL_LOGS)
+
+    scan_report = await scan_attachments(
+        rules,
+        list(script_attachment_paths) + (full_log_paths if attach_full_logs else []),
+        max_files=settings.ATTACHMENT_MAX_FILES,
+        max_bytes=int(settings.ATTACHMENT_MAX_TOTAL_MB * 1024 * 1024),
+    )
+
+    # 3.1 UI 定义的规则
+    for rule_result in scan_report.rule_results:
+        rule, count = rule_result.rule, len(rule_result.files)
+        if rule_result.kind == "error":
+            attachment_report_lines.append(f"<li>❌ 规则 <code>{rule}</code> 处理出错: {rule_result.error}</li>")
+        elif rule_result.kind == "dir":
+            if count:
+                attachment_report_lines.append(f"<li>📂 目录 <code>{rule}</code>: 找到 {count} 个文件</li>")
+            else:
+                attachment_report_lines.append(f"<li>📂 目录 <code>{rule}</code>: 空文件夹或无权限</li>")
+        elif count:
+            attachment_report_lines.append(f"<li>🔍 规则 <code>{rule}</code>: 匹配到 {count} 个文件</li>")
+        else:
+            attachment_report_lines.append(f"<li>⚠️ 规则 <code>{rule}</code>: 未找到任何匹配项</li>")
+
+    # 3.2 脚本配置指定的附件
+    missing = set(scan_report.missing_paths)
+    for full_path, path in script_attachment_paths.items():
+        if full_path in missing:
+            attachment_report_lines.append(f"<li>❌ 脚本附件 <code>{path}</code>: 文件未找到</li>")
+    script_found = len(script_attachment_paths) - len(missing & set(script_attachment_paths))
+    if script_found > 0:
+        attachment_report_lines.append(f"<li>📄 脚本配置指定: 成功添加 {script_found} 个附件</li>")
+    if attach_full_logs:
+        attachment_report_lines.append(f"<li>🧾 脚本输出过长，已附上 {len(full_log_paths)} 个完整日志文件</li>")
+
+    # 3.3 超出上限被跳过的文件
+    if scan_report.skipped:
+        skipped_items = "".join(
+            f"<li><code>{path}</code> ({size / 1024:.1f} KB): {reason}</li>" for path, size, reason in scan_report.skipped[:20]
+        )
+        more = f"<li>…… 另有 {len(scan_report.skipped) - 20} 个文件</li>" if len(scan_report.skipped) > 20 else ""
+        attachment_report_lines.append(
+            f"<li>⛔ 共有 {len(scan_report.skipped)} 个文件因超出附件上限未发送:<ul>{skipped_items}{more}</ul></li>"
+        )
+
+    # 已去重、排序
+    found_attachments = scan_report.attachments
 
     # --- 构建 HTML 报告 ---
     status_color = "#4CAF50" if exec_result['success'] else "#F44336"
-    status_text = "成功" if exec_result['success'] else "失败"
+    status_text = "成功" if exec_result['success'] else ("超时" if exec_result.get('timed_out') else "失败")
     
     # 将文本中的特殊 HTML 字符转义，并保留换行
     def escape_html(text):
@@ -940,6 +1064,7 @@ async def get_script_runner_template(data: dict) -> dict:
                 <li><strong>开始时间:</strong> {exec_result.get('start_time', 'N/A')}</li>
                 <li><strong>结束时间:</strong> {exec_result.get('end_time', 'N/A')}</li>
                 <li><strong>总耗时:</strong> {exec_result.get('duration_seconds', 'N/A')} 秒</li>
+                {_render_resource_usage_html(exec_result.get('resource_usage'))}
             </ul>""")
 
     # [控制] 附件报告
@@ -956,7 +1081,7 @@ async def get_script_runner_template(data: dict) -> dict:
     log_for_summary = exec_result.get('stdout') or exec_result.get('stderr')
     if summary_prompt and log_for_summary:
         full_prompt = f"{summary_prompt}\n\n--- 日志开始 ---\n{log_for_summary}\n--- 日志结束 ---"
-        summary_result = await llm_service.generate_text(full_prompt)
+        summary_result = await llm_service.generate_text(full_prompt, use_cache=_llm_use_cache(data))
         
         summary_html = ""
         if summary_result["success"]:
@@ -970,6 +1095,11 @@ async def get_script_runner_template(data: dict) -> dict:
     if show_logs:
         stdout_html = escape_html(exec_result.get('stdout', ''))
         stderr_html = escape_html(exec_result.get('stderr', ''))
+        if full_log_paths:
+            html_parts.append(
+                "<p style='color: #888;'>输出过长，以下仅显示开头和结尾部分。完整日志: "
+                + ", ".join(f"<code>{path}</code>" for path in full_log_paths) + "</p>"
+            )
         if stdout_html:
             html_parts.append(f"""
             <h4>标准输出 (stdout) 📋</h4>
@@ -984,7 +1114,9 @@ async def get_script_runner_template(data: dict) -> dict:
     return {
         "subject": subject,
         "html": "".join(html_parts),
-        "attachments": found_attachments
+        "attachments": found_attachments,
+        # 前端最多渲染 10 个字段，压缩方式只通过 eminder_meta.json 或全局设置 (ATTACHMENT_BUNDLE_MODE) 指定
+        "attachment_bundle": {"mode": str(script_meta.get("attachment_bundle") or "").strip()}
     }
 # ========================== END: MODIFICATION (Flexible Attachments) ============================
 
@@ -1003,6 +1135,13 @@ deepseek_workflow_meta = {
             "label": "原始文本 (text_ori)",
             "type": "textarea",
             "default": "请帮我将以下内容翻译成英文：\n\nEMinder 是一个灵活的、模板驱动的邮件定时发送工具包。"
+        },
+        {
+            "name": "bypass_llm_cache",
+            "label": "跳过 LLM 响应缓存 (1 = 跳过)",
+            "type": "number",
+            "default": 0,
+            "info": "填 1 时本次运行总是重新请求大模型，不使用缓存中的回答 (适合“立即运行”调试)。0 表示在有效期 (LLM_CACHE_TTL_SECONDS) 内复用相同提示词的回答。"
         }
     ]
 }
@@ -1020,7 +1159,7 @@ async def get_deepseek_workflow_template(data: dict) -> dict:
         }
     
     # 【异步改造】调用异步的 LLM 服务
-    result = await llm_service.generate_text(text_to_process)
+    result = await llm_service.generate_text(text_to_process, use_cache=_llm_use_cache(data))
     # ========================== END: MODIFICATION ============================
     
     if result["success"]:
@@ -1151,13 +1290,17 @@ def get_daily_file_report_template(data: dict) -> dict:
 # --- 步骤 1: 定义元数据 ---
 quick_message_meta = {
     "display_name": "快速发送消息 (Markdown)",
+    "deterministic": True,
+    # 消息内容中可以使用 {{remark_name}} / {{name}} / {{email}}，发送时按收件人替换
+    "personalize": True,
     "description": "快速发送一段支持Markdown格式的文字消息。系统会自动将Markdown渲染为HTML格式。",
     "fields": [
         {
             "name": "message",
             "label": "消息内容 (支持Markdown格式)",
             "type": "textarea",
-            "default": "# 通知标题\n\n## 要点1\n- 内容A\n- 内容B\n\n## 要点2\n> 引用内容\n\n**加粗**、*斜体*等格式均可使用。"
+            "default": "# 通知标题\n\n## 要点1\n- 内容A\n- 内容B\n\n## 要点2\n> 引用内容\n\n**加粗**、*斜体*等格式均可使用。",
+            "info": "可使用 {{remark_name}} (订阅者备注名)、{{email}} 等占位符，发送时按收件人替换。"
         },
         {
             "name": "custom_subject",
@@ -1217,6 +1360,7 @@ def get_quick_message_template(data: dict) -> dict:
 # --- 步骤 1: 定义元数据 ---
 monthly_learning_report_meta = {
     "display_name": "月度学习报告",
+    "deterministic": True,
     "description": "为学生或团队成员生成月度学习进展报告。",
     "fields": [
         {
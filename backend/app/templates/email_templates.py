@@ -1,13 +1,22 @@
 # backend/app/templates/email_templates.py (已修改)
 import functools
 import datetime
+import json
 import asyncio # 导入 asyncio 模块
+from collections import OrderedDict
+from ..core.config import settings
+from .layouts import BaseLayout, DEFAULT_LAYOUT, LAYOUTS
+from .plugin_registry import LazyTemplateFunction, discover_templates
 
-try:
-    from .customize_templates import custom_templates
-except ImportError:
-    custom_templates = {}
-    print("提示：未找到 `customize_templates.py`，跳过加载自定义模板。")
+# ========================== START: MODIFICATION (Lazy Template Plugins) ==========================
+# DESIGNER'S NOTE:
+# 不再在导入时直接 import customize_templates (它会连带导入 LLM、脚本执行、markdown 等模块)。
+# 启动时只静态读取各模板模块的元数据，模板实现在第一次被调用时才导入；
+# 除内置的 customize_templates.py 外，还会发现 TEMPLATE_PLUGIN_DIR 文件夹中的模板插件。
+custom_templates = discover_templates(settings.TEMPLATE_PLUGIN_DIR)
+# 已提示过不存在的布局名，避免每次渲染都重复警告
+_missing_layouts = set()
+# ========================== END: MODIFICATION (Lazy Template Plugins) ============================
 
 class TemplateManager:
     """
@@ -42,6 +51,7 @@ class TemplateManager:
             "project_update": {
                 "meta": {
                     "display_name": "项目周报",
+                    "deterministic": True,
                     "description": "用于发送项目进度、已完成任务和后续计划的周报。",
                     "fields": [
                         {"name": "project_name", "label": "项目名称", "type": "text", "default": "EMinder 开发"},
@@ -55,6 +65,7 @@ class TemplateManager:
             "motivational_quote": {
                 "meta": {
                     "display_name": "每日激励",
+                    "deterministic": True,
                     "description": "每天发送一句激励人心的名言警句。",
                     "fields": [
                         {"name": "recipient_name", "label": "接收者昵称", "type": "text", "default": "朋友"},
@@ -84,6 +95,11 @@ class TemplateManager:
         # 步骤 3: 初始化用于存储最终结果的实例变量。
         self._templates_metadata = {}
         self._template_functions = {}
+        # 模板 key -> 原始模板函数 (可能是延迟加载代理)，用于在不渲染的情况下加载其布局
+        self._template_sources = {}
+        # 确定性模板的渲染结果缓存: (模板 key, 数据的规范化 JSON, 日期) -> 渲染结果
+        self._render_cache = OrderedDict()
+        self._render_cache_size = settings.TEMPLATE_RENDER_CACHE_SIZE
 
         # 步骤 4: 遍历所有模板定义，进行统一的异步包装。
         for key, definition in all_templates_definitions.items():
@@ -96,9 +112,17 @@ class TemplateManager:
 
             # 存储元数据
             self._templates_metadata[key] = meta
+            self._template_sources[key] = original_func
             
+            # 模板可以在元数据中通过 "layout" 指定外层布局。布局在渲染时才按名称查找：
+            # 延迟加载的插件模块在第一次调用时才会执行其中的 register_layout()
+            layout_name = meta.get("layout", DEFAULT_LAYOUT)
+
             # 创建一个被异步包装器包裹的新函数
-            wrapped_func = functools.partial(self._apply_base_template, original_func)
+            wrapped_func = functools.partial(self._apply_base_template, original_func, layout_name, bool(meta.get("personalize")))
+            if meta.get("deterministic") and self._render_cache_size > 0:
+                # 声明为确定性的模板 (输出只取决于 data 和当天日期) 重复渲染时直接命中缓存
+                wrapped_func = functools.partial(self._render_cached, key, wrapped_func)
             
             # 存储这个保证可 await 的函数
             self._template_functions[key] = wrapped_func
@@ -107,7 +131,7 @@ class TemplateManager:
             setattr(self, key, wrapped_func)
 
         if custom_templates:
-            print(f"✅ 成功加载并统一包装了 {len(custom_templates)} 个自定义模板！")
+            print(f"✅ 成功发现并统一包装了 {len(custom_templates)} 个自定义模板 (首次使用时加载实现)！")
         # ========================== END: MODIFICATION (Decisive Async Fix) ============================
 
 
@@ -119,7 +143,34 @@ class TemplateManager:
         """返回所有模板的元数据"""
         return self._templates_metadata
 
-    async def _apply_base_template(self, original_function, data: dict) -> dict:
+    async def _render_cached(self, template_key: str, render_func, data: dict) -> dict:
+        """
+        确定性模板的渲染缓存 (LRU)。
+        缓存键包含当天日期，模板中使用的“今天”变化后会自动重新渲染。
+        """
+        cache_key = (
+            template_key,
+            json.dumps(data, sort_keys=True, ensure_ascii=False, default=str),
+            datetime.date.today().isoformat(),
+        )
+        result = self._render_cache.get(cache_key)
+        if result is None:
+            result = await render_func(data)
+            if result.get("abort_sending"):
+                return result
+            self._render_cache[cache_key] = result
+            if len(self._render_cache) > self._render_cache_size:
+                self._render_cache.popitem(last=False)
+        else:
+            self._render_cache.move_to_end(cache_key)
+        # 返回副本，避免调用方修改列表时污染缓存
+        return {
+            **result,
+            "attachments": list(result.get("attachments", [])),
+            "embedded_images": list(result.get("embedded_images", [])),
+        }
+
+    async def _apply_base_template(self, original_function, layout_name: str, personalize: bool, data: dict) -> dict:
         """
         【异步改造 & 功能增强】执行一个原始模板函数，并将其输出用基础HTML样式进行包装。
         此函数现在是异步的，可以处理同步和异步的原始模板函数，并能传递附件和内嵌图片信息。
@@ -131,6 +182,9 @@ class TemplateManager:
         else:
             # 如果是普通 def 函数, 就直接调用
             email_parts = original_function(data)
+            # 延迟加载的模板函数在调用前无法得知是否为 async def，返回协程时再 await
+            if asyncio.iscoroutine(email_parts):
+                email_parts = await email_parts
         
         # ========================== START: MODIFICATION (Fix Skip Email) ==========================
         # DESIGNER'S NOTE: 
@@ -147,74 +201,51 @@ class TemplateManager:
         # 新增：获取内嵌图片列表，如果不存在则默认为空列表
         embedded_images = email_parts.get("embedded_images", [])
         
-        # 2. 使用 get_base_html 进行包装，主题将作为邮件内容的标题
-        final_html = self.get_base_html(raw_html, subject)
+        # 2. 使用该模板的布局进行包装，主题将作为邮件内容的标题 (此时模板实现已加载，其注册的布局可用)
+        final_html = self.get_layout(layout_name).render(raw_html, subject)
         
         # 3. 返回包含所有部分的最终结果
         return {
             "subject": subject, 
             "html": final_html, 
             "attachments": attachments, 
-            "embedded_images": embedded_images
+            "embedded_images": embedded_images,
+            # 附件打包配置 (可选)，由发送方在构建邮件前交给 attachment_bundler 处理
+            "attachment_bundle": email_parts.get("attachment_bundle"),
+            # 模板元数据中声明了 "personalize": True 时，发送方才按收件人替换 {{remark_name}} 等占位符
+            "personalize": personalize,
         }
     # ========================== END: MODIFICATION (Requirements ①, ③) ============================
     
+    async def get_template_layout(self, template_type: str) -> "BaseLayout":
+        """
+        获取指定模板使用的布局 (不渲染模板)。未知模板返回 None。
+        布局若由尚未加载的插件模块注册，会先 (在线程中) 加载该模块。
+        """
+        meta = self._templates_metadata.get(template_type)
+        if meta is None:
+            return None
+        layout_name = meta.get("layout", DEFAULT_LAYOUT)
+        source = self._template_sources.get(template_type)
+        if layout_name not in LAYOUTS and isinstance(source, LazyTemplateFunction):
+            await asyncio.to_thread(source.load)
+        return self.get_layout(layout_name)
+
+    @staticmethod
+    def get_layout(name: str = DEFAULT_LAYOUT) -> "BaseLayout":
+        """按名称获取布局，未注册的名称回退到默认布局。"""
+        layout = LAYOUTS.get(name)
+        if layout is None:
+            if name not in _missing_layouts:
+                _missing_layouts.add(name)
+                print(f"警告：布局 '{name}' 不存在，已使用默认布局。")
+            layout = LAYOUTS[DEFAULT_LAYOUT]
+        return layout
+
     @staticmethod
     def get_base_html(content: str, title: str) -> str:
-        """提供一个更美观、响应式的邮件样式容器"""
-        return f"""
-        <!DOCTYPE html>
-        <html lang="zh-CN">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <style>
-                body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif; line-height: 1.6; color: #333; background-color: #f4f4f4; margin: 0; padding: 0; }}
-                .wrapper {{ width: 100%; table-layout: fixed; background-color: #f4f4f4; padding: 40px 0; }}
-                .container {{ max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.08); overflow: hidden; }}
-                .header {{ background-color: #4CAF50; color: #ffffff; padding: 30px 25px; text-align: center; }}
-                .header h1 {{ margin: 0; font-size: 28px; font-weight: 600; }}
-                /* ========================== START: MODIFICATION ========================== */
-                /* DESIGNER'S NOTE: 为内容区域添加强制换行样式，防止长文本溢出。 */
-                .content {{ padding: 30px 25px; color: #555; word-wrap: break-word; word-break: break-word; }}
-                /* ========================== END: MODIFICATION ============================ */
-                .content p {{ margin: 0 0 15px; }}
-                .content h4 {{ color: #333; margin-top: 25px; margin-bottom: 10px; border-left: 4px solid #4CAF50; padding-left: 10px; font-size: 18px; }}
-                .button {{ background-color: #4CAF50; color: #ffffff !important; padding: 14px 25px; text-align: center; text-decoration: none; display: inline-block; border-radius: 8px; font-weight: bold; font-size: 16px; }}
-                .footer {{ font-size: 12px; color: #888; text-align: center; padding: 20px 25px; background-color: #f9f9f9; }}
-                .footer p {{ margin: 0; }}
-                ul {{ padding-left: 20px; }}
-                li {{ margin-bottom: 8px; }}
-                .progress-bar {{ width: 100%; background-color: #e0e0e0; border-radius: 5px; height: 20px; overflow: hidden; }}
-                .progress {{ background-color: #4CAF50; height: 100%; text-align: center; color: white; line-height: 20px; font-weight: bold; border-radius: 5px; }}
-                /* ========================== START: MODIFICATION ========================== */
-                /* DESIGNER'S NOTE: 
-                   为 <pre> 标签添加全局样式，确保代码块和长文本能够自动换行，
-                   这对于显示日志或AI生成的长字符串至关重要。*/
-                pre {{
-                    white-space: pre-wrap;   /* 保留空白符序列，但允许正常换行 */
-                    word-wrap: break-word;   /* 在长单词或URL内部进行换行 */
-                }}
-                /* ========================== END: MODIFICATION ============================ */
-            </style>
-        </head>
-        <body>
-            <div class="wrapper">
-                <div class="container">
-                    <div class="header">
-                        <h1>{title}</h1>
-                    </div>
-                    <div class="content">
-                        {content}
-                    </div>
-                    <div class="footer">
-                        <p>此邮件由 <strong>EMinder</strong> 服务自动发送，请勿直接回复，因为回了我也看不到~</p>
-                    </div>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        """提供一个更美观、响应式的邮件样式容器 (默认布局)"""
+        return LAYOUTS[DEFAULT_LAYOUT].render(content, title)
 
     def get_confirmation_template(self, confirmation_link: str) -> dict:
         """生成订阅确认邮件"""
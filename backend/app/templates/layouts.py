@@ -0,0 +1,97 @@
+# backend/app/templates/layouts.py (新文件)
+"""
+邮件外层布局 (预编译)。
+
+原 get_base_html 每渲染一封邮件都要重新拼装约 60 行的 f-string (包括整个 <style> 块)。
+现在布局在模块加载时被切分为固定的 prefix / mid / suffix 三段，
+包装正文只是一次 join。布局可以按模板替换：在模板元数据中加入 "layout": "<布局名>"，
+并通过 register_layout() 注册对应的布局源码 (使用 @@TITLE@@ 和 @@CONTENT@@ 两个占位符)。
+"""
+
+
+class BaseLayout:
+    """预编译的邮件外层布局"""
+
+    TITLE_PLACEHOLDER = "@@TITLE@@"
+    CONTENT_PLACEHOLDER = "@@CONTENT@@"
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        head, _, rest = source.partition(self.TITLE_PLACEHOLDER)
+        mid, _, tail = rest.partition(self.CONTENT_PLACEHOLDER)
+        if self.TITLE_PLACEHOLDER not in source or self.CONTENT_PLACEHOLDER not in rest:
+            raise ValueError(f"布局 '{name}' 必须依次包含 {self.TITLE_PLACEHOLDER} 和 {self.CONTENT_PLACEHOLDER} 占位符。")
+        self.prefix, self.mid, self.suffix = head, mid, tail
+
+    def render(self, content: str, title: str) -> str:
+        return f"{self.prefix}{title}{self.mid}{content}{self.suffix}"
+
+    def parts(self, title: str) -> tuple[str, str]:
+        """正文之前 (含标题) 与之后的两段 HTML。"""
+        return "".join((self.prefix, title, self.mid)), self.suffix
+
+
+_DEFAULT_LAYOUT_SOURCE = """
+        <!DOCTYPE html>
+        <html lang="zh-CN">
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <style>
+                body { font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif; line-height: 1.6; color: #333; background-color: #f4f4f4; margin: 0; padding: 0; }
+                .wrapper { width: 100%; table-layout: fixed; background-color: #f4f4f4; padding: 40px 0; }
+                .container { max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.08); overflow: hidden; }
+                .header { background-color: #4CAF50; color: #ffffff; padding: 30px 25px; text-align: center; }
+                .header h1 { margin: 0; font-size: 28px; font-weight: 600; }
+                /* ========================== START: MODIFICATION ========================== */
+                /* DESIGNER'S NOTE: 为内容区域添加强制换行样式，防止长文本溢出。 */
+                .content { padding: 30px 25px; color: #555; word-wrap: break-word; word-break: break-word; }
+                /* ========================== END: MODIFICATION ============================ */
+                .content p { margin: 0 0 15px; }
+                .content h4 { color: #333; margin-top: 25px; margin-bottom: 10px; border-left: 4px solid #4CAF50; padding-left: 10px; font-size: 18px; }
+                .button { background-color: #4CAF50; color: #ffffff !important; padding: 14px 25px; text-align: center; text-decoration: none; display: inline-block; border-radius: 8px; font-weight: bold; font-size: 16px; }
+                .footer { font-size: 12px; color: #888; text-align: center; padding: 20px 25px; background-color: #f9f9f9; }
+                .footer p { margin: 0; }
+                ul { padding-left: 20px; }
+                li { margin-bottom: 8px; }
+                .progress-bar { width: 100%; background-color: #e0e0e0; border-radius: 5px; height: 20px; overflow: hidden; }
+                .progress { background-color: #4CAF50; height: 100%; text-align: center; color: white; line-height: 20px; font-weight: bold; border-radius: 5px; }
+                /* ========================== START: MODIFICATION ========================== */
+                /* DESIGNER'S NOTE: 
+                   为 <pre> 标签添加全局样式，确保代码块和长文本能够自动换行，
+                   这对于显示日志或AI生成的长字符串至关重要。*/
+                pre {
+                    white-space: pre-wrap;   /* 保留空白符序列，但允许正常换行 */
+                    word-wrap: break-word;   /* 在长单词或URL内部进行换行 */
+                }
+                /* ========================== END: MODIFICATION ============================ */
+            </style>
+        </head>
+        <body>
+            <div class="wrapper">
+                <div class="container">
+                    <div class="header">
+                        <h1>@@TITLE@@</h1>
+                    </div>
+                    <div class="content">
+                        @@CONTENT@@
+                    </div>
+                    <div class="footer">
+                        <p>此邮件由 <strong>EMinder</strong> 服务自动发送，请勿直接回复，因为回了我也看不到~</p>
+                    </div>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+
+
+DEFAULT_LAYOUT = "default"
+LAYOUTS = {DEFAULT_LAYOUT: BaseLayout(DEFAULT_LAYOUT, _DEFAULT_LAYOUT_SOURCE)}
+
+
+def register_layout(name: str, source: str) -> BaseLayout:
+    """注册 (或覆盖) 一个布局，供模板元数据中的 "layout" 引用。"""
+    layout = BaseLayout(name, source)
+    LAYOUTS[name] = layout
+    return layout
@@ -0,0 +1,81 @@
+# backend/app/templates/markdown_renderer.py (新文件)
+"""
+Markdown → HTML 转换。
+
+convert_markdown_to_html 会被报告文件、快速消息、脚本 meta 内容以及每一次 LLM 回答调用，
+原先每次都通过 markdown.markdown() 重新创建转换器 (加载扩展、构建处理器链)。现在：
+- 每个线程复用一个 markdown.Markdown 实例，转换前调用 reset() 清除上一次的状态
+  (模板可能在 asyncio.to_thread 的工作线程中运行，所以实例按线程隔离)；
+- 转换结果按内容的 SHA-256 放入一个有界 LRU 缓存，同一个 weekly_report.md 被多个定时任务发送时只转换一次。
+基准测试见 backend/scripts/bench_markdown.py。
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from ..core.config import settings
+
+# 使用 fenced_code 和 tables 扩展来更好地支持代码块和表格
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables']
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+    print("警告: 'Markdown' 库未安装。报告文件将以纯文本格式显示。请运行 'pip install Markdown' 以获得完整功能。")
+
+
+def _convert_plain_text(md_text: str) -> str:
+    # 简单的纯文本到HTML的转换，作为降级方案
+    escaped_text = md_text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    return f"<pre style='white-space: pre-wrap; word-wrap: break-word;'>{escaped_text}</pre>"
+
+
+class MarkdownRenderer:
+    """可复用的 Markdown 转换器 + 按内容哈希的 LRU 缓存。"""
+
+    def __init__(self, cache_size: int):
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+
+    def _get_converter(self):
+        converter = getattr(self._local, "converter", None)
+        if converter is None:
+            converter = self._local.converter = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        return converter
+
+    def convert_uncached(self, md_text: str) -> str:
+        """不经过缓存直接转换。"""
+        if markdown is None:
+            return _convert_plain_text(md_text)
+        return self._get_converter().reset().convert(md_text)
+
+    def convert(self, md_text: str) -> str:
+        if self._cache_size <= 0:
+            return self.convert_uncached(md_text)
+        key = hashlib.sha256(md_text.encode("utf-8")).digest()
+        with self._cache_lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+                return html
+        html = self.convert_uncached(md_text)
+        with self._cache_lock:
+            self._cache[key] = html
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return html
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+
+# 创建一个全局 Markdown 转换器实例
+markdown_renderer = MarkdownRenderer(settings.MARKDOWN_CACHE_SIZE)
+
+
+def convert_markdown_to_html(md_text):
+    return markdown_renderer.convert(md_text)
@@ -0,0 +1,69 @@
+# backend/app/templates/personalization.py (新文件)
+"""
+按收件人个性化。
+
+周期任务对 receiver_emails 中的每个地址发送同一份 template_data，
+想要“每人一个称呼”以前只能为每个人单独建一个任务。现在在元数据中声明了 "personalize": True 的模板，
+其数据 (以及模板输出) 中可以写占位符:
+    {{remark_name}}  订阅者备注名 (subscribers 表)，未设置时为邮箱 @ 之前的部分
+    {{name}}         同 remark_name
+    {{email}}        收件人邮箱
+模板函数 (LLM 调用、脚本执行等昂贵工作) 对整批收件人只执行一次，
+PersonalizedMessage 把输出的主题和 HTML 预先切分为“文本片段 + 变量名”，每个收件人只需做一次字符串拼接。
+未知的占位符原样保留。未启用个性化的模板 (例如输出 LLM 回答或脚本日志的模板) 不做任何替换。
+"""
+import html
+import re
+
+_PLACEHOLDER_RE = re.compile(r'\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}')
+
+# 可用的按收件人变量
+RECIPIENT_FIELDS = ("email", "name", "remark_name")
+
+
+def recipient_variables(email: str, subscriber: dict = None) -> dict:
+    """根据收件人邮箱和 subscribers 表中的记录 (可能不存在) 生成占位符变量。"""
+    remark_name = (subscriber or {}).get("remark_name") or email.split('@')[0]
+    return {"email": email, "name": remark_name, "remark_name": remark_name}
+
+
+class _CompiledText:
+    """预先切分好的文本：segments 中偶数位为文本片段，奇数位为变量名。"""
+
+    def __init__(self, text: str, fields):
+        self.segments = []
+        last = 0
+        for match in _PLACEHOLDER_RE.finditer(text):
+            if match.group(1) not in fields:
+                continue
+            self.segments.append(text[last:match.start()])
+            self.segments.append(match.group(1))
+            last = match.end()
+        self.segments.append(text[last:])
+        self.fields = frozenset(self.segments[1::2])
+
+    def render(self, values: dict) -> str:
+        if len(self.segments) == 1:
+            return self.segments[0]
+        parts = self.segments[:]
+        parts[1::2] = [values[name] for name in self.segments[1::2]]
+        return "".join(parts)
+
+
+class PersonalizedMessage:
+    """一封渲染完成、只剩按收件人占位符需要替换的邮件 (主题 + HTML)。"""
+
+    def __init__(self, subject: str, html_content: str, fields=RECIPIENT_FIELDS):
+        self._subject = _CompiledText(subject, fields)
+        self._html = _CompiledText(html_content, fields)
+
+    @property
+    def fields(self) -> frozenset:
+        """实际用到的变量名；为空表示所有收件人收到的内容完全相同。"""
+        return self._subject.fields | self._html.fields
+
+    def render(self, variables: dict) -> tuple[str, str]:
+        """返回 (主题, HTML)。HTML 中的变量值会被转义，主题中的保持原样。"""
+        escaped = {name: html.escape(str(variables.get(name, ""))) for name in self._html.fields}
+        plain = {name: str(variables.get(name, "")) for name in self._subject.fields}
+        return self._subject.render(plain), self._html.render(escaped)
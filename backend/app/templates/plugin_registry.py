@@ -0,0 +1,152 @@
+# backend/app/templates/plugin_registry.py (新文件)
+"""
+模板插件注册表。
+
+email_templates.py 原先在导入时就直接 import customize_templates，
+连带导入 llm_service、script_runner_service、markdown 等模块，而大多数部署只会用到其中少数几个模板。
+现在启动时只用 ast 静态读取模板模块中的 `custom_templates` 字典和各模板的元数据 (不执行模块代码)，
+真正的模板实现在第一次被调用时才导入。
+
+模板模块的来源 (按顺序，后出现的同名模板覆盖先出现的):
+1. 内置的 app/templates/customize_templates.py；
+2. 环境变量 TEMPLATE_PLUGIN_DIR 指向的文件夹中的每个 *.py 文件 (以 "_" 开头的文件除外)。
+   插件文件中请使用绝对导入，例如 `from app.services.llm_service import llm_service`。
+
+静态读取要求 `custom_templates` 是模块顶层的字典字面量，其中 "meta" 为字典字面量或引用模块顶层的字典字面量变量，
+"func" 为模块顶层函数名。无法静态读取的模块会回退为立即导入。
+"""
+import ast
+import importlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+BUILTIN_TEMPLATE_MODULE = f"{__package__}.customize_templates"
+BUILTIN_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "customize_templates.py")
+# 外部插件文件导入后使用的模块名前缀
+PLUGIN_MODULE_PREFIX = "eminder_template_plugins"
+
+
+class _NotStatic(Exception):
+    """模板模块的 custom_templates 无法通过静态分析读取。"""
+
+
+def _read_static_definitions(path: str) -> dict:
+    """
+    静态读取模块中的 custom_templates，返回 {模板 key: (元数据, 函数名)}。
+    :raises _NotStatic: 结构不符合静态读取的要求。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    assignments = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            assignments[node.targets[0].id] = node.value
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and node.value is not None:
+            assignments[node.target.id] = node.value
+
+    registry = assignments.get("custom_templates")
+    if not isinstance(registry, ast.Dict):
+        raise _NotStatic("未找到字典字面量形式的 custom_templates")
+
+    definitions = {}
+    try:
+        for key_node, entry in zip(registry.keys, registry.values):
+            key = ast.literal_eval(key_node)
+            if not isinstance(entry, ast.Dict):
+                raise _NotStatic(f"模板 '{key}' 的定义不是字典字面量")
+            fields = {ast.literal_eval(k): v for k, v in zip(entry.keys, entry.values)}
+            meta_node, func_node = fields.get("meta"), fields.get("func")
+            if isinstance(meta_node, ast.Name):
+                meta_node = assignments.get(meta_node.id)
+            if meta_node is None or not isinstance(func_node, ast.Name):
+                raise _NotStatic(f"模板 '{key}' 的 meta / func 无法静态解析")
+            definitions[key] = (ast.literal_eval(meta_node), func_node.id)
+    except ValueError as e:
+        raise _NotStatic(str(e)) from e
+    return definitions
+
+
+class LazyTemplateFunction:
+    """模板函数的延迟加载代理：第一次调用时导入模块并取出真正的函数。"""
+
+    _import_lock = threading.Lock()
+
+    def __init__(self, module_name: str, path: str, func_name: str):
+        self.module_name = module_name
+        self.path = path
+        self.func_name = func_name
+        self._func = None
+
+    def _import_module(self):
+        if self.module_name in sys.modules:
+            return sys.modules[self.module_name]
+        if not self.module_name.startswith(PLUGIN_MODULE_PREFIX + "."):
+            return importlib.import_module(self.module_name)
+        spec = importlib.util.spec_from_file_location(self.module_name, self.path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[self.module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[self.module_name]
+            raise
+        return module
+
+    def load(self):
+        if self._func is None:
+            with self._import_lock:
+                if self._func is None:
+                    logger.info(f"按需加载模板模块 '{self.module_name}' ({self.func_name})")
+                    self._func = getattr(self._import_module(), self.func_name)
+        return self._func
+
+    def __call__(self, data: dict):
+        # 异步模板返回协程，由调用方 await
+        return self.load()(data)
+
+
+def _plugin_sources(plugin_dir: str = None) -> list:
+    """返回 [(模块名, 文件路径), ...]，内置模板在前。"""
+    sources = []
+    if os.path.isfile(BUILTIN_TEMPLATE_PATH):
+        sources.append((BUILTIN_TEMPLATE_MODULE, BUILTIN_TEMPLATE_PATH))
+    else:
+        print("提示：未找到 `customize_templates.py`，跳过加载自定义模板。")
+    if plugin_dir:
+        if not os.path.isdir(plugin_dir):
+            logger.warning(f"TEMPLATE_PLUGIN_DIR 指向的文件夹不存在: {plugin_dir}")
+        else:
+            for filename in sorted(os.listdir(plugin_dir)):
+                stem, ext = os.path.splitext(filename)
+                if ext == ".py" and not stem.startswith("_"):
+                    sources.append((f"{PLUGIN_MODULE_PREFIX}.{stem}", os.path.join(plugin_dir, filename)))
+    return sources
+
+
+def discover_templates(plugin_dir: str = None) -> dict:
+    """
+    发现所有模板模块中的模板，返回与 custom_templates 结构相同的字典:
+    {模板 key: {"meta": 元数据, "func": 可调用对象}}。能静态读取的模块不会被导入。
+    """
+    templates = {}
+    for module_name, path in _plugin_sources(plugin_dir):
+        try:
+            definitions = _read_static_definitions(path)
+        except (_NotStatic, SyntaxError, OSError) as e:
+            logger.warning(f"无法静态读取模板模块 '{path}' ({e})，改为立即导入。")
+            try:
+                module = LazyTemplateFunction(module_name, path, "custom_templates").load()
+            except Exception as import_error:
+                logger.error(f"导入模板模块 '{path}' 失败，已跳过: {import_error}", exc_info=True)
+                continue
+            templates.update(module)
+            continue
+        for key, (meta, func_name) in definitions.items():
+            templates[key] = {"meta": meta, "func": LazyTemplateFunction(module_name, path, func_name)}
+    return templates
@@ -0,0 +1,62 @@
+# backend/app/templates/report_file_cache.py (新文件)
+"""
+报告文件渲染结果缓存。
+
+固定/每日报告模板每次运行都要重新打开、读取并用 Markdown 渲染报告文件；
+多个任务指向同一个数 MB 的报告时，这些工作完全是重复的。
+这里按 (绝对路径, mtime_ns, 大小) 缓存渲染后的 HTML 和提取出的标题：
+文件未改变时只需一次 os.stat，无需读取文件、也无需 Markdown 转换。
+缓存按 HTML 与标题的总字节数 (REPORT_CACHE_MAX_BYTES) 以 LRU 方式淘汰，每个路径只保留最新版本。
+"""
+import os
+import threading
+from collections import OrderedDict
+from ..core.config import settings
+
+
+class ReportFileCache:
+    """按文件签名 (mtime_ns, 大小) 校验的 LRU 缓存，容量以字节计。"""
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()  # 绝对路径 -> (签名, 渲染结果, 占用字节数)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def signature(stat_result: os.stat_result) -> tuple:
+        return stat_result.st_mtime_ns, stat_result.st_size
+
+    def get(self, path: str, signature: tuple):
+        """签名一致时返回缓存的渲染结果，否则返回 None。"""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != signature:
+                return None
+            self._entries.move_to_end(path)
+            return entry[1]
+
+    def put(self, path: str, signature: tuple, rendered: dict):
+        if self._max_bytes <= 0:
+            return
+        size = sum(len(value.encode("utf-8")) for value in rendered.values() if isinstance(value, str))
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._total_bytes -= old[2]
+            self._entries[path] = (signature, rendered, size)
+            self._total_bytes += size
+            while self._total_bytes > self._max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+
+# 创建一个全局报告文件缓存实例
+report_file_cache = ReportFileCache(settings.REPORT_CACHE_MAX_BYTES)
@@ -0,0 +1,251 @@
+# backend/app/templates/timelog_analytics.py (新文件)
+"""
+时间日志分析模块。
+
+每日总结中的“📊 时间日志”板块由 LifeQuadrant 自动追加，每行格式为:
+    - [HH:MM:SS - HH:MM:SS] [类别] [主类/子类] | 备注
+结束时间为 "..." 表示该事项仍在进行中。
+
+TimeLog 把一天的日志一次性解析为列式数组 (开始秒数、结束秒数、子类 ID)，
+之后的分组、汇总、专注时段与空档统计都基于这些数组单次遍历完成，
+时间轴 HTML 与 LLM 提示词共用同一份解析结果；aggregate_time_logs 用于周报 / 月报的多日汇总。
+"""
+import datetime
+import re
+from array import array
+from collections import defaultdict
+
+# 正则匹配: - [00:00:00 - 01:00:00] [Category] [Main/Sub] | Remark
+# 兼容 ... 结束时间
+_TIMELOG_LINE_RE = re.compile(r'^\-\s*\[(\d{2}:\d{2}:\d{2})\s*-\s*(.*?)\]\s*\[(.*?)\]\s*\[(.*?)\/(.*?)\](?:\s*\|\s*(.*))?$')
+
+# 同一子类的两段记录间隔不超过该秒数时，视为同一个连续专注时段
+FOCUS_GAP_TOLERANCE = 5 * 60
+# 超过该秒数的未记录时间才算作“空档”
+MIN_GAP_SECONDS = 15 * 60
+
+
+def _time_str_to_seconds(t_str):
+    """辅助函数：将 HH:MM:SS 转换为秒"""
+    try:
+        parts = list(map(int, t_str.split(':')))
+        return parts[0] * 3600 + parts[1] * 60 + parts[2]
+    except (ValueError, IndexError):
+        return 0
+
+
+def format_duration(seconds: int) -> str:
+    """将秒数格式化为 'X小时Y分钟'。"""
+    hours, minutes = divmod(int(seconds) // 60, 60)
+    if hours and minutes:
+        return f"{hours}小时{minutes}分钟"
+    if hours:
+        return f"{hours}小时"
+    return f"{minutes}分钟"
+
+
+class TimeLog:
+    """单日时间日志的列式表示 (第 i 条记录 = 每个数组的第 i 个元素)。"""
+
+    def __init__(self):
+        self.subs = []                # 子类名称表，子类 ID 即其下标
+        self.starts = array('i')      # 开始时间 (当天秒数)
+        self.ends = array('i')        # 结束时间 (当天秒数)
+        self.sub_ids = array('i')     # 子类 ID
+        self.categories = []          # 类别 (第一个方括号)
+        self.mains = []               # 主类
+        self.remarks = []
+        self.raw_starts = []
+        self.raw_ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def parse(cls, log_text: str, now: datetime.datetime = None) -> "TimeLog":
+        """
+        解析时间日志文本，无效行和时长不为正的记录会被忽略。
+        :param now: 用于结束时间为 "..." (进行中) 的记录；为 None 时 (例如历史日志) 跳过这些记录。
+        """
+        log = cls()
+        if not log_text or not log_text.strip():
+            return log
+
+        sub_index = {}
+        current_seconds_of_day = now.hour * 3600 + now.minute * 60 + now.second if now else None
+        for line in log_text.strip().split('\n'):
+            match = _TIMELOG_LINE_RE.match(line.strip())
+            if not match:
+                continue
+            start_str, end_str, cat, main_cat, sub_cat, remark = match.groups()
+
+            # 处理 "..." 表示进行中，结束时间设为当前时间
+            if '...' in end_str:
+                if now is None:
+                    continue
+                end_sec = current_seconds_of_day
+                display_end = now.strftime("%H:%M:%S")
+            else:
+                end_sec = _time_str_to_seconds(end_str)
+                display_end = end_str
+
+            start_sec = _time_str_to_seconds(start_str)
+            if end_sec - start_sec <= 0:
+                continue
+
+            sub_id = sub_index.get(sub_cat)
+            if sub_id is None:
+                sub_id = sub_index[sub_cat] = len(log.subs)
+                log.subs.append(sub_cat)
+            log.starts.append(start_sec)
+            log.ends.append(end_sec)
+            log.sub_ids.append(sub_id)
+            log.categories.append(cat)
+            log.mains.append(main_cat)
+            log.remarks.append(remark or '')
+            log.raw_starts.append(start_str)
+            log.raw_ends.append(display_end)
+        return log
+
+    def group_by_sub(self) -> dict:
+        """单次遍历，按子类分组: {子类名称: [记录下标, ...]} (保持原始顺序)。"""
+        rows = [[] for _ in self.subs]
+        for i, sub_id in enumerate(self.sub_ids):
+            rows[sub_id].append(i)
+        return {sub: rows[sub_id] for sub_id, sub in enumerate(self.subs)}
+
+    def totals_by_sub(self) -> dict:
+        """各子类的累计时长 (秒)，按时长降序。"""
+        totals = [0] * len(self.subs)
+        for start, end, sub_id in zip(self.starts, self.ends, self.sub_ids):
+            totals[sub_id] += end - start
+        return dict(sorted(zip(self.subs, totals), key=lambda item: -item[1]))
+
+    def totals_by_category(self) -> dict:
+        """各类别 (第一个方括号) 的累计时长 (秒)，按时长降序。"""
+        totals = defaultdict(int)
+        for start, end, cat in zip(self.starts, self.ends, self.categories):
+            totals[cat] += end - start
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def _order(self) -> list:
+        return sorted(range(len(self.starts)), key=self.starts.__getitem__)
+
+    def longest_focus_streak(self, gap_tolerance: int = FOCUS_GAP_TOLERANCE):
+        """
+        同一子类连续进行 (相邻记录间隔不超过 gap_tolerance) 的最长时段。
+        :return: {"sub", "start", "end", "seconds"}；没有记录时返回 None。
+        """
+        best = None
+        streak_sub = streak_start = streak_end = None
+        streak_seconds = 0
+        for i in self._order():
+            start, end, sub_id = self.starts[i], self.ends[i], self.sub_ids[i]
+            if sub_id == streak_sub and start - streak_end <= gap_tolerance:
+                streak_seconds += end - max(start, streak_end) if end > streak_end else 0
+                streak_end = max(streak_end, end)
+            else:
+                streak_sub, streak_start, streak_end, streak_seconds = sub_id, start, end, end - start
+            if best is None or streak_seconds > best["seconds"]:
+                best = {"sub": self.subs[streak_sub], "start": streak_start, "end": streak_end, "seconds": streak_seconds}
+        return best
+
+    def gaps(self, min_gap: int = MIN_GAP_SECONDS) -> list:
+        """第一条与最后一条记录之间，超过 min_gap 秒的未记录时段: [(开始秒数, 结束秒数), ...]。"""
+        result = []
+        covered_until = None
+        for i in self._order():
+            start, end = self.starts[i], self.ends[i]
+            if covered_until is not None and start - covered_until >= min_gap:
+                result.append((covered_until, start))
+            covered_until = end if covered_until is None else max(covered_until, end)
+        return result
+
+    def stats(self) -> dict:
+        """汇总统计，供时间轴渲染、提示词和多日汇总使用。"""
+        gaps = self.gaps()
+        return {
+            "entries": len(self),
+            "tracked_seconds": sum(end - start for start, end in zip(self.starts, self.ends)),
+            "by_sub": self.totals_by_sub(),
+            "by_category": self.totals_by_category(),
+            "longest_focus": self.longest_focus_streak(),
+            "gaps": gaps,
+            "gap_seconds": sum(end - start for start, end in gaps),
+        }
+
+
+def _seconds_to_clock(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+
+def describe_stats(stats: dict, top_n: int = 6) -> str:
+    """把单日统计转换为适合放入 LLM 提示词的简短文本；没有记录时返回空字符串。"""
+    if not stats["entries"]:
+        return ""
+    lines = [f"- **已记录时长**: {format_duration(stats['tracked_seconds'])} ({stats['entries']} 条记录)"]
+    if stats["by_category"]:
+        lines.append("- **类别分布**: " + ", ".join(f"{cat} {format_duration(sec)}" for cat, sec in stats["by_category"].items()))
+    top_subs = list(stats["by_sub"].items())[:top_n]
+    lines.append("- **主要事项**: " + ", ".join(f"{sub} {format_duration(sec)}" for sub, sec in top_subs))
+    focus = stats["longest_focus"]
+    if focus:
+        lines.append(f"- **最长连续专注**: {focus['sub']} {format_duration(focus['seconds'])} "
+                     f"({_seconds_to_clock(focus['start'])}-{_seconds_to_clock(focus['end'])})")
+    if stats["gaps"]:
+        lines.append(f"- **未记录空档**: {len(stats['gaps'])} 段，共 {format_duration(stats['gap_seconds'])}")
+    return "\n".join(lines)
+
+
+def aggregate_time_logs(daily_logs: list) -> dict:
+    """
+    多日汇总 (周报 / 月报)。
+    :param daily_logs: [(日期, TimeLog), ...]
+    :return: {"days", "tracked_seconds", "by_sub", "by_category", "longest_focus", "gap_seconds", "daily_tracked"}
+             longest_focus 额外包含 "date"；daily_tracked 为 [(日期, 已记录秒数), ...]。
+    """
+    by_sub, by_category = defaultdict(int), defaultdict(int)
+    tracked_seconds = gap_seconds = 0
+    longest_focus = None
+    daily_tracked = []
+    for day, log in daily_logs:
+        if not len(log):
+            continue
+        stats = log.stats()
+        tracked_seconds += stats["tracked_seconds"]
+        gap_seconds += stats["gap_seconds"]
+        for sub, sec in stats["by_sub"].items():
+            by_sub[sub] += sec
+        for cat, sec in stats["by_category"].items():
+            by_category[cat] += sec
+        focus = stats["longest_focus"]
+        if focus and (longest_focus is None or focus["seconds"] > longest_focus["seconds"]):
+            longest_focus = dict(focus, date=day)
+        daily_tracked.append((day, stats["tracked_seconds"]))
+    return {
+        "days": len(daily_tracked),
+        "tracked_seconds": tracked_seconds,
+        "by_sub": dict(sorted(by_sub.items(), key=lambda item: -item[1])),
+        "by_category": dict(sorted(by_category.items(), key=lambda item: -item[1])),
+        "longest_focus": longest_focus,
+        "gap_seconds": gap_seconds,
+        "daily_tracked": daily_tracked,
+    }
+
+
+def describe_aggregate(aggregate: dict, top_n: int = 8) -> str:
+    """把多日汇总转换为提示词文本；没有任何时间记录时返回空字符串。"""
+    if not aggregate["days"]:
+        return ""
+    days = aggregate["days"]
+    lines = [f"- **有时间记录的天数**: {days} 天，共 {format_duration(aggregate['tracked_seconds'])}，"
+             f"日均 {format_duration(aggregate['tracked_seconds'] // days)}"]
+    if aggregate["by_category"]:
+        lines.append("- **类别分布**: " + ", ".join(f"{cat} {format_duration(sec)}" for cat, sec in aggregate["by_category"].items()))
+    top_subs = list(aggregate["by_sub"].items())[:top_n]
+    lines.append("- **主要事项**: " + ", ".join(f"{sub} {format_duration(sec)}" for sub, sec in top_subs))
+    focus = aggregate["longest_focus"]
+    if focus:
+        lines.append(f"- **最长连续专注**: {focus['date'].strftime('%m-%d')} {focus['sub']} {format_duration(focus['seconds'])}")
+    lines.append("- **每日记录时长**: " + ", ".join(f"{day.strftime('%m-%d')}: {format_duration(sec)}" for day, sec in aggregate["daily_tracked"]))
+    return "\n".join(lines)
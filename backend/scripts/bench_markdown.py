@@ -0,0 +1,76 @@
+"""
+Markdown 转换基准测试：比较三种方式在大型报告文件上的吞吐量。
+  1. markdown.markdown()            —— 原实现，每次调用都重新创建转换器
+  2. 复用 Markdown 实例 (reset)     —— MarkdownRenderer.convert_uncached
+  3. 复用实例 + 内容哈希缓存          —— convert_markdown_to_html (重复内容直接命中缓存)
+
+用法 (在 backend 目录下运行):
+    python scripts/bench_markdown.py [--file report.md] [--sections 200] [--repeat 50]
+不指定 --file 时生成一份包含标题、列表、表格和代码块的合成报告。
+"""
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# 配置模块要求 SENDER_ACCOUNTS 存在，基准测试不会发送邮件
+os.environ.setdefault("SENDER_ACCOUNTS", "bench@example.com|unused")
+
+import markdown  # noqa: E402
+from app.templates.markdown_renderer import MARKDOWN_EXTENSIONS, MarkdownRenderer  # noqa: E402
+
+
+def build_report(sections: int) -> str:
+    parts = []
+    for i in range(sections):
+        parts.append(f"## 第 {i} 节\n\n这是一段 **加粗** 与 *斜体* 混合的说明文字，包含 `行内代码` 和 [链接](https://example.com/{i})。\n")
+        parts.append("\n".join(f"- 列表项 {i}.{j}" for j in range(5)) + "\n")
+        parts.append("| 指标 | 数值 | 备注 |\n|---|---|---|\n" + "\n".join(f"| m{j} | {i * j} | ok |" for j in range(5)) + "\n")
+        parts.append(f"```python\ndef f{i}(x):\n    return x * {i}\n```\n")
+    return "\n".join(parts)
+
+
+def bench(label: str, func, text: str, repeat: int, baseline: float = None) -> float:
+    func(text)  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    elapsed = time.perf_counter() - start
+    mb_per_s = len(text.encode("utf-8")) * repeat / elapsed / 1e6
+    speedup = f"  x{baseline / elapsed:.2f}" if baseline else ""
+    print(f"{label:<28} {elapsed / repeat * 1000:9.2f} ms/次  {mb_per_s:8.2f} MB/s{speedup}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown 转换基准测试")
+    parser.add_argument("--file", help="用作输入的 Markdown 文件")
+    parser.add_argument("--sections", type=int, default=200, help="合成报告的小节数")
+    parser.add_argument("--repeat", type=int, default=50, help="每种方式的重复次数")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = build_report(args.sections)
+    print(f"输入大小: {len(text.encode('utf-8')) / 1024:.1f} KB，重复 {args.repeat} 次\n")
+
+    renderer = MarkdownRenderer(cache_size=16)
+    assert renderer.convert_uncached(text) == markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+
+    baseline = bench("markdown.markdown()", lambda t: markdown.markdown(t, extensions=MARKDOWN_EXTENSIONS), text, args.repeat)
+    bench("复用实例 (reset)", renderer.convert_uncached, text, args.repeat, baseline)
+    bench("复用实例 + 内容哈希缓存", renderer.convert, text, args.repeat, baseline)
+
+    # 小输入 (如 LLM 回答、快速消息) 上创建转换器的固定开销占比更高
+    small = build_report(2)
+    print(f"\n小输入: {len(small.encode('utf-8')) / 1024:.1f} KB，重复 {args.repeat * 20} 次\n")
+    baseline = bench("markdown.markdown()", lambda t: markdown.markdown(t, extensions=MARKDOWN_EXTENSIONS), small, args.repeat * 20)
+    bench("复用实例 (reset)", renderer.convert_uncached, small, args.repeat * 20, baseline)
+
+
+if __name__ == "__main__":
+    main()
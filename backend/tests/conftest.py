@@ -0,0 +1,18 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+# 配置在导入 app 时读取，必须在导入任何 app 模块之前设置测试环境
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TEST_DB_NAME = "test_eminder.db"
+os.environ.setdefault("SENDER_ACCOUNTS", "tester@example.com|password")
+os.environ["DATABASE_URL"] = f"sqlite:///./{TEST_DB_NAME}"
+sys.path.insert(0, BACKEND_DIR)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """测试结束后删除测试数据库 (数据库文件固定位于 backend 目录下)。"""
+    for suffix in ("", "-wal", "-shm"):
+        path = os.path.join(BACKEND_DIR, TEST_DB_NAME + suffix)
+        if os.path.exists(path):
+            os.remove(path)
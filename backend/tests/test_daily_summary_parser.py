@@ -0,0 +1,37 @@
+# backend/tests/test_daily_summary_parser.py
+from app.templates.customize_templates import DAILY_SUMMARY_PARSER_VERSION, _parse_daily_summary
+
+
+def _today(items: str) -> str:
+    return f"## 📝 今日事项\n{items}\n\n## ✍️ 随手记\n- 笔记\n"
+
+
+def test_parser_version_bumped_for_checkbox_semantics():
+    # 勾选项规则改变后历史索引必须重新解析
+    assert DAILY_SUMMARY_PARSER_VERSION >= 2
+
+
+def test_basic_checkbox_items():
+    parsed = _parse_daily_summary(_today("- [x] 写代码\n- [X] 跑步\n- [ ] 读书"))
+    assert parsed["done"] == ["写代码", "跑步"]
+    assert parsed["todo"] == ["读书"]
+    assert parsed["progress"] == 67
+    assert parsed["notes"] == ["笔记"]
+
+
+def test_empty_checkbox_does_not_swallow_next_line():
+    parsed = _parse_daily_summary(_today("- [ ]\n- [x] 写代码"))
+    assert parsed["done"] == ["写代码"]
+    assert parsed["todo"] == []
+
+
+def test_inline_checkbox_belongs_to_the_enclosing_item():
+    # 原实现会把行内的第二个复选框再计一次 (已完成 "a - [ ] b" + 未完成 "b")
+    parsed = _parse_daily_summary(_today("- [x] a - [ ] b"))
+    assert parsed["done"] == ["a - [ ] b"]
+    assert parsed["todo"] == []
+
+    parsed = _parse_daily_summary(_today("- [ ] a - [x] b"))
+    assert parsed["done"] == []
+    assert parsed["todo"] == ["a - [x] b"]
+    assert parsed["total"] == 1
@@ -0,0 +1,36 @@
+# backend/tests/test_llm_cache_opt_out.py
+import asyncio
+
+from app.templates import customize_templates
+from app.templates.plugin_registry import BUILTIN_TEMPLATE_PATH, _read_static_definitions
+
+
+def _run_deepseek(monkeypatch, data: dict) -> list:
+    calls = []
+
+    async def fake_generate_text(prompt, use_cache=True):
+        calls.append(use_cache)
+        return {"success": True, "content": "结果"}
+
+    monkeypatch.setattr(customize_templates.llm_service, "generate_text", fake_generate_text)
+    asyncio.run(customize_templates.get_deepseek_workflow_template({"text_ori": "你好", **data}))
+    return calls
+
+
+def test_llm_cache_used_by_default(monkeypatch):
+    assert _run_deepseek(monkeypatch, {}) == [True]
+    assert _run_deepseek(monkeypatch, {"bypass_llm_cache": 0}) == [True]
+
+
+def test_bypass_llm_cache_field(monkeypatch):
+    assert _run_deepseek(monkeypatch, {"bypass_llm_cache": 1}) == [False]
+    assert _run_deepseek(monkeypatch, {"bypass_llm_cache": "1"}) == [False]
+
+
+def test_llm_templates_expose_bypass_field_statically():
+    definitions = _read_static_definitions(BUILTIN_TEMPLATE_PATH)
+    for key in ("daily_summary_plan", "weekly_summary_plan", "monthly_summary_plan", "script_runner", "deepseek_workflow"):
+        meta, _ = definitions[key]
+        assert "bypass_llm_cache" in [field["name"] for field in meta["fields"]], key
+        # 前端最多渲染 12 个动态字段 (frontend/app/ui.py MAX_FIELDS)
+        assert len(meta["fields"]) <= 12, key
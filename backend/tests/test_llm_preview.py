@@ -0,0 +1,29 @@
+# backend/tests/test_llm_preview.py
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import llm
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.include_router(llm.router, prefix="/api/llm")
+    return TestClient(app)
+
+
+def test_stream_preview_rejects_other_templates():
+    response = _client().post("/api/llm/preview/stream", json={"text_ori": "你好", "template_type": "quick_message"})
+    assert response.status_code == 400
+    assert "deepseek_workflow" in response.json()["detail"]
+
+
+def test_stream_preview_streams_deepseek_workflow(monkeypatch):
+    from app.services.llm_service import llm_service
+
+    async def fake_stream(prompt, use_cache=True):
+        yield "<b>处理结果</b>"
+
+    monkeypatch.setattr(llm_service, "generate_text_stream", fake_stream)
+    response = _client().post("/api/llm/preview/stream", json={"text_ori": "你好", "template_type": "deepseek_workflow"})
+    assert response.status_code == 200
+    assert "&lt;b&gt;处理结果&lt;/b&gt;" in response.text
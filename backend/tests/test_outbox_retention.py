@@ -0,0 +1,52 @@
+# backend/tests/test_outbox_retention.py
+import asyncio
+import time
+
+from app.storage.sqlite_store import store
+from app.services.outbox_service import OutboxDispatcher
+
+
+def _enqueue(status: str, age_seconds: float) -> int:
+    """写入一封指定状态的邮件，并把 updated_at 回拨 age_seconds 秒。"""
+    message_id = store.enqueue_outbox_message("user@example.com", "主题", "<p>正文</p>", source="test")
+    if status == "sent":
+        store.mark_outbox_sent(message_id)
+    elif status == "dead":
+        store.mark_outbox_failed(message_id, "失败")
+    with store._write() as cursor:
+        cursor.execute(
+            "UPDATE outbox SET updated_at = datetime(?, 'unixepoch') WHERE id = ?",
+            (time.time() - age_seconds, message_id)
+        )
+    return message_id
+
+
+def _outbox_ids() -> set:
+    return {message["id"] for message in store.get_outbox_messages(limit=10000)}
+
+
+def test_purge_sent_outbox_keeps_recent_and_dead_rows():
+    old_sent = _enqueue("sent", 3 * 86400)
+    recent_sent = _enqueue("sent", 60)
+    old_dead = _enqueue("dead", 3 * 86400)
+
+    purged = store.purge_sent_outbox(time.time() - 86400)
+
+    remaining = _outbox_ids()
+    assert purged >= 1
+    assert old_sent not in remaining
+    assert recent_sent in remaining
+    assert old_dead in remaining
+
+
+def test_drain_once_purges_expired_sent_rows():
+    old_sent = _enqueue("sent", 3 * 86400)
+    old_dead = _enqueue("dead", 3 * 86400)
+
+    dispatcher = OutboxDispatcher()
+    dispatcher.sent_retention = 86400
+    asyncio.run(dispatcher.drain_once())
+
+    remaining = _outbox_ids()
+    assert old_sent not in remaining
+    assert old_dead in remaining
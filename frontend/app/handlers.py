@@ -16,6 +16,7 @@ import requests
 from . import api_client
 from . import state
 from .config import config
+from .ui import MAX_FIELDS
 
 # --- UI Logic & Helper Functions ---
 
@@ -583,7 +584,7 @@ def on_select_job(df_input: pd.DataFrame, evt: gr.SelectData):
         # 3. Dynamic field updates
         dynamic_field_updates = []
         fields = meta.get("fields", [])
-        for i in range(10): # max_fields_edit
+        for i in range(MAX_FIELDS):
             if i < len(fields):
                 field = fields[i]
                 f_type = field.get("type", "text") # Get type for logic
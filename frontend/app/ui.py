@@ -7,7 +7,7 @@
 import gradio as gr
 import datetime
 
-MAX_FIELDS = 10 # Max number of dynamic fields a template can have.
+MAX_FIELDS = 12 # Max number of dynamic fields a template can have.
 
 def create_subscriber_management_tab():
     """Builds the UI for the 'Subscription Management' tab."""